@@ -0,0 +1,239 @@
+# admission control (ADMISSION_CONTROL=1): a pure ASGI middleware in front of the app that sorts
+# requests into priority classes, bounds how many of each run at once, and sheds load early
+# (503 + Retry-After) instead of letting every request queue for the same threadpool.
+#
+#   redirect  GET /r/{code}                          — may use every one of ADMISSION_MAX_CONCURRENCY
+#                                                      slots; the others leave ADMISSION_REDIRECT_RESERVED free
+#   heavy     /links, GET /api/links, export/import/bulk
+#   auth      POST /signup, POST /login (password hashing)
+#   default   everything else
+#
+# Health, metrics, static files and the profiler are never limited. A per-client token bucket
+# (ADMISSION_RATE / ADMISSION_BURST, off by default) answers 429 + Retry-After on top.
+# All state is per process; with several workers the limits apply to each of them.
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED
+
+# set ADMISSION_CONTROL=1 to add AdmissionMiddleware in front of the app
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "0") == "1"
+
+# requests admitted at once per process (default: the size of the sync handlers' threadpool)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "40"))
+
+# slots only redirects may use, so heavy traffic can never starve /r/{code}
+ADMISSION_REDIRECT_RESERVED = int(os.getenv("ADMISSION_REDIRECT_RESERVED", "8"))
+
+# concurrency limit per class, e.g. ADMISSION_LIMITS="heavy=4,auth=8"; unlisted classes use the shared limit
+ADMISSION_LIMITS = {
+    name: int(limit)
+    for name, limit in (
+        pair.split("=", 1) for pair in os.getenv("ADMISSION_LIMITS", "heavy=8,auth=8").split(",") if pair
+    )
+}
+
+# requests that may wait for a slot per class, and how long (seconds) before they get a 503
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+
+# Retry-After (seconds) sent with 503s
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# per-client token bucket: sustained requests/second and burst size (ADMISSION_RATE=0 disables it)
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "0"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "50"))
+
+# clients whose buckets are kept in memory (least recently seen are dropped beyond this)
+ADMISSION_CLIENTS_MAX = int(os.getenv("ADMISSION_CLIENTS_MAX", "100000"))
+
+# identify clients by the first X-Forwarded-For address (only behind a trusted proxy)
+ADMISSION_TRUST_PROXY = os.getenv("ADMISSION_TRUST_PROXY", "0") == "1"
+
+EXEMPT_PATHS = ("/health", "/metrics", "/debug/profile")
+HEAVY_PATHS = ("/api/links/export", "/api/links/import", "/api/links/bulk")
+
+
+# priority class of a request, or None when it is never limited
+def request_class(method: str, path: str) -> Optional[str]:
+    if path.startswith("/r/"):
+        return "redirect"
+    if path in EXEMPT_PATHS or path.startswith("/static/"):
+        return None
+    if method == "POST" and path in ("/signup", "/login"):
+        return "auth"
+    if path == "/links" or path.startswith(HEAVY_PATHS) or (method == "GET" and path == "/api/links"):
+        return "heavy"
+    return "default"
+
+
+# -----------------------------------------------------
+# Concurrency limits
+# -----------------------------------------------------
+class ConcurrencyLimit:
+    """At most `limit` holders; up to `queue_max` waiters, each for at most `timeout` seconds."""
+
+    def __init__(self, name: str, limit: int, queue_max: int = ADMISSION_QUEUE_MAX, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.queue_max = queue_max
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+
+    # returns None once admitted, otherwise the reason for shedding ("queue_full" / "timeout")
+    async def acquire(self) -> Optional[str]:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return None
+        if self.waiting >= self.queue_max:
+            return "queue_full"
+        self.waiting += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            return None
+        except asyncio.TimeoutError:
+            return "timeout"
+        finally:
+            self.waiting -= 1
+            ADMISSION_QUEUE_DEPTH.labels(self.name).dec()
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+# -----------------------------------------------------
+# Per-client rate limit
+# -----------------------------------------------------
+class TokenBuckets:
+    """One token bucket per client key: `rate` tokens/second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float, maxsize: int = ADMISSION_CLIENTS_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        # key -> [tokens, last refill (monotonic)]
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    # takes a token; returns 0 when allowed, else the seconds until the next token is available
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+
+# -----------------------------------------------------
+# Middleware
+# -----------------------------------------------------
+class AdmissionMiddleware:
+    """Sheds requests before they reach the app: 429 over the client's rate, 503 when the
+    request's class (or the capacity left after the redirect reserve) stays full too long."""
+
+    def __init__(
+        self,
+        app,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        redirect_reserved: int = ADMISSION_REDIRECT_RESERVED,
+        limits: Optional[dict[str, int]] = None,
+        queue_max: int = ADMISSION_QUEUE_MAX,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        rate: float = ADMISSION_RATE,
+        burst: float = ADMISSION_BURST,
+        trust_proxy: bool = ADMISSION_TRUST_PROXY,
+    ):
+        self.app = app
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.trust_proxy = trust_proxy
+        self.buckets = TokenBuckets(rate, burst) if rate > 0 else None
+        # every request holds a slot of `total`; non-redirects also one of `shared`, which leaves the
+        # reserve free for redirects inside the same global cap
+        self.total = self._limit("total", max_concurrency)
+        self.shared = self._limit("shared", max(1, max_concurrency - redirect_reserved))
+        self.classes = {
+            name: self._limit(name, limit)
+            for name, limit in (ADMISSION_LIMITS if limits is None else limits).items()
+        }
+
+    def _limit(self, name: str, limit: int) -> ConcurrencyLimit:
+        return ConcurrencyLimit(name, limit, self.queue_max, self.queue_timeout)
+
+    def _client(self, scope) -> str:
+        if self.trust_proxy:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: int) -> None:
+        body = b'{"detail":"' + detail.encode() + b'"}'
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cls = request_class(scope["method"], scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.buckets is not None:
+            wait = self.buckets.take(self._client(scope))
+            if wait:
+                ADMISSION_SHED.labels(cls, "rate_limited").inc()
+                await self._reject(send, 429, "Too many requests", math.ceil(wait))
+                return
+
+        # narrowest limit first, so a request queued on its class does not hold a global slot
+        if cls == "redirect":
+            limits = [self.total]
+        else:
+            limits = [self.classes[cls]] if cls in self.classes else []
+            limits += [self.shared, self.total]
+
+        held = []
+        try:
+            for limit in limits:
+                reason = await limit.acquire()
+                if reason is not None:
+                    ADMISSION_SHED.labels(cls, reason).inc()
+                    await self._reject(send, 503, "Server busy, retry shortly", ADMISSION_RETRY_AFTER)
+                    return
+                held.append(limit)
+            ADMISSION_IN_FLIGHT.labels(cls).inc()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                ADMISSION_IN_FLIGHT.labels(cls).dec()
+        finally:
+            for limit in held:
+                limit.release()
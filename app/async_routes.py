@@ -0,0 +1,158 @@
+# async variants of the hot endpoints (redirect, create/list links, stats), enabled with ASYNC_DB=1
+# They run on the event loop with an aiosqlite-backed AsyncSession instead of occupying a threadpool worker.
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import CachedUser, redirect_cache, user_cache
+from app.clicks import click_buffer, link_read, merged_clicks
+from app.db import engine, get_async_session
+from app.expiry import revive_code, tombstones
+from app.models import Link, User
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, link_page_query
+from app.redirects import redirect_query, redirect_response, resolve_link
+from app.schemas import LinkCreate, LinkRead, StatsRead
+from app.services import choose_code, sanitize_scheme, ua_family
+from app.snapshot import code_snapshot
+from app.trending import trending
+
+router = APIRouter()
+
+# attempts at inserting a link with a freshly generated code before giving up
+CODE_ATTEMPTS = 5
+
+# -------------------------------
+# Helpers
+# -------------------------------
+async def get_current_user_async(request: Request, session: AsyncSession) -> Optional[CachedUser]:
+    """Return the logged-in user's identity or None (shares the user cache with the sync handlers)."""
+    uid = request.session.get("user_id")
+    if not uid:
+        return None
+    cached = user_cache.get(uid)
+    if cached is not None:
+        return cached
+    user = await session.get(User, uid)
+    if not user:
+        return None
+    cached = CachedUser(user.id, user.username)
+    user_cache.set(uid, cached)
+    return cached
+
+# -------------------------------
+# API: CREATE LINK
+# -------------------------------
+@router.post("/api/links", response_model=LinkRead, status_code=status.HTTP_201_CREATED)
+async def create_link_async(
+    payload: LinkCreate,
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
+):
+    user = await get_current_user_async(request, session)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+
+    if not sanitize_scheme(str(payload.original_url)):
+        raise HTTPException(status_code=422, detail="Only http/https URLs are allowed")
+
+    # no pre-check query: the unique index rejects clashes (see insert_link in app/main.py)
+    for _ in range(CODE_ATTEMPTS):
+        link = Link(
+            short_code=choose_code(payload.custom_code),
+            original_url=str(payload.original_url),
+            expires_at=payload.expires_at,
+            label=payload.label,
+            permanent=payload.permanent,
+            cache_max_age=payload.cache_max_age,
+            user_id=user.id,
+        )
+        session.add(link)
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            if payload.custom_code:
+                raise HTTPException(status_code=409, detail="Custom code already in use")
+            continue
+        if link.short_code in tombstones:
+            await run_in_threadpool(revive_code, engine, link.short_code)
+        return link_read(link)
+    raise HTTPException(status_code=503, detail="Could not allocate a short code, try again")
+
+# -------------------------------
+# API: LIST LINKS (per-user)
+# -------------------------------
+@router.get("/api/links", response_model=list[LinkRead])
+async def list_links_async(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    label: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    user = await get_current_user_async(request, session)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+
+    query = link_page_query(user.id, sort, cursor, label, created_after, created_before)
+    links = (await session.exec(query.limit(limit + 1))).all()
+    if len(links) > limit:
+        links = links[:limit]
+        next_cursor = encode_cursor(sort, links[-1])
+        response.headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return [link_read(link) for link in links]
+
+# -------------------------------
+# Redirect + analytics
+# -------------------------------
+@router.get("/r/{code}")
+async def redirect_async(
+    code: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+):
+    target = redirect_cache.get(code)
+    if target is None:
+        if tombstones.hit(code):
+            raise HTTPException(status_code=410, detail="Link expired")
+        row = code_snapshot.lookup(code) or (await session.exec(redirect_query(code))).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Not found")
+        target = resolve_link(*row)
+        redirect_cache.set(code, target)
+
+    now = datetime.utcnow()
+    if target.expires_at and target.expires_at <= now:
+        raise HTTPException(status_code=410, detail="Link expired")
+
+    # the bulk flush uses the sync engine; BackgroundTasks runs it in the threadpool
+    headers = request.headers
+    if click_buffer.record(code, referrer=headers.get("referer"), ua_family=ua_family(headers.get("user-agent"))):
+        background_tasks.add_task(click_buffer.flush, engine)
+    trending.record(code)
+
+    return redirect_response(target, now)
+
+# -------------------------------
+# API: Stats
+# -------------------------------
+@router.get("/api/links/{code}/stats", response_model=StatsRead)
+async def link_stats_async(code: str, session: AsyncSession = Depends(get_async_session)):
+    link = (await session.exec(select(Link).where(Link.short_code == code))).first()
+    if not link:
+        raise HTTPException(status_code=404, detail="Not found")
+    click_count, last_accessed = merged_clicks(link)
+    return {"click_count": click_count, "last_accessed": last_accessed}
@@ -1,7 +1,32 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
 from passlib.context import CryptContext
 
+from app.metrics import HASH_LATENCY, HASH_QUEUE_DEPTH, HASH_REJECTED
+
+# PBKDF2 iteration count for new hashes; stored hashes with fewer rounds are upgraded on login
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "29000"))
+
+# worker processes that run hashing off the request threadpool (0 = a single background thread)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+
+# hash jobs allowed in flight (running + queued) before new ones are rejected with a 429
+HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", "32"))
+
 # Use PBKDF2-SHA256 as bcrypt has 72-byte limit password (gave me headaches)
-_pwd = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+_pwd = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+)
 
 # hashes plaintext password; args a plaintext string and returns a hashed password (secure)
 def hash_password(plain: str) -> str:
@@ -9,4 +34,67 @@ def hash_password(plain: str) -> str:
 
 # verifies a plaintext password against a hashed password; args are plaintext and hashed, returns bool
 def verify_password(plain: str, hashed: str) -> bool:
-    return _pwd.verify(plain, hashed)
\ No newline at end of file
+    return _pwd.verify(plain, hashed)
+
+# checks whether a stored hash uses outdated settings (e.g. fewer rounds) and should be re-hashed
+def needs_rehash(hashed: str) -> bool:
+    return _pwd.needs_update(hashed)
+
+# -----------------------------------------------------
+# Bounded hashing pool
+# -----------------------------------------------------
+class HashPoolBusy(Exception):
+    """Raised when HASH_QUEUE_MAX hash jobs are already in flight; callers answer 429."""
+
+
+_pool: Optional[Executor] = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+
+# returns the shared executor, creating it on first use
+def _executor() -> Executor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if HASH_WORKERS > 0:
+                # spawn: never fork a process that already runs server threads
+                _pool = ProcessPoolExecutor(HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pool = ThreadPoolExecutor(1, thread_name_prefix="hash")
+        return _pool
+
+# shuts the pool down (with wait, until its worker processes have exited); the next hash job starts a new one
+def shutdown_hash_pool(wait: bool = True) -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+# the lifespan shuts the pool down cleanly; this only catches processes that exit without it
+atexit.register(shutdown_hash_pool, wait=False)
+
+async def _run(op: str, fn, *args):
+    global _in_flight
+    with _pool_lock:
+        if _in_flight >= HASH_QUEUE_MAX:
+            HASH_REJECTED.inc()
+            raise HashPoolBusy()
+        _in_flight += 1
+    HASH_QUEUE_DEPTH.inc()
+    start = time.perf_counter()
+    try:
+        return await asyncio.wrap_future(_executor().submit(fn, *args))
+    finally:
+        HASH_LATENCY.labels(op).observe(time.perf_counter() - start)
+        HASH_QUEUE_DEPTH.dec()
+        with _pool_lock:
+            _in_flight -= 1
+
+# async version of hash_password that runs in the hashing pool; raises HashPoolBusy when saturated
+async def hash_password_async(plain: str) -> str:
+    return await _run("hash", hash_password, plain)
+
+# async version of verify_password that runs in the hashing pool; raises HashPoolBusy when saturated
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run("verify", verify_password, plain, hashed)
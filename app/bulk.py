@@ -0,0 +1,178 @@
+# bulk link creation: validate a batch, resolve code collisions with IN (...) queries, insert in one transaction
+
+import csv
+import os
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.expiry import revive_code
+from app.models import Link
+from app.schemas import BulkLinkResult, LinkCreate
+from app.services import choose_code, code_allocator, sanitize_scheme
+
+# maximum number of links accepted by a single bulk request
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "50000"))
+
+# codes per IN (...) query; keeps well below SQLite's bound-parameter limit
+IN_CHUNK = 500
+
+# attempts before giving up when a concurrent writer steals one of our codes
+INSERT_ATTEMPTS = 3
+
+# rows per transaction for streamed imports (POST /api/links/import)
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "1000"))
+
+
+# returns the subset of codes that already exist in the link table
+def existing_codes(session: Session, codes: Iterable[str]) -> set[str]:
+    codes = list(codes)
+    found: set[str] = set()
+    for i in range(0, len(codes), IN_CHUNK):
+        chunk = codes[i:i + IN_CHUNK]
+        found.update(session.exec(select(Link.short_code).where(Link.short_code.in_(chunk))).all())
+    return found
+
+
+# assigns a code to every pending item; custom codes that are taken become 409 results
+def _assign_codes(
+    session: Session,
+    items: dict[int, LinkCreate],
+    results: dict[int, BulkLinkResult],
+) -> dict[int, str]:
+    codes: dict[int, str] = {}
+    seen: set[str] = set()
+    for index, payload in items.items():
+        if payload.custom_code:
+            if payload.custom_code in seen:
+                results[index] = BulkLinkResult(index=index, status=409, error="Custom code already in use")
+                continue
+            seen.add(payload.custom_code)
+        codes[index] = choose_code(payload.custom_code)
+
+    # one collision check for the whole batch; generated codes only need checking when the
+    # allocator can repeat itself, and then only the clashing ones are regenerated
+    to_check = [
+        code for index, code in codes.items()
+        if items[index].custom_code or not code_allocator.unique
+    ]
+    taken = existing_codes(session, to_check)
+    while True:
+        regenerate = []
+        for index, code in list(codes.items()):
+            if code not in taken:
+                continue
+            if items[index].custom_code:
+                results[index] = BulkLinkResult(index=index, status=409, error="Custom code already in use")
+                del codes[index]
+            else:
+                regenerate.append(index)
+        if not regenerate:
+            break
+        used = set(codes.values())
+        fresh = {}
+        for index in regenerate:
+            code = choose_code(None)
+            while code in used:
+                code = choose_code(None)
+            used.add(code)
+            fresh[index] = code
+        codes.update(fresh)
+        taken = existing_codes(session, fresh.values())
+    return codes
+
+
+def bulk_create_links(
+    session: Session,
+    user_id: int,
+    payloads: list[Optional[LinkCreate]],
+    errors: Optional[dict[int, str]] = None,
+) -> list[BulkLinkResult]:
+    """Create many links in a single transaction and return one result per input item.
+
+    `payloads` entries may be None when the caller already failed to parse them;
+    `errors` then maps their index to the parse error reported back as a 422.
+    """
+    results: dict[int, BulkLinkResult] = {}
+    for index, message in (errors or {}).items():
+        results[index] = BulkLinkResult(index=index, status=422, error=message)
+
+    items: dict[int, LinkCreate] = {}
+    for index, payload in enumerate(payloads):
+        if payload is None or index in results:
+            continue
+        if not sanitize_scheme(str(payload.original_url)):
+            results[index] = BulkLinkResult(index=index, status=422, error="Only http/https URLs are allowed")
+            continue
+        items[index] = payload
+
+    for attempt in range(INSERT_ATTEMPTS):
+        codes = _assign_codes(session, items, results)
+        now = datetime.utcnow()
+        rows = [
+            {
+                "short_code": code,
+                "original_url": str(items[index].original_url),
+                "label": items[index].label,
+                "expires_at": items[index].expires_at,
+                "permanent": items[index].permanent,
+                "cache_max_age": items[index].cache_max_age,
+                "created_at": now,
+                "click_count": 0,
+                "user_id": user_id,
+            }
+            for index, code in codes.items()
+        ]
+        try:
+            if rows:
+                session.connection().execute(insert(Link), rows)
+            session.commit()
+            break
+        except IntegrityError:
+            # another writer inserted one of our codes between the check and the insert
+            session.rollback()
+            for index in list(results):
+                if results[index].status == 409:
+                    del results[index]
+            if attempt == INSERT_ATTEMPTS - 1:
+                raise
+
+    for index, code in codes.items():
+        results[index] = BulkLinkResult(index=index, status=201, short_code=code)
+        revive_code(session.get_bind(), code)
+    return [results[index] for index in sorted(results)]
+
+
+# -----------------------------------------------------
+# Streamed import (CSV / NDJSON in the export format)
+# -----------------------------------------------------
+# turns one exported record into a LinkCreate; the exported short_code is kept as custom code
+def import_payload(record: dict) -> LinkCreate:
+    record = {key: value for key, value in record.items() if value not in ("", None)}
+    if "short_code" in record:
+        record.setdefault("custom_code", record.pop("short_code"))
+    return LinkCreate.model_validate(record)
+
+
+class CSVRecords:
+    """Turns CSV lines into dicts keyed by the header row; a quoted field may span several lines."""
+
+    def __init__(self):
+        self.header: Optional[list[str]] = None
+        self._pending = ""
+
+    # returns the record completed by this line, or None (header, blank line, unfinished record)
+    def feed(self, line: str) -> Optional[dict]:
+        self._pending = self._pending + "\n" + line if self._pending else line
+        if self._pending.count('"') % 2:
+            return None
+        row = next(csv.reader([self._pending]), [])
+        self._pending = ""
+        if self.header is None:
+            self.header = row
+            return None
+        return dict(zip(self.header, row)) if row else None
+
@@ -0,0 +1,107 @@
+# small in-process caches: a thread-safe LRU map with per-entry TTL, plus the redirect resolution cache
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Hashable, NamedTuple, Optional
+
+from app.metrics import CACHE_EVICTIONS, CACHE_HITS, CACHE_MISSES
+
+
+# -----------------------------------------------------
+# Generic LRU + TTL cache
+# -----------------------------------------------------
+class LRUTTLCache:
+    """Bounded mapping with least-recently-used eviction and a time-to-live per entry.
+
+    Safe to share between the threadpool workers that serve sync endpoints.
+    A maxsize of 0 disables the cache (every lookup is a miss, nothing is stored).
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = CACHE_HITS.labels(name)
+        self._misses = CACHE_MISSES.labels(name)
+        self._evictions = CACHE_EVICTIONS.labels(name)
+
+    # returns the cached value or None (counts a hit or a miss)
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                deadline, value = item
+                if deadline > now:
+                    self._data.move_to_end(key)
+                    self._hits.inc()
+                    return value
+                del self._data[key]
+        self._misses.inc()
+        return None
+
+    # stores a value, evicting the least recently used entries when full
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        deadline = time.monotonic() + self.ttl
+        evicted = 0
+        with self._lock:
+            self._data[key] = (deadline, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._evictions.inc(evicted)
+
+    # drops a single key (no-op if absent)
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# -----------------------------------------------------
+# Redirect resolution cache (short_code -> target)
+# -----------------------------------------------------
+class ResolvedLink(NamedTuple):
+    """Everything a redirect needs, including its pre-encoded response headers (see app/redirects.py)."""
+    original_url: str
+    expires_at: Optional[datetime]
+    status_code: int = 307
+    cache_max_age: Optional[int] = None
+    raw_headers: tuple = ()
+
+
+# size/ttl are configurable from the environment; REDIRECT_CACHE_SIZE=0 turns the cache off
+REDIRECT_CACHE_SIZE = int(os.getenv("REDIRECT_CACHE_SIZE", "10000"))
+REDIRECT_CACHE_TTL = float(os.getenv("REDIRECT_CACHE_TTL", "300"))
+
+redirect_cache = LRUTTLCache("redirect", REDIRECT_CACHE_SIZE, REDIRECT_CACHE_TTL)
+
+
+# -----------------------------------------------------
+# Session user cache (user_id -> identity)
+# -----------------------------------------------------
+class CachedUser(NamedTuple):
+    """Identity of the logged-in user as seen by handlers and templates (never the password hash)."""
+    id: int
+    username: str
+
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+user_cache = LRUTTLCache("user", USER_CACHE_SIZE, USER_CACHE_TTL)
@@ -0,0 +1,114 @@
+# cross-worker cache invalidation: with several worker processes every process has its own
+# redirect/user caches, so invalidations are appended to a table in the shared database and
+# each worker replays rows it has not seen yet on a short interval (CACHE_SYNC_INTERVAL).
+#
+# Staleness across workers is bounded by the poll interval (and always by the cache TTLs).
+
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Hashable, Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, delete, select
+
+from app.cache import LRUTTLCache, redirect_cache, user_cache
+from app.expiry import tombstones
+from app.models import CacheInvalidation
+from app.snapshot import code_snapshot
+
+# number of worker processes serving the app (set by gunicorn.conf.py, 1 for plain uvicorn)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# publish/replay invalidations through the database; on by default when running several workers
+CACHE_SYNC = os.getenv("CACHE_SYNC", "1" if WEB_CONCURRENCY > 1 else "0") == "1"
+
+# seconds between polls for invalidations published by other workers
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1"))
+
+# published rows older than this are deleted (they have been replayed or outlived every TTL)
+CACHE_SYNC_RETENTION = float(os.getenv("CACHE_SYNC_RETENTION", "3600"))
+
+
+class Fanout:
+    """Passes each invalidation on to several caches holding the same key."""
+
+    def __init__(self, *caches):
+        self.caches = caches
+
+    def invalidate(self, key: Hashable) -> None:
+        for cache in self.caches:
+            cache.invalidate(key)
+
+
+# caches that take part in syncing, with the function that turns a stored key back into a cache key;
+# a changed redirect target or revived code must not be served from the short-code snapshot either
+SYNCED_CACHES: dict[str, tuple[LRUTTLCache, Callable[[str], Hashable]]] = {
+    "redirect": (Fanout(redirect_cache, code_snapshot), str),
+    "user": (user_cache, int),
+    "tombstone": (Fanout(tombstones, code_snapshot), str),
+}
+
+
+class CacheSync:
+    """Publishes local invalidations to the database and replays the ones from other workers."""
+
+    def __init__(self, caches: dict = SYNCED_CACHES, enabled: bool = CACHE_SYNC):
+        self.caches = caches
+        self.enabled = enabled
+        # highest CacheInvalidation.id already replayed by this process
+        self.last_id = 0
+
+    # drops the key locally and, when syncing, records it for the other workers
+    def invalidate(self, engine, name: str, key: Hashable) -> None:
+        cache, _ = self.caches[name]
+        cache.invalidate(key)
+        if not self.enabled:
+            return
+        with Session(engine) as session:
+            session.add(CacheInvalidation(cache=name, key=str(key)))
+            session.commit()
+
+    # skips everything published before this process started (its caches are empty anyway), or only
+    # what was published before `since` (the short-code snapshot build, which already has those changes)
+    def start(self, engine, since: Optional[datetime] = None) -> None:
+        query = select(func.max(CacheInvalidation.id))
+        if since is not None:
+            query = query.where(CacheInvalidation.created_at < since)
+        with Session(engine) as session:
+            self.last_id = session.exec(query).one() or 0
+        if since is not None:
+            self.poll(engine)
+
+    # applies invalidations published since the last poll; returns how many rows were replayed
+    def poll(self, engine) -> int:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(CacheInvalidation.id, CacheInvalidation.cache, CacheInvalidation.key)
+                .where(CacheInvalidation.id > self.last_id)
+                .order_by(CacheInvalidation.id)
+            ).all()
+        for row_id, name, key in rows:
+            entry = self.caches.get(name)
+            if entry is not None:
+                cache, parse_key = entry
+                cache.invalidate(parse_key(key))
+            self.last_id = row_id
+        return len(rows)
+
+    # deletes published rows older than CACHE_SYNC_RETENTION seconds
+    def prune(self, engine, retention: float = CACHE_SYNC_RETENTION) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=retention)
+        with Session(engine) as session:
+            newest = session.exec(select(func.max(CacheInvalidation.id))).one()
+            if newest is None:
+                return
+            # keep the newest row so sqlite never hands out an id a worker has already seen
+            session.exec(
+                delete(CacheInvalidation).where(
+                    CacheInvalidation.created_at < cutoff, CacheInvalidation.id < newest
+                )
+            )
+            session.commit()
+
+
+cache_sync = CacheSync()
@@ -0,0 +1,215 @@
+# write-behind click counter: redirects record clicks in memory, a flusher applies them in one transaction
+# (bulk UPDATE of the Link counters, append to the click event log, incremental time-bucket rollups)
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, insert, update
+from sqlmodel import Session, select
+
+from app.metrics import CLICK_EVENTS_DROPPED, CLICK_FLUSHES, CLICK_FLUSH_ROWS
+from app.models import ClickEvent, ClickRollup, Link
+from app.schemas import LinkRead
+
+# flush every CLICK_FLUSH_INTERVAL seconds, or sooner once CLICK_FLUSH_THRESHOLD clicks are pending
+CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", "5"))
+CLICK_FLUSH_THRESHOLD = int(os.getenv("CLICK_FLUSH_THRESHOLD", "500"))
+
+# set CLICK_EVENTS=0 to keep only the counters (no per-click event log / rollups)
+CLICK_EVENTS = os.getenv("CLICK_EVENTS", "1") == "1"
+
+# upper bound on buffered events if flushes keep failing; older events are dropped beyond it
+CLICK_EVENTS_MAX = int(os.getenv("CLICK_EVENTS_MAX", "100000"))
+
+# longest referrer stored per event
+REFERRER_MAX_LEN = 512
+
+# rollup granularities and how to truncate a timestamp to the start of its bucket
+GRANULARITIES = {
+    "minute": lambda ts: ts.replace(second=0, microsecond=0),
+    "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "day": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+# returns a dialect-specific INSERT supporting ON CONFLICT (sqlite and postgresql)
+def _upsert_insert(dialect_name: str, table):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
+
+class ClickBuffer:
+    """Aggregates clicks per short_code until they are flushed to the database."""
+
+    def __init__(self, threshold: int, events: bool = CLICK_EVENTS):
+        self.threshold = threshold
+        self.events_enabled = events
+        # short_code -> [pending clicks, latest access time]
+        self._pending: dict[str, list] = {}
+        # (short_code, occurred_at, referrer, ua_family) per click, in arrival order; the oldest are
+        # dropped beyond CLICK_EVENTS_MAX
+        self._events: deque[tuple] = deque(maxlen=CLICK_EVENTS_MAX)
+        self._total = 0
+        self._lock = threading.Lock()
+        # serializes flushes so two flushers never race on the same batch
+        self._flush_lock = threading.Lock()
+
+    # records one click; returns True when the buffer has reached the flush threshold
+    def record(
+        self,
+        code: str,
+        when: Optional[datetime] = None,
+        referrer: Optional[str] = None,
+        ua_family: str = "Other",
+    ) -> bool:
+        when = when or datetime.utcnow()
+        with self._lock:
+            entry = self._pending.get(code)
+            if entry is None:
+                self._pending[code] = [1, when]
+            else:
+                entry[0] += 1
+                entry[1] = when
+            if self.events_enabled:
+                if len(self._events) == CLICK_EVENTS_MAX:
+                    CLICK_EVENTS_DROPPED.inc()
+                self._events.append((code, when, referrer[:REFERRER_MAX_LEN] if referrer else None, ua_family))
+            self._total += 1
+            return self._total >= self.threshold
+
+    # returns (pending clicks, latest access) for a code that has not been flushed yet
+    def pending(self, code: str) -> tuple[int, Optional[datetime]]:
+        with self._lock:
+            entry = self._pending.get(code)
+            return (entry[0], entry[1]) if entry else (0, None)
+
+    # drops pending clicks for a code whose link was deleted or renamed
+    def discard(self, code: str) -> None:
+        with self._lock:
+            entry = self._pending.pop(code, None)
+            if entry:
+                self._total -= entry[0]
+                self._events = deque((event for event in self._events if event[0] != code), maxlen=CLICK_EVENTS_MAX)
+
+    # writes all pending clicks in a single transaction; returns number of links updated
+    def flush(self, engine) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._total = self._pending, {}, 0
+                events, self._events = self._events, deque(maxlen=CLICK_EVENTS_MAX)
+            if not batch:
+                return 0
+
+            stmt = (
+                update(Link)
+                .where(Link.short_code == bindparam("code"))
+                .values(
+                    click_count=Link.click_count + bindparam("clicks"),
+                    last_accessed=bindparam("accessed"),
+                )
+            )
+            rows = [
+                {"code": code, "clicks": clicks, "accessed": accessed}
+                for code, (clicks, accessed) in batch.items()
+            ]
+            start = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    conn = session.connection()
+                    conn.execute(stmt, rows)
+                    if events:
+                        self._write_events(session, conn, events)
+                    session.commit()
+            except Exception:
+                # put the batch back so the next flush retries it
+                self._restore(batch, events)
+                raise
+            CLICK_FLUSHES.observe(time.perf_counter() - start)
+            CLICK_FLUSH_ROWS.inc(len(rows))
+            return len(rows)
+
+    # appends the raw events and folds them into the minute/hour/day rollups (same transaction)
+    def _write_events(self, session: Session, conn, events: deque[tuple]) -> None:
+        codes = list({event[0] for event in events})
+        link_ids: dict[str, int] = {}
+        for i in range(0, len(codes), 500):
+            chunk = codes[i:i + 500]
+            link_ids.update(
+                session.exec(select(Link.short_code, Link.id).where(Link.short_code.in_(chunk))).all()
+            )
+        event_rows = [
+            {"link_id": link_ids[code], "occurred_at": when, "referrer": referrer, "ua_family": family}
+            for code, when, referrer, family in events
+            if code in link_ids
+        ]
+        if not event_rows:
+            return
+        conn.execute(insert(ClickEvent), event_rows)
+
+        buckets: Counter = Counter()
+        for code, when, _, _ in events:
+            if code in link_ids:
+                for granularity, truncate in GRANULARITIES.items():
+                    buckets[(link_ids[code], granularity, truncate(when))] += 1
+        upsert = _upsert_insert(conn.dialect.name, ClickRollup.__table__)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=["link_id", "granularity", "bucket_start"],
+            set_={"clicks": ClickRollup.__table__.c.clicks + upsert.excluded.clicks},
+        )
+        conn.execute(
+            upsert,
+            [
+                {"link_id": link_id, "granularity": granularity, "bucket_start": bucket, "clicks": clicks}
+                for (link_id, granularity, bucket), clicks in buckets.items()
+            ],
+        )
+
+    def _restore(self, batch: dict[str, list], events: deque[tuple]) -> None:
+        with self._lock:
+            for code, (clicks, accessed) in batch.items():
+                entry = self._pending.get(code)
+                if entry is None:
+                    self._pending[code] = [clicks, accessed]
+                else:
+                    entry[0] += clicks
+                    if accessed > entry[1]:
+                        entry[1] = accessed
+                self._total += clicks
+            # newer events win when both do not fit
+            events.extend(self._events)
+            self._events = events
+
+
+click_buffer = ClickBuffer(CLICK_FLUSH_THRESHOLD)
+
+
+# returns the link's click_count / last_accessed including clicks still waiting in the buffer
+def merged_clicks(link: Link) -> tuple[int, Optional[datetime]]:
+    clicks, accessed = click_buffer.pending(link.short_code)
+    last = link.last_accessed
+    if accessed and (last is None or accessed > last):
+        last = accessed
+    return link.click_count + clicks, last
+
+
+# serializes a Link with clicks still waiting in the buffer merged in
+def link_read(link: Link) -> LinkRead:
+    click_count, last_accessed = merged_clicks(link)
+    return LinkRead(
+        short_code=link.short_code,
+        original_url=link.original_url,
+        label=link.label,
+        created_at=link.created_at,
+        expires_at=link.expires_at,
+        click_count=click_count,
+        last_accessed=last_accessed,
+        permanent=link.permanent,
+        cache_max_age=link.cache_max_age,
+    )
@@ -1,17 +1,157 @@
-from sqlmodel import SQLModel, create_engine, Session
+import os
 
-# sqlite database URL
-DATABASE_URL = "sqlite:///./minilink.sqlite3"  
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.engine import make_url
+from sqlmodel import SQLModel, create_engine, Session, select
 
-# create the database engine to manage connections to db
-engine = create_engine(DATABASE_URL, echo=False)
+from app.profiling import SQL_TIMING, instrument_engine
+
+# database URL, read from the environment (defaults to a local sqlite file)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./minilink.sqlite3")
+
+# optional separate URL for read-only traffic (e.g. a replica); defaults to DATABASE_URL
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", DATABASE_URL)
+
+# set ASYNC_DB=1 to serve the hot API/redirect endpoints with async handlers on an aiosqlite engine
+ASYNC_DB = os.getenv("ASYNC_DB", "0") == "1"
+
+# -----------------------------------------------------
+# Tuning (all overridable from the environment)
+# -----------------------------------------------------
+# connection pool size per engine, and how many extra connections may be opened under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# sqlite pragmas applied to every new connection; WAL lets readers run alongside the writer
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64 MiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+
+# returns True for sqlite URLs (pragmas and pool rules only apply there)
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+# registers a connect hook that applies the sqlite pragmas; read_only engines also set query_only
+def apply_sqlite_pragmas(sync_engine, read_only: bool = False) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            # journal mode is a property of the file, so only the writer sets it
+            if read_only and name == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+# builds an engine for url with pool sizing, statement timing and (for sqlite) the pragma hook
+def build_engine(url: str, read_only: bool = False):
+    kwargs = {}
+    database = make_url(url).database
+    if not is_sqlite(url) or (database and database != ":memory:"):
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    db_engine = create_engine(url, echo=False, pool_pre_ping=not is_sqlite(url), **kwargs)
+    if is_sqlite(url):
+        apply_sqlite_pragmas(db_engine, read_only=read_only)
+    if SQL_TIMING:
+        instrument_engine(db_engine)
+    return db_engine
+
+
+# create the database engines: one for writes, one read-only pool for the read-heavy endpoints
+engine = build_engine(DATABASE_URL)
+read_engine = build_engine(DATABASE_READ_URL, read_only=True)
+
+# async engine is created on first use so aiosqlite is only imported when needed
+_async_engine = None
 
 # dependency to get a session, used in FastAPI endpoints, yields sqlmodel session
 def get_session():
     with Session(engine) as session:
         yield session
 
+# dependency for endpoints that only read (redirect, stats, listings); uses the read-only engine
+def get_read_session():
+    with Session(read_engine) as session:
+        yield session
+
+# maps a sync driver URL to its asyncio driver (sqlite -> sqlite+aiosqlite)
+def async_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+# returns the shared async engine, creating it on first call
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        _async_engine = create_async_engine(async_url(DATABASE_URL), echo=False)
+        if is_sqlite(DATABASE_URL):
+            apply_sqlite_pragmas(_async_engine.sync_engine)
+        if SQL_TIMING:
+            instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+# async dependency to get a session, yields sqlmodel AsyncSession
+async def get_async_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+# disposes the async engine's pooled connections (called on shutdown)
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
 # function to initialize the database (create tables)
 def init_db():
     from app import models
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    from app.migrations import apply_migrations
+    for attempt in range(3):
+        try:
+            SQLModel.metadata.create_all(engine)
+            break
+        except OperationalError:
+            # another worker created the same table between our check and CREATE; retry sees it
+            if attempt == 2:
+                raise
+    # create_all skips tables that already exist; migrations bring older databases up to date
+    apply_migrations(engine)
+
+# reserves `size` consecutive ids from the named counter; returns the first id of the block
+def reserve_id_block(name: str, size: int) -> int:
+    from app.models import CodeSequence
+    for _ in range(3):
+        with Session(engine) as session:
+            # UPDATE first so the row stays locked until commit (no other worker gets the same block)
+            result = session.connection().execute(
+                update(CodeSequence)
+                .where(CodeSequence.name == name)
+                .values(next_value=CodeSequence.next_value + size)
+            )
+            if result.rowcount:
+                end = session.exec(select(CodeSequence.next_value).where(CodeSequence.name == name)).one()
+                session.commit()
+                return end - size
+            session.add(CodeSequence(name=name, next_value=size))
+            try:
+                session.commit()
+                return 0
+            except IntegrityError:
+                # another worker created the counter first; retry the UPDATE
+                continue
+    raise RuntimeError(f"could not reserve ids from sequence {name!r}")
@@ -0,0 +1,175 @@
+# expiry sweeper: deletes expired links in batched transactions (walking the expires_at index)
+# and remembers their short codes as tombstones, so /r/{code} keeps answering 410 without a DB hit
+#
+# Tombstones are also written to the linktombstone table in the sweep transaction; every worker
+# loads new rows from it on each tick, so all processes answer 410 for codes swept by any of them.
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import Session, delete, select
+
+from app.cache import redirect_cache
+from app.clicks import _upsert_insert, click_buffer
+from app.metrics import EXPIRY_SWEEPS, EXPIRY_SWEPT, TOMBSTONE_HITS, TOMBSTONES
+from app.models import ClickEvent, ClickRollup, Link, LinkTombstone
+from app.trending import trending
+
+# seconds between sweeps (0 disables the sweeper)
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "60"))
+
+# links deleted per transaction, so a large backlog never holds the write lock for long
+EXPIRY_SWEEP_BATCH = int(os.getenv("EXPIRY_SWEEP_BATCH", "500"))
+
+# days a swept code keeps answering 410 before it is forgotten (and then answers 404)
+EXPIRY_TOMBSTONE_DAYS = float(os.getenv("EXPIRY_TOMBSTONE_DAYS", "30"))
+
+# upper bound on tombstones held in memory per process; the oldest are dropped beyond it
+EXPIRY_TOMBSTONE_MAX = int(os.getenv("EXPIRY_TOMBSTONE_MAX", "1000000"))
+
+
+# -----------------------------------------------------
+# Tombstone set
+# -----------------------------------------------------
+class Tombstones:
+    """Insertion-ordered set of swept short codes, loaded incrementally from linktombstone."""
+
+    def __init__(self, maxsize: int = EXPIRY_TOMBSTONE_MAX):
+        self.maxsize = maxsize
+        self._codes: dict[str, None] = {}
+        self._lock = threading.Lock()
+        # highest LinkTombstone.id loaded so far
+        self.last_id = 0
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._codes
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    # True when code belongs to a swept link; counted as a 410 answered without the database
+    def hit(self, code: str) -> bool:
+        if code in self._codes:
+            TOMBSTONE_HITS.inc()
+            return True
+        return False
+
+    def add(self, codes) -> None:
+        with self._lock:
+            for code in codes:
+                self._codes[code] = None
+            while len(self._codes) > self.maxsize:
+                del self._codes[next(iter(self._codes))]
+        TOMBSTONES.set(len(self._codes))
+
+    # drops a code that is in use again (same name as LRUTTLCache.invalidate, so cache_sync can replay it)
+    def invalidate(self, code: str) -> None:
+        with self._lock:
+            self._codes.pop(code, None)
+        TOMBSTONES.set(len(self._codes))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._codes.clear()
+            self.last_id = 0
+        TOMBSTONES.set(0)
+
+    # loads tombstones recorded since the last call (by this or any other worker)
+    def load(self, engine) -> int:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(LinkTombstone.id, LinkTombstone.short_code)
+                .where(LinkTombstone.id > self.last_id)
+                .order_by(LinkTombstone.id)
+            ).all()
+        if rows:
+            self.add(code for _, code in rows)
+            self.last_id = rows[-1][0]
+        return len(rows)
+
+    # replaces the set with the current table contents (after pruning), without an empty window
+    def reload(self, engine) -> None:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(LinkTombstone.id, LinkTombstone.short_code).order_by(LinkTombstone.id)
+            ).all()
+        codes = dict.fromkeys(code for _, code in rows[-self.maxsize:])
+        with self._lock:
+            self._codes = codes
+            self.last_id = rows[-1][0] if rows else self.last_id
+        TOMBSTONES.set(len(codes))
+
+
+tombstones = Tombstones()
+
+
+# -----------------------------------------------------
+# Sweeper
+# -----------------------------------------------------
+# next batch of expired links, oldest expiry first (served by ix_link_expires_at)
+def expired_links_query(now: datetime, batch: int):
+    return (
+        select(Link.id, Link.short_code, Link.expires_at)
+        .where(Link.expires_at <= now)
+        .order_by(Link.expires_at)
+        .limit(batch)
+    )
+
+
+# deletes links that expired before `now` (with their analytics) in batches; returns links deleted
+def sweep_expired(engine, now: Optional[datetime] = None, batch: int = EXPIRY_SWEEP_BATCH) -> int:
+    now = now or datetime.utcnow()
+    swept = 0
+    start = time.perf_counter()
+    while True:
+        with Session(engine) as session:
+            rows = session.exec(expired_links_query(now, batch)).all()
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+            session.exec(delete(ClickRollup).where(ClickRollup.link_id.in_(ids)))
+            session.exec(delete(ClickEvent).where(ClickEvent.link_id.in_(ids)))
+            session.exec(delete(Link).where(Link.id.in_(ids)))
+            conn = session.connection()
+            conn.execute(
+                _upsert_insert(conn.dialect.name, LinkTombstone.__table__).on_conflict_do_nothing(),
+                [{"short_code": code, "expired_at": expires_at, "swept_at": now} for _, code, expires_at in rows],
+            )
+            session.commit()
+        codes = [row[1] for row in rows]
+        for code in codes:
+            redirect_cache.invalidate(code)
+            click_buffer.discard(code)
+            trending.discard(code)
+        tombstones.add(codes)
+        swept += len(rows)
+        EXPIRY_SWEPT.inc(len(rows))
+        if len(rows) < batch:
+            break
+    EXPIRY_SWEEPS.observe(time.perf_counter() - start)
+    return swept
+
+
+# forgets tombstones older than EXPIRY_TOMBSTONE_DAYS and reloads the in-memory set; returns rows dropped
+# (every worker calls this, so the ones that find nothing left to delete still drop the forgotten codes)
+def prune_tombstones(engine, days: float = EXPIRY_TOMBSTONE_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with Session(engine) as session:
+        result = session.exec(delete(LinkTombstone).where(LinkTombstone.swept_at < cutoff))
+        session.commit()
+    tombstones.reload(engine)
+    return result.rowcount
+
+
+# a swept code was taken again (custom codes): stop answering 410 for it in every worker
+def revive_code(engine, code: str) -> None:
+    if code not in tombstones:
+        return
+    from app.cache_sync import cache_sync
+    with Session(engine) as session:
+        session.exec(delete(LinkTombstone).where(LinkTombstone.short_code == code))
+        session.commit()
+    cache_sync.invalidate(engine, "tombstone", code)
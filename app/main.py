@@ -1,53 +1,171 @@
 # app/main.py
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 from typing import Optional
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
 import time
 
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Form
-from fastapi.responses import HTMLResponse, Response
-from fastapi.templating import Jinja2Templates
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, BackgroundTasks, Query
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from starlette.responses import RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
-from sqlmodel import Session, select
 
-from app.db import init_db, get_session
+from app.db import ASYNC_DB, init_db, engine, dispose_async_engine
 from app.models import Link, User
-from app.schemas import LinkCreate, LinkRead, LinkUpdate, StatsRead
-from app.services import choose_code, sanitize_scheme
-from app.auth import hash_password, verify_password
+from app.schemas import LinkCreate, LinkRead, LinkUpdate, StatsRead, BulkCreateResponse, TimeseriesRead, TimeseriesPoint, TrendingLink, TrendingRead
+from app.services import choose_code, naive_utc, sanitize_scheme, ua_family
+from app.bulk import BULK_MAX_ITEMS, IMPORT_CHUNK, CSVRecords, import_payload
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.manage import SEED_DEMO_USER, seed_demo_user
+from app.repositories import LinkRepository, Repositories, UserRepository, get_read_repositories, get_repositories, open_repositories
 
 from fastapi.staticfiles import StaticFiles
 
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+
+from app.cache import CachedUser, redirect_cache, user_cache
+from app.cache_sync import CACHE_SYNC_INTERVAL, cache_sync
+from app.expiry import EXPIRY_SWEEP_INTERVAL, prune_tombstones, revive_code, sweep_expired, tombstones
+from app.clicks import CLICK_FLUSH_INTERVAL, GRANULARITIES, click_buffer, link_read, merged_clicks
+from app.metrics import BACKGROUND_FAILURES, MetricsMiddleware
+from app.serialization import FAST_JSON, FastJSONResponse, link_dict
+from app.profiling import PROFILER_ENABLED, PROFILER_MAX_SECONDS, ProfilerBusy, TimedJSONResponse, profiler
+from app.templating import join_chunks, render, stream_template
+from app.redirects import REDIRECT_FAST_PATH, FastRedirectMiddleware, redirect_response, resolve_link, warm_redirect_cache
+from app.trending import TRENDING_FOLD_INTERVAL, TRENDING_TOP_K, trending
+from app.snapshot import code_snapshot
+from app.admission import ADMISSION_CONTROL, AdmissionMiddleware
+
+logger = logging.getLogger("minilink.tasks")
 
 # -------------------------------
 # Lifespan (startup/shutdown)
 # -------------------------------
+async def flush_clicks_periodically():
+    # Write buffered clicks to the DB every CLICK_FLUSH_INTERVAL seconds
+    while True:
+        await asyncio.sleep(CLICK_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(click_buffer.flush, engine)
+        except Exception:
+            # keep the loop alive; the batch stays buffered for the next attempt
+            BACKGROUND_FAILURES.labels("flush_clicks").inc()
+            logger.exception("click flush failed; retrying in %ss", CLICK_FLUSH_INTERVAL)
+
+async def sweep_expired_periodically():
+    # Delete expired links in batches; pick up tombstones swept by other workers; prune old ones daily
+    next_prune = time.monotonic() + 86400
+    while True:
+        await asyncio.sleep(EXPIRY_SWEEP_INTERVAL)
+        try:
+            await asyncio.to_thread(tombstones.load, engine)
+            await asyncio.to_thread(sweep_expired, engine)
+            if time.monotonic() >= next_prune:
+                await asyncio.to_thread(prune_tombstones, engine)
+                next_prune = time.monotonic() + 86400
+        except Exception:
+            # e.g. another worker holds the write lock; retried on the next tick
+            BACKGROUND_FAILURES.labels("sweep_expired").inc()
+            logger.exception("expiry sweep failed; retrying in %ss", EXPIRY_SWEEP_INTERVAL)
+
+async def sync_caches_periodically():
+    # Replay cache invalidations published by other workers; prune old ones now and then
+    polls = 0
+    while True:
+        await asyncio.sleep(CACHE_SYNC_INTERVAL)
+        try:
+            await asyncio.to_thread(cache_sync.poll, engine)
+            polls += 1
+            if polls % 600 == 0:
+                await asyncio.to_thread(cache_sync.prune, engine)
+        except Exception:
+            # invalidations stay in the table; the next poll replays them
+            BACKGROUND_FAILURES.labels("sync_caches").inc()
+            logger.exception("cache sync failed; retrying in %ss", CACHE_SYNC_INTERVAL)
+
+async def fold_trending_periodically():
+    # Move clicks counted by redirects into the trending sketches, off the request path
+    while True:
+        await asyncio.sleep(TRENDING_FOLD_INTERVAL)
+        try:
+            await asyncio.to_thread(trending.fold)
+        except Exception:
+            # keep the loop alive; the next tick folds the clicks counted since
+            BACKGROUND_FAILURES.labels("fold_trending").inc()
+            logger.exception("trending fold failed; retrying in %ss", TRENDING_FOLD_INTERVAL)
+
+async def refresh_snapshot_periodically():
+    # Rebuild the short-code snapshot when it is due (one worker at a time) and map the newest one
+    while True:
+        await asyncio.sleep(code_snapshot.interval)
+        try:
+            await asyncio.to_thread(code_snapshot.refresh, engine)
+        except Exception:
+            # keep serving the mapped snapshot (and the database); retried on the next tick
+            BACKGROUND_FAILURES.labels("refresh_snapshot").inc()
+            logger.exception("snapshot refresh failed; retrying in %ss", code_snapshot.interval)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables
+    # Create tables (idempotent; under gunicorn the master already did this before forking)
     init_db()
 
-    # Optional: seed a default demo account (admin / 123) if missing
-    # Matches your README so graders can log in immediately.
-    from sqlmodel import SQLModel, create_engine
-    # Reuse the same engine via get_session instead of making a new one:
-    with next(get_session()) as session:
-        existing = session.exec(select(User).where(User.username == "admin")).first()
-        if not existing:
-            demo = User(username="admin", password_hash=hash_password("123"))
-            session.add(demo)
-            session.commit()
+    # Optional demo account (admin / 123), stored with a precomputed hash; see app/manage.py
+    if SEED_DEMO_USER:
+        seed_demo_user()
+
+    # Codes of links already swept answer 410 straight from memory
+    tombstones.load(engine)
+
+    # Rebuild the trending windows from recent rollups and pre-load their hottest codes
+    trending.load_recent(engine)
+    warm_redirect_cache(trending.hottest())
+
+    # Short-code snapshot shared by all workers (built by the gunicorn master before forking). Changes
+    # made before this process started are not in its dirty set: a single process rebuilds, workers
+    # replay the invalidations published since the build (cache_sync below)
+    code_snapshot.refresh(engine, max_age=None if cache_sync.enabled else 0)
+
+    flusher = asyncio.create_task(flush_clicks_periodically())
+    folder = asyncio.create_task(fold_trending_periodically()) if trending.windows else None
+    snapshotter = asyncio.create_task(refresh_snapshot_periodically()) if code_snapshot.enabled else None
+    sweeper = None
+    if EXPIRY_SWEEP_INTERVAL > 0:
+        sweeper = asyncio.create_task(sweep_expired_periodically())
+    syncer = None
+    if cache_sync.enabled:
+        cache_sync.start(engine, since=code_snapshot.built_at)
+        syncer = asyncio.create_task(sync_caches_periodically())
 
     yield
-    # No shutdown actions for now
+
+    # Shutdown: stop the periodic flusher and persist any remaining clicks
+    for task in (flusher, folder, snapshotter, sweeper, syncer):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await asyncio.to_thread(click_buffer.flush, engine)
+    await dispose_async_engine()
+
+    # Wait for the hashing pool's worker processes to exit (only if a signup/login started it)
+    auth = sys.modules.get("app.auth")
+    if auth is not None:
+        await asyncio.to_thread(auth.shutdown_hash_pool)
 
 # -------------------------------
 # App + Middleware
 # -------------------------------
-app = FastAPI(title="minilink", lifespan=lifespan)
+# JSON rendering is timed as the "serialize" phase (Server-Timing, minilink_request_phase_seconds)
+app = FastAPI(title="minilink", lifespan=lifespan, default_response_class=TimedJSONResponse)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -56,66 +174,124 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 SESSION_SECRET = os.getenv("SESSION_SECRET", "dev-insecure-session-key-change-me")
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
 
-# Jinja templates
-templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates"))
-
-@app.middleware("http")
-async def metrics_middleware(request: Request, call_next):
-    # Don't double-count the metrics endpoint itself
-    if request.url.path.startswith("/metrics"):
-        return await call_next(request)
-
-    start = time.perf_counter()
-    method = request.method
-    path = request.url.path
+# Jinja templates: bytecode-cached environment created on the first render, see app/templating.py
 
-    try:
-        response = await call_next(request)
-        status_code = response.status_code
-        # Count all requests by method / path / status
-        REQUEST_COUNT.labels(method, path, str(status_code)).inc()
-        return response
-    except Exception:
-        # Count server errors
-        REQUEST_ERRORS.labels(method, path).inc()
-        # Record as 500 in total requests
-        REQUEST_COUNT.labels(method, path, "500").inc()
-        raise
-    finally:
-        elapsed = time.perf_counter() - start
-        # Observe latency in seconds
-        REQUEST_LATENCY.labels(method, path).observe(elapsed)
-
-# -------------------------------
-# Metrics (Prometheus)
-# -------------------------------
-REQUEST_COUNT = Counter(
-    "minilink_requests_total",
-    "Total HTTP requests",
-    ["method", "path", "status"],
-)
+# Request metrics, labelled by route template; wraps sessions, routing and the handlers, but not the
+# optional middlewares added below (the redirect fast path records its own metrics, shed requests
+# show up in minilink_admission_shed_total)
+app.add_middleware(MetricsMiddleware)
 
-REQUEST_LATENCY = Histogram(
-    "minilink_request_latency_seconds",
-    "Request latency in seconds",
-    ["method", "path"],
-)
+# Optional fast path for GET /r/{code}, ahead of everything else (sessions, routing, DI)
+if REDIRECT_FAST_PATH:
+    app.add_middleware(FastRedirectMiddleware)
 
-REQUEST_ERRORS = Counter(
-    "minilink_request_errors_total",
-    "Total HTTP 5xx errors",
-    ["method", "path"],
-)
+# Optional admission control / load shedding in front of all of it, see app/admission.py
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
 
 # -------------------------------
 # Helpers
 # -------------------------------
-def get_current_user(request: Request, session: Session) -> Optional[User]:
-    """Return the logged-in User or None."""
+def get_current_user(request: Request, users: UserRepository) -> Optional[CachedUser]:
+    """Return the logged-in user's identity or None (cached, so most requests skip the User SELECT)."""
     uid = request.session.get("user_id")
     if not uid:
         return None
-    return session.get(User, uid)
+    cached = user_cache.get(uid)
+    if cached is not None:
+        return cached
+    user = users.get(uid)
+    if not user:
+        return None
+    cached = CachedUser(user.id, user.username)
+    user_cache.set(uid, cached)
+    return cached
+
+def forget_user(request: Request):
+    """Log out: drop the cached identity and clear the session cookie."""
+    uid = request.session.get("user_id")
+    if uid:
+        cache_sync.invalidate(engine, "user", uid)
+    request.session.clear()
+
+def stream_link_reads(user_id: int, sort: str):
+    """Yield LinkRead for all of a user's links from their own repositories (outlive the request's dependencies)."""
+    with open_repositories(read_only=True) as repos:
+        for link in repos.links.iter_all(user_id, sort):
+            yield link_read(link)
+
+async def body_lines(request: Request):
+    """Yield the request body line by line as it arrives (without the line terminators)."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if pending:
+        yield pending.rstrip(b"\r")
+
+class BodyStreamingResponse(StreamingResponse):
+    """StreamingResponse whose iterator reads the request body itself (streamed upload -> streamed result).
+
+    Starlette's version listens for a disconnect on receive() while streaming, which
+    would swallow body chunks the iterator has not read yet; a disconnect surfaces as
+    ClientDisconnect from request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+# CSV columns for link exports (same fields as LinkRead)
+EXPORT_FIELDS = list(LinkRead.model_fields)
+
+def csv_lines(items):
+    """Yield a CSV header and one encoded line per LinkRead, without building the whole file."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for item in items:
+        writer.writerow(item.model_dump())
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+# attempts at inserting a link with a freshly generated code before giving up
+CODE_ATTEMPTS = 5
+
+def insert_link(links: LinkRepository, custom_code: Optional[str], **fields) -> Link:
+    """Insert a Link, relying on the unique index instead of a pre-check query.
+
+    A clash on a custom code is a 409; a clash on a generated code (only possible
+    against custom or legacy random codes) is retried with the next generated code.
+    """
+    for _ in range(CODE_ATTEMPTS):
+        link = Link(short_code=choose_code(custom_code), **fields)
+        if not links.add(link):
+            if custom_code:
+                raise HTTPException(status_code=409, detail="Custom code already in use")
+            continue
+        # the code (custom, or a generated random one) may belong to a swept, expired link; it is live again now
+        revive_code(engine, link.short_code)
+        return link
+    raise HTTPException(status_code=503, detail="Could not allocate a short code, try again")
+
+def import_chunk(user_id: int, payloads: list[Optional[LinkCreate]], errors: dict[int, str]):
+    """Insert one import chunk in its own transaction (the request's repositories are closed while streaming)."""
+    with open_repositories() as repos:
+        return repos.links.bulk_create(user_id, payloads, errors)
+
+# -------------------------------
+# Async hot path (ASYNC_DB=1)
+# -------------------------------
+# Registered before the sync routes below so these handlers take precedence;
+# the sync versions are then hidden from the OpenAPI schema.
+if ASYNC_DB:
+    from app.async_routes import router as async_router
+    app.include_router(async_router)
 
 # -------------------------------
 # Health
@@ -133,66 +309,265 @@ def metrics():
     Exposes Prometheus metrics in text format.
     Prometheus (or Docker/localhost) can scrape this at /metrics.
     """
-    data = generate_latest()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # multi-worker mode: aggregate the per-process metric files of all workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        data = generate_latest(registry)
+    else:
+        data = generate_latest()
     return Response(content=data, media_type=CONTENT_TYPE_LATEST)
 
+# -------------------------------
+# Sampling profiler (PROFILER_ENABLED=1)
+# -------------------------------
+@app.get("/debug/profile", include_in_schema=False)
+async def debug_profile(seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS)):
+    """Sample this worker's thread stacks for `seconds`; returns collapsed stacks for flamegraph.pl / speedscope."""
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        stacks = await run_in_threadpool(profiler.capture, seconds)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    return PlainTextResponse(stacks)
+
 # -------------------------------
 # API: CREATE LINK
 # -------------------------------
-@app.post("/api/links", response_model=LinkRead, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/api/links",
+    response_model=LinkRead,
+    status_code=status.HTTP_201_CREATED,
+    include_in_schema=not ASYNC_DB,
+)
 def create_link(
     payload: LinkCreate,
     request: Request,
-    session: Session = Depends(get_session),
+    repos: Repositories = Depends(get_repositories),
 ):
-    user = get_current_user(request, session)
+    user = get_current_user(request, repos.users)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
 
     if not sanitize_scheme(str(payload.original_url)):
         raise HTTPException(status_code=422, detail="Only http/https URLs are allowed")
 
-    code = choose_code(payload.custom_code)
-    exists = session.exec(select(Link).where(Link.short_code == code)).first()
-    if exists:
-        raise HTTPException(status_code=409, detail="Custom code already in use")
-
-    link = Link(
-        short_code=code,
+    link = insert_link(
+        repos.links,
+        payload.custom_code,
         original_url=str(payload.original_url),
         expires_at=payload.expires_at,
         label=payload.label,
+        permanent=payload.permanent,
+        cache_max_age=payload.cache_max_age,
         user_id=user.id,
     )
-    session.add(link)
-    session.commit()
-    session.refresh(link)
+    if FAST_JSON:
+        return FastJSONResponse(link_dict(link), status_code=status.HTTP_201_CREATED)
     return link
 
+# -------------------------------
+# API: BULK CREATE
+# -------------------------------
+@app.post("/api/links/bulk", response_model=BulkCreateResponse)
+def create_links_bulk(
+    payloads: list[LinkCreate],
+    request: Request,
+    repos: Repositories = Depends(get_repositories),
+):
+    user = get_current_user(request, repos.users)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+    if len(payloads) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} links per request")
+
+    results = repos.links.bulk_create(user.id, payloads)
+    created = sum(1 for r in results if r.status == 201)
+    return BulkCreateResponse(created=created, failed=len(results) - created, results=results)
+
+# NDJSON variant: one LinkCreate object per line, streamed in; one result line per input line
+@app.post("/api/links/bulk/ndjson")
+async def create_links_bulk_ndjson(request: Request, repos: Repositories = Depends(get_repositories)):
+    user = await run_in_threadpool(get_current_user, request, repos.users)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+
+    payloads: list[Optional[LinkCreate]] = []
+    errors: dict[int, str] = {}
+
+    def parse(line: bytes):
+        if not line.strip():
+            return
+        if len(payloads) >= BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} links per request")
+        try:
+            payloads.append(LinkCreate.model_validate_json(line))
+        except ValidationError as exc:
+            errors[len(payloads)] = exc.errors(include_url=False)[0]["msg"]
+            payloads.append(None)
+
+    # validate lines as they arrive instead of buffering the whole body
+    async for line in body_lines(request):
+        parse(line)
+
+    results = await run_in_threadpool(repos.links.bulk_create, user.id, payloads, errors)
+    body = "".join(r.model_dump_json(exclude_none=True) + "\n" for r in results)
+    return Response(content=body, media_type="application/x-ndjson")
+
 # -------------------------------
 # API: LIST LINKS (per-user)
 # -------------------------------
-@app.get("/api/links", response_model=list[LinkRead])
-def list_links(request: Request, session: Session = Depends(get_session)):
-    user = get_current_user(request, session)
+@app.get("/api/links", response_model=list[LinkRead], include_in_schema=not ASYNC_DB)
+def list_links(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "newest",
+    label: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    repos: Repositories = Depends(get_read_repositories),
+):
+    user = get_current_user(request, repos.users)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+
+    # Keyset pagination: the next page starts after the last row of this one
+    # (fast JSON mode reads column rows instead of Link objects)
+    page = repos.links.page_rows if FAST_JSON else repos.links.page
+    links, next_cursor = page(user.id, sort, limit, cursor, label, created_after, created_before)
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    if FAST_JSON:
+        return FastJSONResponse([link_dict(link) for link in links], headers=headers)
+    response.headers.update(headers)
+    return [link_read(link) for link in links]
+
+# -------------------------------
+# API: EXPORT (streamed, per-user)
+# -------------------------------
+# Registered before /api/links/{code} so "export" is not taken for a short code
+@app.get("/api/links/export")
+def export_links(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    repos: Repositories = Depends(get_read_repositories),
+):
+    user = get_current_user(request, repos.users)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+
+    # The generator opens its own repositories: the dependency's are closed before streaming starts.
+    # One query read through a server-side cursor; buffered clicks are merged per row.
+    def rows():
+        with open_repositories(read_only=True) as export_repos:
+            for row in export_repos.links.export_rows(user.id):
+                yield link_read(row)
+
+    if format == "csv":
+        return StreamingResponse(
+            join_chunks(csv_lines(rows())),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="links.csv"'},
+        )
+    return StreamingResponse(
+        join_chunks(item.model_dump_json() + "\n" for item in rows()),
+        media_type="application/x-ndjson",
+    )
+
+# -------------------------------
+# API: IMPORT (streamed)
+# -------------------------------
+@app.post("/api/links/import")
+async def import_links(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    repos: Repositories = Depends(get_repositories),
+):
+    """Import links in the export format (CSV or NDJSON), IMPORT_CHUNK rows per transaction.
+
+    Exported short codes are kept. The response is NDJSON streamed while the upload is
+    read: a result line per failed row, and a progress line after every committed chunk.
+    """
+    user = await run_in_threadpool(get_current_user, request, repos.users)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
-    return session.exec(select(Link).where(Link.user_id == user.id)).all()
+
+    async def progress():
+        processed = created = failed = 0
+        payloads: list[Optional[LinkCreate]] = []
+        errors: dict[int, str] = {}
+        records = CSVRecords() if format == "csv" else None
+
+        async def commit_chunk() -> str:
+            nonlocal processed, created, failed, payloads, errors
+            results = await run_in_threadpool(import_chunk, user.id, payloads, errors)
+            lines = []
+            for result in results:
+                if result.status == 201:
+                    created += 1
+                    continue
+                failed += 1
+                result.index += processed
+                lines.append(result.model_dump_json(exclude_none=True))
+            processed += len(payloads)
+            payloads, errors = [], {}
+            lines.append(json.dumps({"processed": processed, "created": created, "failed": failed}))
+            return "\n".join(lines) + "\n"
+
+        async for line in body_lines(request):
+            try:
+                text = line.decode("utf-8")
+                if records is not None:
+                    record = records.feed(text)
+                    if record is None:
+                        continue
+                elif not text.strip():
+                    continue
+                else:
+                    record = json.loads(text)
+                    if not isinstance(record, dict):
+                        raise ValueError("Expected a JSON object")
+                payloads.append(import_payload(record))
+            except ValidationError as exc:
+                errors[len(payloads)] = exc.errors(include_url=False)[0]["msg"]
+                payloads.append(None)
+            except UnicodeDecodeError:
+                errors[len(payloads)] = "Line is not valid UTF-8"
+                payloads.append(None)
+            except ValueError as exc:
+                errors[len(payloads)] = str(exc)
+                payloads.append(None)
+            if len(payloads) >= IMPORT_CHUNK:
+                yield await commit_chunk()
+        if payloads:
+            yield await commit_chunk()
+        yield json.dumps({"done": True, "processed": processed, "created": created, "failed": failed}) + "\n"
+
+    return BodyStreamingResponse(progress(), media_type="application/x-ndjson")
 
 # -------------------------------
 # API: READ (per-user)
 # -------------------------------
 @app.get("/api/links/{code}", response_model=LinkRead)
-def read_link(code: str, request: Request, session: Session = Depends(get_session)):
-    user = get_current_user(request, session)
+def read_link(code: str, request: Request, repos: Repositories = Depends(get_repositories)):
+    user = get_current_user(request, repos.users)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
-    link = session.exec(
-        select(Link).where(Link.short_code == code, Link.user_id == user.id)
-    ).first()
+    if FAST_JSON:
+        row = repos.links.get_row(code, user.id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Not found")
+        return FastJSONResponse(link_dict(row))
+    link = repos.links.get(code, user.id)
     if not link:
         raise HTTPException(status_code=404, detail="Not found")
-    return link
+    return link_read(link)
 
 # -------------------------------
 # API: UPDATE (per-user)
@@ -202,15 +577,13 @@ def update_link(
     code: str,
     payload: LinkUpdate,
     request: Request,
-    session: Session = Depends(get_session),
+    repos: Repositories = Depends(get_repositories),
 ):
-    user = get_current_user(request, session)
+    user = get_current_user(request, repos.users)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
 
-    link = session.exec(
-        select(Link).where(Link.short_code == code, Link.user_id == user.id)
-    ).first()
+    link = repos.links.get(code, user.id)
     if not link:
         raise HTTPException(status_code=404, detail="Not found")
 
@@ -225,16 +598,26 @@ def update_link(
     if payload.label is not None:
         link.label = payload.label
 
+    if payload.permanent is not None:
+        link.permanent = payload.permanent
+
+    if payload.cache_max_age is not None:
+        link.cache_max_age = payload.cache_max_age
+
     if payload.custom_code and payload.custom_code != code:
-        exists = session.exec(select(Link).where(Link.short_code == payload.custom_code)).first()
-        if exists:
+        if repos.links.code_exists(payload.custom_code):
             raise HTTPException(status_code=409, detail="Custom code already in use")
+        # Buffered clicks were counted against the old code; write them first
+        click_buffer.flush(engine)
+        repos.links.refresh(link)
         link.short_code = payload.custom_code
 
-    session.add(link)
-    session.commit()
-    session.refresh(link)
-    return link
+    repos.links.save(link)
+    # Old code may be renamed or point elsewhere now; drop its cached target
+    cache_sync.invalidate(engine, "redirect", code)
+    if link.short_code != code:
+        revive_code(engine, link.short_code)
+    return link_read(link)
 
 # -------------------------------
 # API: DELETE (per-user)
@@ -243,49 +626,128 @@ def update_link(
 def delete_link(
     code: str,
     request: Request,
-    session: Session = Depends(get_session),
+    repos: Repositories = Depends(get_repositories),
 ):
-    user = get_current_user(request, session)
+    user = get_current_user(request, repos.users)
     if not user:
         raise HTTPException(status_code=401, detail="Login required")
 
-    link = session.exec(
-        select(Link).where(Link.short_code == code, Link.user_id == user.id)
-    ).first()
+    link = repos.links.get(code, user.id)
     if not link:
         raise HTTPException(status_code=404, detail="Not found")
 
-    session.delete(link)
-    session.commit()
+    # Analytics go with the link (their link id may be reused)
+    repos.links.delete(link)
+    cache_sync.invalidate(engine, "redirect", code)
+    click_buffer.discard(code)
+    trending.discard(code)
 
 # -------------------------------
 # Redirect + analytics
 # -------------------------------
-@app.get("/r/{code}")
-def redirect(code: str, session: Session = Depends(get_session)):
-    link = session.exec(select(Link).where(Link.short_code == code)).first()
-    if not link:
-        raise HTTPException(status_code=404, detail="Not found")
-
-    if link.expires_at and link.expires_at <= datetime.utcnow():
+@app.get("/r/{code}", include_in_schema=not ASYNC_DB)
+def redirect(
+    code: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    repos: Repositories = Depends(get_read_repositories),
+):
+    # Serve the target from the in-process cache when possible; only misses hit SQLite
+    target = redirect_cache.get(code)
+    if target is None:
+        # Swept expired links answer 410 without a DB lookup
+        if tombstones.hit(code):
+            raise HTTPException(status_code=410, detail="Link expired")
+        row = code_snapshot.lookup(code) or repos.links.redirect_row(code)
+        if not row:
+            raise HTTPException(status_code=404, detail="Not found")
+        target = resolve_link(*row)
+        redirect_cache.set(code, target)
+
+    now = datetime.utcnow()
+    if target.expires_at and target.expires_at <= now:
         raise HTTPException(status_code=410, detail="Link expired")
 
-    link.click_count += 1
-    link.last_accessed = datetime.utcnow()
-    session.add(link)
-    session.commit()
+    # Record the click in memory; the DB is written in batches (write-behind)
+    headers = request.headers
+    if click_buffer.record(code, referrer=headers.get("referer"), ua_family=ua_family(headers.get("user-agent"))):
+        background_tasks.add_task(click_buffer.flush, engine)
+    trending.record(code)
 
-    return RedirectResponse(url=link.original_url, status_code=307)
+    # 301/307 and Cache-Control follow the link's policy; headers are pre-encoded in the cache entry
+    return redirect_response(target, now)
 
 # -------------------------------
 # API: Stats
 # -------------------------------
-@app.get("/api/links/{code}/stats", response_model=StatsRead)
-def link_stats(code: str, session: Session = Depends(get_session)):
-    link = session.exec(select(Link).where(Link.short_code == code)).first()
+@app.get("/api/links/{code}/stats", response_model=StatsRead, include_in_schema=not ASYNC_DB)
+def link_stats(code: str, repos: Repositories = Depends(get_read_repositories)):
+    link = repos.links.get(code)
     if not link:
         raise HTTPException(status_code=404, detail="Not found")
-    return {"click_count": link.click_count, "last_accessed": link.last_accessed}
+    click_count, last_accessed = merged_clicks(link)
+    return {"click_count": click_count, "last_accessed": last_accessed}
+
+# default window per granularity when `since` is not given, and max points per response
+TIMESERIES_WINDOWS = {"minute": timedelta(hours=1), "hour": timedelta(days=7), "day": timedelta(days=90)}
+TIMESERIES_MAX_POINTS = 5000
+
+@app.get("/api/links/{code}/stats/timeseries", response_model=TimeseriesRead)
+def link_timeseries(
+    code: str,
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    repos: Repositories = Depends(get_read_repositories),
+):
+    """Clicks per bucket, read from the rollup table only (cost independent of raw event volume)."""
+    link = repos.links.get(code)
+    if link is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    # stored timestamps are naive UTC
+    since, until = naive_utc(since), naive_utc(until)
+    truncate = GRANULARITIES[granularity]
+    step = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}[granularity]
+    until = truncate(until or datetime.utcnow())
+    since = truncate(since or until - TIMESERIES_WINDOWS[granularity])
+    if since > until or (until - since) / step >= TIMESERIES_MAX_POINTS:
+        raise HTTPException(status_code=422, detail=f"Range must cover at most {TIMESERIES_MAX_POINTS} buckets")
+
+    counts = repos.links.rollups(link.id, granularity, since, until)
+
+    # zero-fill empty buckets so clients can plot the series directly
+    points = []
+    bucket = since
+    while bucket <= until:
+        points.append(TimeseriesPoint(bucket_start=bucket, clicks=counts.get(bucket, 0)))
+        bucket += step
+    return TimeseriesRead(short_code=code, granularity=granularity, points=points)
+
+@app.get("/api/trending", response_model=TrendingRead)
+def trending_links(
+    request: Request,
+    window: str = "5m",
+    limit: int = Query(10, ge=1, le=TRENDING_TOP_K),
+    repos: Repositories = Depends(get_read_repositories),
+):
+    """Most clicked links in the last `window`, from the in-memory heavy-hitters tracker (no table scan).
+
+    The tracker is per process: under several gunicorn workers each answer ranks only the redirects
+    served by the worker that answered (labelled scope="worker" with its pid). Use the rollup-backed
+    /api/links/{code}/stats/timeseries for counts across all workers.
+    """
+    if not get_current_user(request, repos.users):
+        raise HTTPException(status_code=401, detail="Login required")
+    if not trending.windows:
+        raise HTTPException(status_code=404, detail="Trending is disabled")
+    if window not in trending.windows:
+        raise HTTPException(status_code=422, detail=f"window must be one of: {', '.join(trending.windows)}")
+    return TrendingRead(
+        window=window,
+        worker_pid=os.getpid(),
+        links=[TrendingLink(short_code=code, clicks=clicks) for code, clicks in trending.top(window, limit)],
+    )
 
 # -------------------------------
 # AUTH (signup / login / logout)
@@ -293,67 +755,97 @@ def link_stats(code: str, session: Session = Depends(get_session)):
 @app.get("/login", response_class=HTMLResponse)
 def login_page(request: Request):
     # Renders combined Login/Signup page
-    return templates.TemplateResponse("login.html", {"request": request})
+    return render("login.html", {"request": request})
+
+# Hashing runs in a bounded worker pool (app/auth.py), so signup/login are async and only
+# touch the threadpool for their short DB calls; a saturated pool answers 429 instead of queueing.
+# app.auth (passlib) is imported by the first signup/login rather than at startup.
+def hashing_busy(request: Request, error_key: str):
+    return render(
+        "login.html",
+        {"request": request, error_key: "Too many sign-in attempts right now, please retry shortly"},
+        status_code=429,
+        headers={"Retry-After": "1"},
+    )
 
 @app.post("/signup", response_class=HTMLResponse)
-def signup(
+async def signup(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    session: Session = Depends(get_session),
+    repos: Repositories = Depends(get_repositories),
 ):
-    existing = session.exec(select(User).where(User.username == username)).first()
-    if existing:
-        return templates.TemplateResponse(
-            "login.html",
-            {"request": request, "signup_error": "Username already taken"},
-            status_code=400,
-        )
+    from app.auth import HashPoolBusy, hash_password_async
+
+    def taken():
+        return render("login.html", {"request": request, "signup_error": "Username already taken"}, status_code=400)
+
+    if await run_in_threadpool(repos.users.get_by_username, username):
+        return taken()
 
-    user = User(username=username, password_hash=hash_password(password))
-    session.add(user)
-    session.commit()
-    session.refresh(user)
+    try:
+        password_hash = await hash_password_async(password)
+    except HashPoolBusy:
+        return hashing_busy(request, "signup_error")
+
+    user = User(username=username, password_hash=password_hash)
+    if not await run_in_threadpool(repos.users.add, user):
+        return taken()
 
     # Log in newly created user
     request.session["user_id"] = user.id
     return RedirectResponse(url="/", status_code=303)
 
 @app.post("/login", response_class=HTMLResponse)
-def login(
+async def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    session: Session = Depends(get_session),
+    repos: Repositories = Depends(get_repositories),
 ):
-    user = session.exec(select(User).where(User.username == username)).first()
-    if not user or not verify_password(password, user.password_hash):
-        return templates.TemplateResponse(
+    from app.auth import HashPoolBusy, hash_password_async, needs_rehash, verify_password_async
+
+    user = await run_in_threadpool(repos.users.get_by_username, username)
+    try:
+        valid = bool(user) and await verify_password_async(password, user.password_hash)
+    except HashPoolBusy:
+        return hashing_busy(request, "login_error")
+    if not valid:
+        return render(
             "login.html",
             {"request": request, "login_error": "Invalid credentials"},
             status_code=400,
         )
+
+    # Transparently upgrade hashes made with older settings (e.g. fewer PBKDF2 rounds)
+    if needs_rehash(user.password_hash):
+        try:
+            user.password_hash = await hash_password_async(password)
+            await run_in_threadpool(repos.users.save, user)
+        except HashPoolBusy:
+            pass  # try again on a later login
+
     request.session["user_id"] = user.id
     return RedirectResponse(url="/", status_code=303)
 
 # Allow BOTH POST and GET for logout to avoid 405s
 @app.post("/logout")
 def logout_post(request: Request):
-    request.session.clear()
+    forget_user(request)
     return RedirectResponse(url="/login", status_code=303)
 
 @app.get("/logout")
 def logout_get(request: Request):
-    request.session.clear()
+    forget_user(request)
     return RedirectResponse(url="/login", status_code=303)
 
 # -------------------------------
 # UI: Home (form)
 # -------------------------------
 @app.get("/", response_class=HTMLResponse)
-def index(request: Request, session: Session = Depends(get_session)):
-    user = get_current_user(request, session)
-    return templates.TemplateResponse("index.html", {"request": request, "user": user})
+def index(request: Request, repos: Repositories = Depends(get_repositories)):
+    user = get_current_user(request, repos.users)
+    return render("index.html", {"request": request, "user": user})
 
 # Form handler for creating a link (POST)
 @app.post("/create", response_class=HTMLResponse)
@@ -361,31 +853,24 @@ def create_form(
     request: Request,
     original_url: str = Form(...),
     label: Optional[str] = Form(None),
-    session: Session = Depends(get_session),
+    repos: Repositories = Depends(get_repositories),
 ):
-    user = get_current_user(request, session)
+    user = get_current_user(request, repos.users)
     if not user:
         return RedirectResponse(url="/login", status_code=303)
 
     if not sanitize_scheme(original_url):
-        return templates.TemplateResponse(
+        return render(
             "index.html",
             {"request": request, "error": "Only http/https URLs are allowed", "user": user},
             status_code=422,
         )
 
-    code = choose_code(None)
-    while session.exec(select(Link).where(Link.short_code == code)).first():
-        code = choose_code(None)
-
-    link = Link(short_code=code, original_url=original_url, label=label, user_id=user.id)
-    session.add(link)
-    session.commit()
-    session.refresh(link)
+    link = insert_link(repos.links, None, original_url=original_url, label=label, user_id=user.id)
 
-    return templates.TemplateResponse(
+    return render(
         "index.html",
-        {"request": request, "short_code": code, "user": user},
+        {"request": request, "short_code": link.short_code, "user": user},
         status_code=201,
     )
 
@@ -398,18 +883,43 @@ def create_get():
 # UI: Analytics page
 # -------------------------------
 @app.get("/links", response_class=HTMLResponse)
-def list_links_ui(request: Request, session: Session = Depends(get_session)):
-    user = get_current_user(request, session)
+def list_links_ui(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    all: bool = False,
+    repos: Repositories = Depends(get_read_repositories),
+):
+    user = get_current_user(request, repos.users)
     if not user:
         return RedirectResponse(url="/login", status_code=303)
 
-    links = session.exec(
-        select(Link)
-        .where(Link.user_id == user.id)
-        .order_by(Link.click_count.desc(), Link.last_accessed.desc())
-    ).all()
+    if all:
+        # Every link on one page, rendered while the rows are read in keyset chunks,
+        # so time-to-first-byte and memory do not grow with the number of links
+        return stream_template(
+            "list.html",
+            {
+                "request": request,
+                "links": stream_link_reads(user.id, "clicks"),
+                "user": user,
+                "streamed": True,
+                "page_size": limit,
+            },
+        )
+
+    # One page at a time, most-clicked first; buffered clicks are merged for display
+    links, next_cursor = repos.links.page(user.id, "clicks", limit, cursor)
+    links = [link_read(link) for link in links]
 
-    return templates.TemplateResponse(
+    return render(
         "list.html",
-        {"request": request, "links": links, "user": user}
+        {
+            "request": request,
+            "links": links,
+            "user": user,
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "page_size": limit,
+        }
     )
\ No newline at end of file
@@ -0,0 +1,68 @@
+# management commands, kept out of the app's startup path:
+#
+#   python -m app.manage init-db                      create / migrate the schema
+#   python -m app.manage seed                         create the demo account (admin / 123) if missing
+#   python -m app.manage seed --username u --password p
+#
+# SEED_DEMO_USER=1 makes the app seed the demo account at startup instead (one lookup, no hashing).
+
+import argparse
+import os
+import sys
+from typing import Optional
+
+from app.db import init_db
+from app.models import User
+from app.repositories import open_repositories
+
+# seed the demo account from the app's lifespan (off by default; use `python -m app.manage seed`)
+SEED_DEMO_USER = os.getenv("SEED_DEMO_USER", "0") == "1"
+
+DEMO_USERNAME = "admin"
+DEMO_PASSWORD = "123"
+
+# PBKDF2 hash of DEMO_PASSWORD, so seeding never runs the key derivation; logins upgrade it if
+# PBKDF2_ROUNDS is raised later
+DEMO_PASSWORD_HASH = os.getenv(
+    "DEMO_PASSWORD_HASH",
+    "$pbkdf2-sha256$29000$0nrPuVfKeQ.BUErpXUsJwQ$7ibSu3IDRclaMcZEclybdXK.kWOBFAOZLR80UYpuvqU",
+)
+
+
+def seed_demo_user(username: str = DEMO_USERNAME, password: Optional[str] = None) -> bool:
+    """Create the account if missing; returns True if it was created.
+
+    Without a password the precomputed DEMO_PASSWORD_HASH is stored. Safe when
+    several workers start at once (the unique username decides).
+    """
+    with open_repositories() as repos:
+        if repos.users.get_by_username(username):
+            return False
+        if password is None:
+            password_hash = DEMO_PASSWORD_HASH
+        else:
+            from app.auth import hash_password
+            password_hash = hash_password(password)
+        return repos.users.add(User(username=username, password_hash=password_hash))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="minilink management commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("init-db", help="create or migrate the database schema")
+
+    seed = sub.add_parser("seed", help="create a user account if it does not exist yet")
+    seed.add_argument("--username", default=DEMO_USERNAME)
+    seed.add_argument("--password", help=f"default: {DEMO_PASSWORD} (stored as the precomputed hash)")
+
+    args = parser.parse_args(argv)
+    init_db()
+    if args.command == "seed":
+        created = seed_demo_user(args.username, args.password)
+        print(f"{'created' if created else 'exists'}: {args.username}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+# Prometheus metric definitions shared by the app modules (exported on /metrics),
+# plus the ASGI middleware that records the HTTP metrics
+
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# latency histogram buckets in seconds, e.g. METRICS_LATENCY_BUCKETS="0.001,0.005,0.01,0.05,0.1,0.5,1"
+METRICS_LATENCY_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_LATENCY_BUCKETS",
+        "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10",
+    ).split(",")
+)
+
+# fraction of redirect requests whose latency is observed (request counts stay exact)
+METRICS_REDIRECT_SAMPLE_RATE = float(os.getenv("METRICS_REDIRECT_SAMPLE_RATE", "1.0"))
+
+# label used for requests that matched no route (404s on arbitrary paths)
+UNMATCHED_ROUTE = "<unmatched>"
+
+# add a Server-Timing header with the per-phase durations (db, template, serialize) to responses
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+# SQL statements are much faster than requests; extra sub-millisecond buckets for them
+DB_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005) + METRICS_LATENCY_BUCKETS
+
+# -------------------------------
+# HTTP metrics
+# -------------------------------
+# "path" is the matched route template (e.g. /r/{code}), never the raw URL, so label
+# cardinality is bounded by the number of routes rather than the number of short codes
+REQUEST_COUNT = Counter(
+    "minilink_requests_total",
+    "Total HTTP requests",
+    ["method", "path", "status"],
+)
+
+REQUEST_LATENCY = Histogram(
+    "minilink_request_latency_seconds",
+    "Request latency in seconds",
+    ["method", "path"],
+    buckets=METRICS_LATENCY_BUCKETS,
+)
+
+REQUEST_ERRORS = Counter(
+    "minilink_request_errors_total",
+    "Total HTTP 5xx errors",
+    ["method", "path"],
+)
+
+# time spent in one phase of a request (db, template, serialize); the rest is routing/middleware/handler code
+REQUEST_PHASE_LATENCY = Histogram(
+    "minilink_request_phase_seconds",
+    "Time spent per request phase in seconds",
+    ["path", "phase"],
+    buckets=DB_LATENCY_BUCKETS,
+)
+
+# -------------------------------
+# SQL statement metrics (see app/profiling.py)
+# -------------------------------
+DB_QUERY_LATENCY = Histogram(
+    "minilink_db_query_seconds",
+    "SQL statement execution time in seconds, by statement type",
+    ["statement"],
+    buckets=DB_LATENCY_BUCKETS,
+)
+
+SLOW_QUERIES = Counter(
+    "minilink_db_slow_queries_total",
+    "SQL statements slower than SLOW_QUERY_MS",
+    ["statement"],
+)
+
+# -------------------------------
+# In-process cache metrics (labelled by cache name)
+# -------------------------------
+CACHE_HITS = Counter(
+    "minilink_cache_hits_total",
+    "Cache lookups answered from memory",
+    ["cache"],
+)
+
+CACHE_MISSES = Counter(
+    "minilink_cache_misses_total",
+    "Cache lookups that fell through to the database",
+    ["cache"],
+)
+
+CACHE_EVICTIONS = Counter(
+    "minilink_cache_evictions_total",
+    "Cache entries dropped to stay within the size limit",
+    ["cache"],
+)
+
+# -------------------------------
+# Write-behind click counter metrics
+# -------------------------------
+CLICK_FLUSHES = Histogram(
+    "minilink_click_flush_seconds",
+    "Time spent writing a batch of buffered clicks",
+)
+
+CLICK_FLUSH_ROWS = Counter(
+    "minilink_click_flush_rows_total",
+    "Links updated by click buffer flushes",
+)
+
+CLICK_EVENTS_DROPPED = Counter(
+    "minilink_click_events_dropped_total",
+    "Click events discarded because the buffer hit CLICK_EVENTS_MAX",
+)
+
+# -------------------------------
+# Background task metrics
+# -------------------------------
+BACKGROUND_FAILURES = Counter(
+    "minilink_background_failures_total",
+    "Failed runs of a periodic background task (retried on its next tick)",
+    ["task"],
+)
+
+# -------------------------------
+# Password hashing pool metrics
+# -------------------------------
+HASH_LATENCY = Histogram(
+    "minilink_password_hash_seconds",
+    "Time from submitting a hash/verify job to its result (queueing included)",
+    ["op"],
+)
+
+HASH_QUEUE_DEPTH = Gauge(
+    "minilink_password_hash_queue_depth",
+    "Hash/verify jobs currently running or waiting in the hashing pool",
+    multiprocess_mode="livesum",
+)
+
+HASH_REJECTED = Counter(
+    "minilink_password_hash_rejected_total",
+    "Hash/verify jobs rejected with 429 because the pool queue was full",
+)
+
+# -------------------------------
+# Expiry sweeper metrics
+# -------------------------------
+EXPIRY_SWEPT = Counter(
+    "minilink_expired_links_swept_total",
+    "Expired links deleted by the expiry sweeper",
+)
+
+EXPIRY_SWEEPS = Histogram(
+    "minilink_expiry_sweep_seconds",
+    "Time taken by one expiry sweep (all batches)",
+)
+
+TOMBSTONES = Gauge(
+    "minilink_tombstones",
+    "Short codes of swept links held in memory to answer 410",
+    multiprocess_mode="max",
+)
+
+TOMBSTONE_HITS = Counter(
+    "minilink_tombstone_hits_total",
+    "Redirects answered 410 from the tombstone set without a database lookup",
+)
+
+# -------------------------------
+# Admission control metrics (see app/admission.py)
+# -------------------------------
+ADMISSION_IN_FLIGHT = Gauge(
+    "minilink_admission_in_flight",
+    "Requests currently admitted, by priority class",
+    ["cls"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "minilink_admission_queue_depth",
+    "Requests waiting for a concurrency slot, by limit (a priority class, 'shared' or 'total')",
+    ["cls"],
+    multiprocess_mode="livesum",
+)
+
+ADMISSION_SHED = Counter(
+    "minilink_admission_shed_total",
+    "Requests rejected by admission control (queue_full / timeout answer 503, rate_limited 429)",
+    ["cls", "reason"],
+)
+
+# -------------------------------
+# Short-code snapshot metrics (see app/snapshot.py)
+# -------------------------------
+SNAPSHOT_LINKS = Gauge(
+    "minilink_snapshot_links",
+    "Links in the short-code snapshot mapped by this process",
+    multiprocess_mode="max",
+)
+
+SNAPSHOT_BUILDS = Histogram(
+    "minilink_snapshot_build_seconds",
+    "Time taken to write a short-code snapshot",
+)
+
+SNAPSHOT_LOOKUPS = Counter(
+    "minilink_snapshot_lookups_total",
+    "Redirect lookups in the short-code snapshot (hit / miss = not in it / dirty = changed since the build)",
+    ["result"],
+)
+
+
+# -------------------------------
+# Request phases
+# -------------------------------
+# seconds per phase for the current request; None outside a request. The dict is shared with the
+# threadpool (handlers and DB calls run in a copy of the request's context)
+_phases: ContextVar[Optional[dict[str, float]]] = ContextVar("minilink_request_phases", default=None)
+
+
+def start_phases() -> dict[str, float]:
+    phases: dict[str, float] = {}
+    _phases.set(phases)
+    return phases
+
+
+def add_phase(name: str, seconds: float) -> None:
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+# times the enclosed block as part of phase `name` of the current request
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - start)
+
+
+def server_timing(phases: dict[str, float], total: float) -> tuple[bytes, bytes]:
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()]
+    entries.append(f"app;dur={total * 1000:.2f}")
+    return (b"server-timing", ", ".join(entries).encode())
+
+
+# -------------------------------
+# HTTP metrics middleware (pure ASGI)
+# -------------------------------
+class MetricsMiddleware:
+    """Records REQUEST_COUNT / REQUEST_LATENCY / REQUEST_ERRORS labelled by route template,
+    and the per-phase times (REQUEST_PHASE_LATENCY, Server-Timing header) of each request.
+
+    Plain ASGI (no BaseHTTPMiddleware), so requests and responses are passed
+    through untouched; only the response status is read from the send stream.
+    """
+
+    def __init__(
+        self,
+        app,
+        redirect_route: str = "/r/{code}",
+        sample_rate: float = METRICS_REDIRECT_SAMPLE_RATE,
+        server_timing: bool = SERVER_TIMING,
+    ):
+        self.app = app
+        self.redirect_route = redirect_route
+        self.sample_rate = sample_rate
+        self.server_timing = server_timing
+        self._templates = None
+
+    # endpoint -> route path template, built once the app's routes are all registered
+    def _route_template(self, scope) -> str:
+        if self._templates is None:
+            # routes expose the handler as .endpoint, mounts (e.g. /static) as .app
+            self._templates = {
+                getattr(route, "endpoint", None) or route.app: route.path
+                for route in scope["app"].router.routes
+            }
+        return self._templates.get(scope.get("endpoint"), UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        # Don't double-count the metrics endpoint itself
+        if scope["type"] != "http" or scope["path"].startswith("/metrics"):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        phases = start_phases()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    header = server_timing(phases, time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        method = scope["method"]
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            REQUEST_ERRORS.labels(method, self._route_template(scope)).inc()
+            status_code = 500
+            raise
+        finally:
+            path = self._route_template(scope)
+            REQUEST_COUNT.labels(method, path, str(status_code)).inc()
+            if path != self.redirect_route or self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+                REQUEST_LATENCY.labels(method, path).observe(time.perf_counter() - start)
+                for name, seconds in phases.items():
+                    REQUEST_PHASE_LATENCY.labels(path, name).observe(seconds)
@@ -0,0 +1,103 @@
+# lightweight schema migrations: ordered, idempotent steps recorded in a schema_migrations table
+#
+# init_db() runs create_all() first (new databases get the full schema straight from the models),
+# then apply_migrations() brings databases created by older versions up to date. Every step must
+# be safe to re-run, because on a fresh database its effect already exists.
+
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+# bookkeeping table, kept out of SQLModel.metadata so it is not part of the app schema
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = []
+
+
+# registers a migration step; versions must be unique and increasing
+def migration(version: int, description: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+# -----------------------------------------------------
+# Helpers for steps
+# -----------------------------------------------------
+def create_index(conn: Connection, name: str, table: str, columns: str) -> None:
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    existing = {col["name"] for col in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+# -----------------------------------------------------
+# Steps
+# -----------------------------------------------------
+@migration(1, "link listing indexes: (user_id, created_at, id), (user_id, click_count, id), (user_id, label)")
+def _listing_indexes(conn: Connection) -> None:
+    create_index(conn, "ix_link_user_created", "link", "user_id, created_at, id")
+    create_index(conn, "ix_link_user_clicks", "link", "user_id, click_count, id")
+    create_index(conn, "ix_link_user_label", "link", "user_id, label")
+
+
+@migration(2, "index link.expires_at for expiry lookups")
+def _expiry_index(conn: Connection) -> None:
+    create_index(conn, "ix_link_expires_at", "link", "expires_at")
+
+
+@migration(3, "link redirect policy columns: permanent, cache_max_age")
+def _redirect_policy(conn: Connection) -> None:
+    add_column(conn, "link", "permanent", "BOOLEAN NOT NULL DEFAULT FALSE")
+    add_column(conn, "link", "cache_max_age", "INTEGER")
+
+
+@migration(4, "index clickrollup (granularity, bucket_start) for recent buckets across links")
+def _recent_rollups_index(conn: Connection) -> None:
+    # databases that predate the rollup table get it (with the index) from create_all
+    if inspect(conn).has_table("clickrollup"):
+        create_index(conn, "ix_clickrollup_recent", "clickrollup", "granularity, bucket_start")
+
+
+# -----------------------------------------------------
+# Runner
+# -----------------------------------------------------
+def apply_migrations(engine: Engine) -> list[int]:
+    """Apply pending steps in version order, each in its own transaction; returns versions applied."""
+    _meta.create_all(engine)
+    applied = []
+    for version, description, step in sorted(MIGRATIONS, key=lambda m: m[0]):
+        with engine.connect() as conn:
+            done = conn.execute(
+                schema_migrations.select().where(schema_migrations.c.version == version)
+            ).first()
+            if done:
+                continue
+            try:
+                step(conn)
+                conn.execute(
+                    schema_migrations.insert().values(
+                        version=version, description=description, applied_at=datetime.utcnow()
+                    )
+                )
+                conn.commit()
+            except IntegrityError:
+                # another process recorded this version first; its changes are identical
+                conn.rollback()
+                continue
+        applied.append(version)
+    return applied
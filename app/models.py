@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 # represents user registered in app, with id (primary key), username (unique), and password hash
@@ -10,12 +11,62 @@ class User(SQLModel, table=True):
 
 # represents a shortened link, with various fields including foreign key to User
 class Link(SQLModel, table=True):
+    # composite indexes backing the keyset-paginated listings (one per sort order, plus label filter)
+    __table_args__ = (
+        Index("ix_link_user_created", "user_id", "created_at", "id"),
+        Index("ix_link_user_clicks", "user_id", "click_count", "id"),
+        Index("ix_link_user_label", "user_id", "label"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     short_code: str = Field(index=True, unique=True)
     original_url: str
     label: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    expires_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = Field(default=None, index=True)
     click_count: int = Field(default=0)
     last_accessed: Optional[datetime] = None
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
\ No newline at end of file
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    # redirect policy: 301 instead of 307, and how long clients/CDNs may cache the redirect
+    permanent: bool = Field(default=False)
+    cache_max_age: Optional[int] = None
+
+# named counters handing out blocks of ids (used by the short code allocator)
+class CodeSequence(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    next_value: int = Field(default=0)
+
+# one redirect, appended in batches by the click buffer (raw log behind the rollups)
+class ClickEvent(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    link_id: int = Field(index=True)
+    occurred_at: datetime
+    referrer: Optional[str] = None
+    ua_family: str = "Other"
+
+# clicks per link per time bucket; granularity is "minute", "hour" or "day"
+class ClickRollup(SQLModel, table=True):
+    # recent buckets across all links (trending warm start)
+    __table_args__ = (Index("ix_clickrollup_recent", "granularity", "bucket_start"),)
+
+    link_id: int = Field(primary_key=True)
+    granularity: str = Field(primary_key=True)
+    bucket_start: datetime = Field(primary_key=True)
+    clicks: int = Field(default=0)
+
+# cache invalidations published by one worker process and replayed by the others (multi-worker mode)
+class CacheInvalidation(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    cache: str
+    key: str
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+# short codes of expired links removed by the expiry sweeper; redirects to them answer 410
+class LinkTombstone(SQLModel, table=True):
+    # AUTOINCREMENT: ids are never reused after pruning, so workers can load new rows by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    short_code: str = Field(unique=True)
+    expired_at: datetime
+    swept_at: datetime = Field(default_factory=datetime.utcnow, index=True)
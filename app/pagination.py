@@ -0,0 +1,137 @@
+# keyset (cursor) pagination and filtering for per-user link listings
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlmodel import select
+
+from app.models import Link
+from app.services import naive_utc
+
+# page size defaults and hard cap for listing endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# sort name -> (key column, descending); the link id is always the tie-breaker,
+# so every sort is a strict total order that a cursor can resume from
+SORTS = {
+    "newest": (Link.created_at, True),
+    "oldest": (Link.created_at, False),
+    "clicks": (Link.click_count, True),
+}
+
+
+# cursor = base64url(JSON [sort name, key value, id]) of the last row on the previous page
+def encode_cursor(sort: str, link: Link) -> str:
+    column, _ = SORTS[sort]
+    value = getattr(link, column.key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, link.id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# a well-formed but tampered cursor (wrong types, unparsable timestamp) is a 400 like any other bad one
+def decode_cursor(sort: str, cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, link_id = json.loads(raw)
+        if not isinstance(link_id, int) or isinstance(link_id, bool):
+            raise TypeError("link id must be an integer")
+        column, _ = SORTS.get(cursor_sort, (None, None))
+        if column is not None and column.key == "created_at":
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError("key must be an integer")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return value, link_id
+
+
+def link_page_query(
+    user_id: int,
+    sort: str = "newest",
+    cursor: Optional[str] = None,
+    label: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    columns: Optional[tuple] = None,
+):
+    """Build the SELECT for one page of a user's links, ordered by `sort` then id.
+
+    The caller adds `.limit()`; every order used here is covered by a
+    (user_id, key, id) index on Link, so resuming from a cursor is an index seek.
+    With `columns` (e.g. READ_COLUMNS) rows are plain tuples instead of Link objects.
+    """
+    if sort not in SORTS:
+        raise HTTPException(status_code=422, detail=f"sort must be one of: {', '.join(SORTS)}")
+    column, descending = SORTS[sort]
+
+    query = select(*columns) if columns else select(Link)
+    query = query.where(Link.user_id == user_id)
+    if label is not None:
+        query = query.where(Link.label == label)
+    # created_at is stored as naive UTC
+    if created_after is not None:
+        query = query.where(Link.created_at >= naive_utc(created_after))
+    if created_before is not None:
+        query = query.where(Link.created_at < naive_utc(created_before))
+
+    if cursor:
+        value, link_id = decode_cursor(sort, cursor)
+        key = tuple_(column, Link.id)
+        query = query.where(key < (value, link_id) if descending else key > (value, link_id))
+
+    if descending:
+        return query.order_by(column.desc(), Link.id.desc())
+    return query.order_by(column.asc(), Link.id.asc())
+
+
+# fetches one page (Links or column rows); returns (rows, next cursor or None)
+def fetch_page(session, query, sort: str, limit: int) -> tuple[list[Link], Optional[str]]:
+    rows = session.exec(query.limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(sort, rows[-1])
+    return rows, None
+
+
+# yields all of a user's links in `sort` order, one keyset page of `chunk` rows at a time
+def iter_links(session, user_id: int, sort: str = "oldest", chunk: int = MAX_PAGE_SIZE):
+    cursor = None
+    while True:
+        links, cursor = fetch_page(session, link_page_query(user_id, sort, cursor), sort, chunk)
+        yield from links
+        # drop yielded rows from the identity map so memory stays flat for large exports
+        session.expunge_all()
+        if cursor is None:
+            return
+
+
+# columns of a link as exported (same names as LinkRead)
+EXPORT_COLUMNS = (
+    Link.short_code, Link.original_url, Link.label, Link.created_at, Link.expires_at,
+    Link.click_count, Link.last_accessed, Link.permanent, Link.cache_max_age,
+)
+
+
+# the export columns plus the id, so rows can also produce a page cursor
+READ_COLUMNS = EXPORT_COLUMNS + (Link.id,)
+
+
+# yields all of a user's links oldest first from one query read through a server-side cursor
+# (yield_per): rows are plain named tuples, so neither the session nor the result grows with the count
+def stream_links(session, user_id: int, chunk: int = MAX_PAGE_SIZE):
+    query = (
+        select(*EXPORT_COLUMNS)
+        .where(Link.user_id == user_id)
+        .order_by(Link.created_at.asc(), Link.id.asc())
+        .execution_options(yield_per=chunk)
+    )
+    yield from session.exec(query)
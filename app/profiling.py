@@ -0,0 +1,134 @@
+# latency instrumentation below the request level: SQL statement timing (histogram by statement
+# type, slow-query log, "db" request phase), JSON rendering as the "serialize" phase, and an opt-in
+# sampling profiler that dumps collapsed stacks (flamegraph.pl / speedscope input)
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from starlette.responses import JSONResponse
+
+from app.metrics import DB_QUERY_LATENCY, SLOW_QUERIES, add_phase, phase
+
+# time every SQL statement (minilink_db_query_seconds, "db" phase); SQL_TIMING=0 leaves engines uninstrumented
+SQL_TIMING = os.getenv("SQL_TIMING", "1") == "1"
+
+# statements slower than this (milliseconds) are logged and counted in minilink_db_slow_queries_total
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# set PROFILER_ENABLED=1 to expose GET /debug/profile (otherwise it answers 404)
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+
+# longest capture a single profile request may ask for, and the time between stack samples
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+
+# statement types with their own histogram label; anything else is reported as OTHER
+STATEMENT_TYPES = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"})
+
+# distinct statement texts remembered per engine (with their histogram label)
+STATEMENT_MEMO_MAX = 1000
+
+# statements longer than this are cut in the slow-query log
+SLOW_QUERY_LOG_CHARS = 1000
+
+logger = logging.getLogger("minilink.sql")
+
+
+# -----------------------------------------------------
+# SQL statements
+# -----------------------------------------------------
+def statement_type(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ""
+    return kind if kind in STATEMENT_TYPES else "OTHER"
+
+
+# registers cursor hooks on a (sync) engine; every statement is timed and added to the "db" phase
+def instrument_engine(sync_engine, slow_query_ms: float = SLOW_QUERY_MS) -> None:
+    # the app issues a small fixed set of statements, so the histogram child per statement text is memoized
+    histograms: dict[str, tuple[str, object]] = {}
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_start", time.perf_counter())
+        entry = histograms.get(statement)
+        if entry is None:
+            kind = statement_type(statement)
+            entry = (kind, DB_QUERY_LATENCY.labels(kind))
+            # IN (...) lists of varying length make new texts; stop memoizing past a bound
+            if len(histograms) < STATEMENT_MEMO_MAX:
+                histograms[statement] = entry
+        entry[1].observe(elapsed)
+        add_phase("db", elapsed)
+        if elapsed * 1000 >= slow_query_ms:
+            SLOW_QUERIES.labels(entry[0]).inc()
+            logger.warning("slow %s (%.1f ms): %s", entry[0], elapsed * 1000, statement[:SLOW_QUERY_LOG_CHARS])
+
+
+# -----------------------------------------------------
+# Serialization
+# -----------------------------------------------------
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse whose rendering is reported as the "serialize" phase (the app's default response class)."""
+
+    def render(self, content) -> bytes:
+        with phase("serialize"):
+            return super().render(content)
+
+
+# -----------------------------------------------------
+# Sampling profiler
+# -----------------------------------------------------
+class ProfilerBusy(Exception):
+    """Raised when a profile is already being captured in this process."""
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads every `interval` seconds (sys._current_frames).
+
+    The result is one line per distinct stack, "thread;outer;...;inner count", which
+    flamegraph.pl and speedscope read directly. Only one capture runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def capture(self, seconds: float, interval: float = PROFILER_INTERVAL_MS / 1000) -> str:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            stacks: Counter[str] = Counter()
+            me = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        frames.append(_frame_name(frame))
+                        frame = frame.f_back
+                    # the thread name is the root frame; collapsed stacks must not contain spaces
+                    frames.append(names.get(ident, f"thread-{ident}").replace(" ", "_"))
+                    stacks[";".join(reversed(frames))] += 1
+                time.sleep(interval)
+        finally:
+            self._lock.release()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,170 @@
+# redirect responses: per-link status / Cache-Control policy with pre-encoded headers, and an
+# optional ASGI fast path that answers GET /r/{code} ahead of the FastAPI stack
+# (no session cookie decoding, no dependency injection, no Response objects)
+
+import os
+import random
+import time
+from datetime import datetime
+from typing import Optional
+from urllib.parse import quote
+
+import anyio
+from sqlmodel import Session, select
+from starlette.responses import Response
+
+from app.cache import ResolvedLink, redirect_cache
+from app.clicks import click_buffer
+from app.db import engine, read_engine
+from app.expiry import tombstones
+from app.metrics import METRICS_REDIRECT_SAMPLE_RATE, REQUEST_COUNT, REQUEST_LATENCY
+from app.models import Link
+from app.services import ua_family
+from app.snapshot import code_snapshot
+from app.trending import trending
+
+# set REDIRECT_FAST_PATH=1 to serve redirects from FastRedirectMiddleware
+REDIRECT_FAST_PATH = os.getenv("REDIRECT_FAST_PATH", "0") == "1"
+
+# Cache-Control max-age (seconds) for permanent links that do not set their own cache_max_age
+REDIRECT_PERMANENT_MAX_AGE = int(os.getenv("REDIRECT_PERMANENT_MAX_AGE", "86400"))
+
+# route template the redirects are reported under (same label as the FastAPI route)
+REDIRECT_ROUTE = "/r/{code}"
+
+# characters left unescaped in the Location header (same set as starlette's RedirectResponse)
+_LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+# -----------------------------------------------------
+# Redirect policy
+# -----------------------------------------------------
+# columns needed to answer a redirect, in resolve_link() argument order
+def redirect_query(code: str):
+    return select(Link.original_url, Link.expires_at, Link.permanent, Link.cache_max_age).where(
+        Link.short_code == code
+    )
+
+
+def cache_control_header(max_age: int) -> tuple[bytes, bytes]:
+    return (b"cache-control", f"public, max-age={max_age}".encode())
+
+
+# builds the cache entry for a link: 301 for permanent links (cacheable for REDIRECT_PERMANENT_MAX_AGE
+# unless the link sets cache_max_age), 307 otherwise (cacheable only when cache_max_age is set)
+def resolve_link(
+    original_url: str,
+    expires_at: Optional[datetime],
+    permanent: bool = False,
+    cache_max_age: Optional[int] = None,
+) -> ResolvedLink:
+    if permanent and cache_max_age is None:
+        cache_max_age = REDIRECT_PERMANENT_MAX_AGE
+    headers = [
+        (b"location", quote(original_url, safe=_LOCATION_SAFE).encode("latin-1")),
+        (b"content-length", b"0"),
+    ]
+    # links with an expiry get their max-age capped per request (see redirect_headers)
+    if cache_max_age is not None and expires_at is None:
+        headers.append(cache_control_header(cache_max_age))
+    return ResolvedLink(original_url, expires_at, 301 if permanent else 307, cache_max_age, tuple(headers))
+
+
+# response headers for a live link at `now`; caches never keep an expiring link past its expiry
+def redirect_headers(target: ResolvedLink, now: datetime) -> list[tuple[bytes, bytes]]:
+    if target.expires_at is None or target.cache_max_age is None:
+        return list(target.raw_headers)
+    remaining = int((target.expires_at - now).total_seconds())
+    return [*target.raw_headers, cache_control_header(max(0, min(target.cache_max_age, remaining)))]
+
+
+def redirect_response(target: ResolvedLink, now: datetime) -> Response:
+    response = Response(status_code=target.status_code)
+    response.raw_headers = redirect_headers(target, now)
+    return response
+
+
+# loads live links among `codes` (e.g. the trending ones) into the redirect cache; returns how many
+def warm_redirect_cache(codes: list[str]) -> int:
+    if not codes:
+        return 0
+    stmt = select(Link.short_code, Link.original_url, Link.expires_at, Link.permanent, Link.cache_max_age)
+    with Session(read_engine) as session:
+        rows = session.exec(stmt.where(Link.short_code.in_(codes))).all()
+    now = datetime.utcnow()
+    warmed = 0
+    for code, *policy in rows:
+        target = resolve_link(*policy)
+        if target.expires_at is None or target.expires_at > now:
+            redirect_cache.set(code, target)
+            warmed += 1
+    return warmed
+
+
+# -----------------------------------------------------
+# Fast path
+# -----------------------------------------------------
+class FastRedirectMiddleware:
+    """Serves GET /r/{code} for live links straight from the redirect cache.
+
+    Added outermost, so hits skip SessionMiddleware, routing and dependency injection.
+    Unknown and expired codes fall through to the regular route, which renders the 404/410.
+    Clicks and request metrics are recorded exactly like the regular route does.
+    """
+
+    def __init__(self, app, sample_rate: float = METRICS_REDIRECT_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    @staticmethod
+    def _load(code: str) -> Optional[ResolvedLink]:
+        row = code_snapshot.lookup(code)
+        if row is None:
+            with Session(read_engine) as session:
+                row = session.exec(redirect_query(code)).first()
+        return resolve_link(*row) if row else None
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or scope["method"] != "GET" or not path.startswith("/r/"):
+            await self.app(scope, receive, send)
+            return
+        code = path[3:]
+        if not code or "/" in code:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        target = redirect_cache.get(code)
+        if target is None:
+            # swept codes: the route answers the 410 from the tombstone set
+            if code in tombstones:
+                await self.app(scope, receive, send)
+                return
+            target = await anyio.to_thread.run_sync(self._load, code)
+            if target is None:
+                await self.app(scope, receive, send)
+                return
+            redirect_cache.set(code, target)
+        now = datetime.utcnow()
+        if target.expires_at and target.expires_at <= now:
+            await self.app(scope, receive, send)
+            return
+
+        referrer = user_agent = None
+        for name, value in scope["headers"]:
+            if name == b"referer":
+                referrer = value.decode("latin-1")
+            elif name == b"user-agent":
+                user_agent = value.decode("latin-1")
+        flush = click_buffer.record(code, referrer=referrer, ua_family=ua_family(user_agent))
+        trending.record(code)
+
+        await send({"type": "http.response.start", "status": target.status_code, "headers": redirect_headers(target, now)})
+        await send({"type": "http.response.body", "body": b""})
+
+        REQUEST_COUNT.labels("GET", REDIRECT_ROUTE, str(target.status_code)).inc()
+        if self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+            REQUEST_LATENCY.labels("GET", REDIRECT_ROUTE).observe(time.perf_counter() - start)
+        if flush:
+            await anyio.to_thread.run_sync(click_buffer.flush, engine)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, AnyUrl
+from pydantic import BaseModel, AnyUrl, Field
 
 # schema for creating a new shortened link (POST /api/links)
 class LinkCreate(BaseModel):
@@ -8,6 +8,8 @@ class LinkCreate(BaseModel):
     custom_code: Optional[str] = None
     expires_at: Optional[datetime] = None
     label: Optional[str] = None
+    permanent: bool = False
+    cache_max_age: Optional[int] = Field(default=None, ge=0)
 
 # schema for reading a shortened link (GET /api/links/{short_code})
 class LinkRead(BaseModel):
@@ -18,6 +20,8 @@ class LinkRead(BaseModel):
     expires_at: Optional[datetime] = None
     click_count: int
     last_accessed: Optional[datetime] = None
+    permanent: bool = False
+    cache_max_age: Optional[int] = None
 
 # schema for updating a shortened link (PATCH /api/links/{short_code})
 class LinkUpdate(BaseModel):
@@ -25,6 +29,8 @@ class LinkUpdate(BaseModel):
     custom_code: Optional[str] = None
     expires_at: Optional[datetime] = None
     label: Optional[str] = None
+    permanent: Optional[bool] = None
+    cache_max_age: Optional[int] = Field(default=None, ge=0)
 
 # schema for link statistics (GET /api/links/{short_code}/stats)
 class StatsRead(BaseModel):
@@ -44,4 +50,41 @@ class UserRead(BaseModel):
 # schema for user login (POST /api/login)
 class LoginForm(BaseModel):
     username: str
-    password: str
\ No newline at end of file
+    password: str
+
+# per-item outcome of a bulk create (POST /api/links/bulk)
+class BulkLinkResult(BaseModel):
+    index: int
+    status: int
+    short_code: Optional[str] = None
+    error: Optional[str] = None
+
+# schema for bulk create responses (POST /api/links/bulk)
+class BulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkLinkResult]
+
+# one time bucket of a click timeseries
+class TimeseriesPoint(BaseModel):
+    bucket_start: datetime
+    clicks: int
+
+# schema for click timeseries (GET /api/links/{short_code}/stats/timeseries)
+class TimeseriesRead(BaseModel):
+    short_code: str
+    granularity: str
+    points: list[TimeseriesPoint]
+
+# one entry of the trending list; clicks is a count-min estimate (may overcount slightly)
+class TrendingLink(BaseModel):
+    short_code: str
+    clicks: int
+
+# schema for the most clicked links in a recent window (GET /api/trending); the counts cover only
+# the redirects served by the worker process that answered (`scope` is always "worker")
+class TrendingRead(BaseModel):
+    window: str
+    scope: str = "worker"
+    worker_pid: int
+    links: list[TrendingLink]
@@ -0,0 +1,48 @@
+# fast JSON mode for the link API (FAST_JSON=1): list/read/create build plain dicts with the LinkRead
+# fields straight from row tuples and encode them with orjson, skipping ORM hydration, LinkRead
+# construction, FastAPI's response_model re-validation and the stdlib encoder.
+# The bytes match the default mode's LinkRead JSON (tests/test_serialization.py).
+
+import os
+
+from starlette.responses import Response
+
+from app.clicks import merged_clicks
+from app.metrics import phase
+
+try:
+    import orjson
+except ImportError:  # only FAST_JSON needs it
+    orjson = None
+
+# set FAST_JSON=1 to serve link listings/reads/creates through link_dict + FastJSONResponse
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+
+if FAST_JSON and orjson is None:
+    raise RuntimeError("FAST_JSON=1 requires the orjson package")
+
+
+# a link row (or Link) as a LinkRead-shaped dict, with clicks still waiting in the buffer merged in
+def link_dict(row) -> dict:
+    click_count, last_accessed = merged_clicks(row)
+    return {
+        "short_code": row.short_code,
+        "original_url": row.original_url,
+        "label": row.label,
+        "created_at": row.created_at,
+        "expires_at": row.expires_at,
+        "click_count": click_count,
+        "last_accessed": last_accessed,
+        "permanent": row.permanent,
+        "cache_max_age": row.cache_max_age,
+    }
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded with orjson (timed as the "serialize" request phase)."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        with phase("serialize"):
+            return orjson.dumps(content)
@@ -1,12 +1,28 @@
 # helper functions for random short code generation, url scheme validation, selection between custom and generated codes
 
+import hashlib
+import os
 import secrets
 import string
-from typing import Optional
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Optional
 
 # defines character set used for generating random short codes (A-Z, a-z, 0-9)
 ALPHABET = string.ascii_letters + string.digits
 
+# which allocator generates short codes: "sequence" (collision-free, default) or "random"
+CODE_ALLOCATOR = os.getenv("CODE_ALLOCATOR", "sequence")
+
+# ids reserved from the database per block; each process hands them out without further queries
+CODE_BLOCK_SIZE = int(os.getenv("CODE_BLOCK_SIZE", "1000"))
+
+# key for the permutation that turns sequential ids into non-sequential looking codes
+CODE_PERMUTATION_KEY = os.getenv("CODE_PERMUTATION_KEY", "dev-insecure-code-key-change-me")
+
+# size of the permuted id space: 2**40 ids fit in 7 base62 characters (62**7 ~ 3.5e12)
+CODE_ID_BITS = 40
+
 # -----------------------------------------------------
 # Functions
 # -----------------------------------------------------
@@ -19,6 +35,100 @@ def gen_code(n: int = 7) -> str:
 def sanitize_scheme(url: str) -> bool:
     return url.startswith("http://") or url.startswith("https://")
 
+# encodes a non-negative integer in base62 using ALPHABET, left-padded to width characters
+def base62_encode(n: int, width: int = 7) -> str:
+    chars = []
+    while n:
+        n, rem = divmod(n, 62)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars)).rjust(width, ALPHABET[0])
+
+# keyed Feistel network: a bijection on [0, 2**bits), so distinct ids always give distinct outputs
+def feistel_permute(n: int, key: bytes, bits: int = CODE_ID_BITS, rounds: int = 4) -> int:
+    half = bits // 2
+    mask = (1 << half) - 1
+    left, right = n >> half, n & mask
+    for i in range(rounds):
+        digest = hashlib.blake2b(right.to_bytes(8, "big"), key=key, digest_size=8, salt=bytes([i]) * 16).digest()
+        left, right = right, left ^ (int.from_bytes(digest, "big") & mask)
+    return (left << half) | right
+
+# -----------------------------------------------------
+# Code allocators
+# -----------------------------------------------------
+class RandomCodeAllocator:
+    """Random 7-character codes; collisions are possible and handled by the caller."""
+
+    unique = False
+
+    def next_code(self) -> str:
+        return gen_code()
+
+
+class SequenceCodeAllocator:
+    """Collision-free codes from a counter: ids come in blocks reserved from the database,
+    are permuted with a keyed Feistel network and base62-encoded. Generated codes never
+    repeat, so no pre-check query is needed (only custom codes can still clash)."""
+
+    unique = True
+
+    def __init__(self, reserve_block: Callable[[int], int], block_size: int = CODE_BLOCK_SIZE, key: str = CODE_PERMUTATION_KEY):
+        self._reserve_block = reserve_block
+        self._block_size = block_size
+        self._key = hashlib.blake2b(key.encode(), digest_size=32).digest()
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_code(self) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve_block(self._block_size)
+                self._end = self._next + self._block_size
+            n = self._next
+            self._next += 1
+        return base62_encode(feistel_permute(n, self._key))
+
+
+# reserves a block of ids from the shared counter in the database (imported lazily to keep this module DB-free)
+def _reserve_from_db(size: int) -> int:
+    from app.db import reserve_id_block
+    return reserve_id_block("link_code", size)
+
+# builds the allocator selected by CODE_ALLOCATOR
+def make_allocator(name: str = CODE_ALLOCATOR):
+    if name == "random":
+        return RandomCodeAllocator()
+    if name == "sequence":
+        return SequenceCodeAllocator(_reserve_from_db)
+    raise ValueError(f"Unknown CODE_ALLOCATOR: {name}")
+
+code_allocator = make_allocator()
+
 # chooses between a custom short code provided by the user and a generated one; returns the custom if given, else generates a new code
 def choose_code(custom: Optional[str]) -> str:
-    return custom if custom else gen_code()
\ No newline at end of file
+    return custom if custom else code_allocator.next_code()
+
+# converts an aware datetime to naive UTC (how timestamps are stored); naive values are taken as UTC already
+def naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt and dt.tzinfo else dt
+
+# maps a User-Agent header to a coarse browser/client family for click analytics
+def ua_family(user_agent: Optional[str]) -> str:
+    if not user_agent:
+        return "Other"
+    ua = user_agent.lower()
+    if "bot" in ua or "spider" in ua or "crawl" in ua:
+        return "Bot"
+    for marker, family in (
+        ("edg/", "Edge"),
+        ("opr/", "Opera"),
+        ("firefox/", "Firefox"),
+        ("chrome/", "Chrome"),
+        ("safari/", "Safari"),
+        ("curl/", "curl"),
+        ("python", "Python"),
+    ):
+        if marker in ua:
+            return family
+    return "Other"
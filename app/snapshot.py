@@ -0,0 +1,236 @@
+# short-code snapshot (SHORTCODE_SNAPSHOT=1): every link's redirect target in one read-only file,
+# sorted by short code, that all worker processes mmap and binary-search. The OS page cache holds a
+# single copy however many workers there are, and lookups never touch SQLAlchemy.
+#
+# One worker (whichever takes the lock file) rewrites the file every SNAPSHOT_INTERVAL seconds into a
+# temporary file that is renamed over the old one, so readers always see a complete snapshot; each
+# worker remaps when the file changes. Codes created after a build are not in it and fall back to the
+# database; codes updated or deleted after a build are marked dirty (through the same invalidations
+# as the redirect cache) and skip the snapshot until a newer build covers them.
+#
+# File layout (little endian):
+#   header   magic | built_at (epoch seconds the build started reading) | record count
+#   records  key (short code, NUL padded to KEY_WIDTH) | url offset | url length
+#            | expires_at (microseconds since the epoch, NEVER = no expiry) | cache_max_age (-1 = none) | permanent
+#   urls     UTF-8 original URLs, concatenated
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from app.metrics import SNAPSHOT_BUILDS, SNAPSHOT_LINKS, SNAPSHOT_LOOKUPS
+from app.models import Link
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process builds its own
+    fcntl = None
+
+# set SHORTCODE_SNAPSHOT=1 to serve redirect lookups from the snapshot before the database
+SHORTCODE_SNAPSHOT = os.getenv("SHORTCODE_SNAPSHOT", "0") == "1"
+
+# where the snapshot lives; every worker of one deployment must see the same file
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "./minilink.codes.snapshot")
+
+# seconds between rebuilds
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "60"))
+
+# rows read per round trip while building
+SNAPSHOT_BUILD_CHUNK = 5000
+
+MAGIC = b"MLSNAP01"
+KEY_WIDTH = 32
+NEVER = -(2 ** 63)
+HEADER = struct.Struct("<8sdQ")
+RECORD = struct.Struct(f"<{KEY_WIDTH}sQIqiB")
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _key(code: str) -> Optional[bytes]:
+    key = code.encode()
+    return key.ljust(KEY_WIDTH, b"\0") if 0 < len(key) <= KEY_WIDTH and b"\0" not in key else None
+
+
+# -----------------------------------------------------
+# Building
+# -----------------------------------------------------
+# writes a snapshot of all links to `path` (atomically replacing it); returns the number of links
+def build_snapshot(engine, path: str = SNAPSHOT_PATH) -> int:
+    start = time.perf_counter()
+    built_at = time.time()
+    # byte order of the codes (the order lookups search in): sqlite compares bytes already
+    order = Link.short_code.collate("C") if engine.dialect.name == "postgresql" else Link.short_code
+    query = (
+        select(Link.short_code, Link.original_url, Link.expires_at, Link.permanent, Link.cache_max_age)
+        .order_by(order)
+        .execution_options(yield_per=SNAPSHOT_BUILD_CHUNK)
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out, tempfile.TemporaryFile(dir=directory) as urls:
+            out.write(HEADER.pack(MAGIC, built_at, 0))
+            count, offset, previous = 0, 0, b""
+            with Session(engine) as session:
+                for code, original_url, expires_at, permanent, cache_max_age in session.exec(query):
+                    key = _key(code)
+                    # longer codes are simply not in the snapshot (they resolve from the database)
+                    if key is None:
+                        continue
+                    if key <= previous:
+                        raise ValueError(f"short codes are not in byte order at {code!r}")
+                    url = original_url.encode()
+                    expires = NEVER if expires_at is None else (expires_at - EPOCH) // MICROSECOND
+                    max_age = -1 if cache_max_age is None else cache_max_age
+                    out.write(RECORD.pack(key, offset, len(url), expires, max_age, bool(permanent)))
+                    urls.write(url)
+                    count, offset, previous = count + 1, offset + len(url), key
+            urls.seek(0)
+            shutil.copyfileobj(urls, out)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, built_at, count))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    SNAPSHOT_BUILDS.observe(time.perf_counter() - start)
+    return count
+
+
+# -----------------------------------------------------
+# Reading
+# -----------------------------------------------------
+class SnapshotView:
+    """One mapped snapshot file. Stays valid after the file is replaced (the mapping keeps the old inode)."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.identity = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.built_at, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a short-code snapshot")
+        self._urls = HEADER.size + self.count * RECORD.size
+
+    # (original_url, expires_at, permanent, cache_max_age) like LinkRepository.redirect_row, or None
+    def find(self, code: str) -> Optional[tuple]:
+        key = _key(code)
+        if key is None:
+            return None
+        mm, lo, hi = self._mm, 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = HEADER.size + mid * RECORD.size
+            probe = mm[pos:pos + KEY_WIDTH]
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                _, offset, length, expires, max_age, permanent = RECORD.unpack_from(mm, pos)
+                start = self._urls + offset
+                return (
+                    mm[start:start + length].decode(),
+                    None if expires == NEVER else EPOCH + expires * MICROSECOND,
+                    bool(permanent),
+                    None if max_age < 0 else max_age,
+                )
+        return None
+
+
+class CodeSnapshot:
+    """The current snapshot of this process, plus the codes changed since it was built."""
+
+    def __init__(self, path: str = SNAPSHOT_PATH, enabled: bool = SHORTCODE_SNAPSHOT, interval: float = SNAPSHOT_INTERVAL):
+        self.path = path
+        self.enabled = enabled
+        self.interval = interval
+        self._view: Optional[SnapshotView] = None
+        # code -> time.time() it was invalidated; dropped once a snapshot built after that is loaded
+        self._dirty: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._hits = SNAPSHOT_LOOKUPS.labels("hit")
+        self._misses = SNAPSHOT_LOOKUPS.labels("miss")
+        self._dirty_hits = SNAPSHOT_LOOKUPS.labels("dirty")
+
+    # redirect row for `code`, or None when the database has to answer
+    def lookup(self, code: str) -> Optional[tuple]:
+        view = self._view
+        if view is None:
+            return None
+        if code in self._dirty:
+            self._dirty_hits.inc()
+            return None
+        row = view.find(code)
+        (self._hits if row else self._misses).inc()
+        return row
+
+    # a link was updated, renamed, deleted or revived (same name as LRUTTLCache.invalidate, so cache_sync can replay it)
+    def invalidate(self, code: str) -> None:
+        if self.enabled:
+            with self._lock:
+                self._dirty[code] = time.time()
+
+    # maps the file if it changed since the last call; returns True when a new snapshot was loaded
+    def reload(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        current = self._view
+        if current is not None and (stat.st_ino, stat.st_mtime_ns) == (current.identity.st_ino, current.identity.st_mtime_ns):
+            return False
+        view = SnapshotView(self.path)
+        with self._lock:
+            self._view = view
+            self._dirty = {code: when for code, when in self._dirty.items() if when >= view.built_at}
+        SNAPSHOT_LINKS.set(view.count)
+        return True
+
+    # rebuilds the file when it is older than `max_age` (default: the interval; one process at a time),
+    # then maps the newest one; returns True when a new snapshot was loaded
+    def refresh(self, engine, max_age: Optional[float] = None) -> bool:
+        if not self.enabled:
+            return False
+        max_age = self.interval if max_age is None else max_age
+        if self._stale(max_age):
+            with open(self.path + ".lock", "a") as lock:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # another worker is writing it; pick it up on the next refresh
+                        return self.reload()
+                # another worker may have finished a rebuild just before we took the lock
+                if self._stale(max_age):
+                    build_snapshot(engine, self.path)
+        return self.reload()
+
+    def _stale(self, max_age: float) -> bool:
+        try:
+            return time.time() - os.stat(self.path).st_mtime >= max_age
+        except FileNotFoundError:
+            return True
+
+    # when the mapped snapshot started reading the links (naive UTC), None before the first load
+    @property
+    def built_at(self) -> Optional[datetime]:
+        return datetime.utcfromtimestamp(self._view.built_at) if self._view else None
+
+    def __len__(self) -> int:
+        return self._view.count if self._view else 0
+
+
+code_snapshot = CodeSnapshot()
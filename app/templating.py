@@ -0,0 +1,86 @@
+# Jinja environment for the HTML pages: bytecode cache on disk, auto-reload off unless asked for,
+# and helpers to precompile every template and to stream a render instead of building it in memory
+#
+# Jinja is imported on the first render (or precompile), not at app import, so API-only processes
+# and health checks never pay for it.
+
+import os
+from typing import Iterable, Iterator
+
+from starlette.responses import StreamingResponse
+
+from app.metrics import phase
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+# compiled template bytecode is kept here and shared by all processes (default: a per-user temp dir)
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR") or None
+
+# set TEMPLATE_AUTO_RELOAD=1 while editing templates; otherwise sources are not re-checked per render
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "0") == "1"
+
+# streamed pages are sent in chunks of about this many characters
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_env = None
+_templates = None
+
+
+# the shared jinja2.Environment, created on first use
+def get_env():
+    global _env
+    if _env is None:
+        import jinja2
+        if TEMPLATE_CACHE_DIR:
+            os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        _env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+            autoescape=True,
+            auto_reload=TEMPLATE_AUTO_RELOAD,
+            bytecode_cache=jinja2.FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+        )
+    return _env
+
+
+def get_templates():
+    global _templates
+    if _templates is None:
+        from fastapi.templating import Jinja2Templates
+        _templates = Jinja2Templates(env=get_env())
+    return _templates
+
+
+# Jinja2Templates.TemplateResponse, timed as the "template" request phase
+def render(name: str, context: dict, **kwargs):
+    with phase("template"):
+        return get_templates().TemplateResponse(name, context, **kwargs)
+
+
+# compiles every template once (filling the bytecode cache); used before forking workers and at image build
+def precompile_templates() -> list[str]:
+    env = get_env()
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    return names
+
+
+# joins many small strings (template output, export lines) into larger chunks, so a streamed
+# response sends a few big body messages instead of one per piece
+def join_chunks(parts: Iterable[str], size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    buf: list[str] = []
+    length = 0
+    for part in parts:
+        buf.append(part)
+        length += len(part)
+        if length >= size:
+            yield "".join(buf)
+            buf, length = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def stream_template(name: str, context: dict) -> StreamingResponse:
+    """Render `name` incrementally; lazy iterables in `context` are consumed while the body is sent."""
+    template = get_env().get_template(name)
+    return StreamingResponse(join_chunks(template.generate(context)), media_type="text/html; charset=utf-8")
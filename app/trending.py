@@ -0,0 +1,275 @@
+# trending links: streaming heavy hitters over sliding time windows, fed by every redirect
+#
+# Each window (TRENDING_WINDOWS, e.g. 5m) is a ring of TRENDING_SLICES count-min sketches, one per
+# slice of the window, plus a running total sketch (sum of the live slices). A bounded candidate set
+# holds the codes with the highest estimates, so GET /api/trending answers in O(candidates) and
+# memory stays fixed however many links exist. Estimates can overcount (hash collisions), never
+# undercount. Like the click buffer this is per process: each worker ranks only the redirects it served,
+# and GET /api/trending labels its answer as such.
+
+import heapq
+import os
+import random
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter, sub
+from typing import Callable, Optional
+
+from sqlmodel import Session, select
+
+from app.models import ClickRollup, Link
+
+# set TRENDING=0 to stop tracking (GET /api/trending then answers 404)
+TRENDING = os.getenv("TRENDING", "1") == "1"
+
+# windows that can be queried, smallest first
+TRENDING_WINDOWS = os.getenv("TRENDING_WINDOWS", "1m,5m,15m,1h")
+
+# slices per window (a window slides in steps of window / slices)
+TRENDING_SLICES = int(os.getenv("TRENDING_SLICES", "12"))
+
+# count-min sketch size: overcount is at most ~e/width of the window's clicks, with probability
+# 1 - e^-depth; memory is windows * (slices + 1) * width * depth * 8 bytes (3.4 MB by default)
+TRENDING_WIDTH = int(os.getenv("TRENDING_WIDTH", "2048"))
+TRENDING_DEPTH = int(os.getenv("TRENDING_DEPTH", "4"))
+
+# largest ?limit= accepted, and codes kept as candidates per window
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", "50"))
+TRENDING_CANDIDATES = int(os.getenv("TRENDING_CANDIDATES", str(4 * TRENDING_TOP_K)))
+
+# pending clicks are folded into the sketches every TRENDING_FOLD_INTERVAL seconds, or early once
+# TRENDING_FOLD_MAX distinct codes are pending
+TRENDING_FOLD_INTERVAL = float(os.getenv("TRENDING_FOLD_INTERVAL", "1"))
+TRENDING_FOLD_MAX = int(os.getenv("TRENDING_FOLD_MAX", "10000"))
+
+# at startup, replay up to TRENDING_WARM_ROWS recent minute rollups into the tracker and load the
+# TRENDING_WARM_LINKS hottest codes into the redirect cache (0 disables)
+TRENDING_WARM_ROWS = int(os.getenv("TRENDING_WARM_ROWS", "100000"))
+TRENDING_WARM_LINKS = int(os.getenv("TRENDING_WARM_LINKS", "200"))
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# row hash multipliers are drawn from this seed (str hashes are salted per process already)
+_MULTIPLIER_SEED = 0x5EED
+_MASK64 = (1 << 64) - 1
+
+
+# "90s" / "5m" / "1h" -> seconds
+def parse_window(value: str) -> float:
+    value = value.strip()
+    if len(value) < 2 or value[-1] not in _UNITS or not value[:-1].isdigit() or int(value[:-1]) == 0:
+        raise ValueError(f"invalid window {value!r} (expected e.g. 30s, 5m, 1h)")
+    return int(value[:-1]) * _UNITS[value[-1]]
+
+
+# -----------------------------------------------------
+# Sliding-window heavy hitters
+# -----------------------------------------------------
+class SlidingTopK:
+    """Count-min sketches for the slices of one window, and the best `capacity` codes seen in it."""
+
+    def __init__(self, seconds: float, slices: int, size: int, capacity: int, cells: Callable[[str], list[int]]):
+        self.seconds = seconds
+        self.slice_seconds = seconds / slices
+        self.capacity = capacity
+        self._cells = cells
+        self._zeros = array("q", bytes(8 * size))
+        self._slices = [array("q", self._zeros) for _ in range(slices)]
+        self._total = array("q", self._zeros)
+        # absolute number (time / slice_seconds) of the newest slice
+        self._current: Optional[int] = None
+        # code -> estimated clicks in the window; _floor is a lower bound of those estimates
+        self._candidates: dict[str, int] = {}
+        self._floor = 0
+
+    # starts the slice containing `now`, expiring the slices that fell out of the window
+    def advance(self, now: float) -> None:
+        n = int(now // self.slice_seconds)
+        if self._current is None:
+            self._current = n
+            return
+        if n <= self._current:
+            return
+        ring = len(self._slices)
+        if n - self._current >= ring:
+            self._slices = [array("q", self._zeros) for _ in range(ring)]
+            self._total = array("q", self._zeros)
+            self._candidates.clear()
+        else:
+            for m in range(self._current + 1, n + 1):
+                expired = self._slices[m % ring]
+                if any(expired):
+                    self._total = array("q", map(sub, self._total, expired))
+                    self._slices[m % ring] = array("q", self._zeros)
+            self._reestimate()
+        self._current = n
+
+    def _estimate(self, cells: list[int]) -> int:
+        total = self._total
+        return min(total[cell] for cell in cells)
+
+    def _reestimate(self) -> None:
+        estimates = {code: self._estimate(self._cells(code)) for code in self._candidates}
+        self._candidates = {code: count for code, count in estimates.items() if count > 0}
+        self._floor = min(self._candidates.values(), default=0)
+
+    # counts `count` clicks of `code` at `now` (slightly older times land in their own slice)
+    def add(self, code: str, cells: list[int], count: int, now: float) -> None:
+        n = int(now // self.slice_seconds)
+        if self._current is None or n > self._current:
+            self.advance(now)
+        elif n <= self._current - len(self._slices):
+            return
+        current = self._slices[n % len(self._slices)]
+        total = self._total
+        estimate = None
+        for cell in cells:
+            current[cell] += count
+            total[cell] += count
+            if estimate is None or total[cell] < estimate:
+                estimate = total[cell]
+
+        candidates = self._candidates
+        if code in candidates:
+            candidates[code] = estimate
+        elif len(candidates) < self.capacity:
+            self._floor = min(self._floor, estimate) if candidates else estimate
+            candidates[code] = estimate
+        elif estimate > self._floor:
+            weakest = min(candidates, key=candidates.__getitem__)
+            if candidates[weakest] < estimate:
+                del candidates[weakest]
+                candidates[code] = estimate
+            self._floor = min(candidates.values())
+
+    def discard(self, code: str) -> None:
+        self._candidates.pop(code, None)
+
+    # up to `limit` (code, estimated clicks), most clicked first
+    def top(self, limit: int) -> list[tuple[str, int]]:
+        return heapq.nlargest(limit, self._candidates.items(), key=itemgetter(1))
+
+
+class TrendingTracker:
+    """Top-K links per sliding window (see module comment). Safe to share between threads.
+
+    Redirects only bump a pending counter; fold() (every TRENDING_FOLD_INTERVAL, and before each
+    query) adds the pending counts to the sketches off the request path.
+    """
+
+    def __init__(
+        self,
+        windows: str = TRENDING_WINDOWS,
+        slices: int = TRENDING_SLICES,
+        width: int = TRENDING_WIDTH,
+        depth: int = TRENDING_DEPTH,
+        capacity: int = TRENDING_CANDIDATES,
+        fold_max: int = TRENDING_FOLD_MAX,
+        enabled: bool = TRENDING,
+    ):
+        self.width = width
+        self.depth = depth
+        self.fold_max = fold_max
+        rng = random.Random(_MULTIPLIER_SEED)
+        self._multipliers = [rng.getrandbits(64) | 1 for _ in range(depth)]
+        names = [name.strip() for name in windows.split(",") if name.strip()] if enabled else []
+        self.windows = {
+            name: SlidingTopK(parse_window(name), slices, width * depth, capacity, self._cells)
+            for name in sorted(names, key=parse_window)
+        }
+        self._all = list(self.windows.values())
+        # code -> clicks not folded into the sketches yet
+        self._pending: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # guards the sketches; held while folding so recorders only ever wait for _lock
+        self._fold_lock = threading.Lock()
+
+    # one counter per sketch row: multiply-shift hashing of the process-salted str hash with a random
+    # odd multiplier per row, so two codes that collide in one row rarely collide in the others
+    def _cells(self, code: str) -> list[int]:
+        h = hash(code) & _MASK64
+        width = self.width
+        return [row * width + (((h * m) & _MASK64) >> 32) % width for row, m in enumerate(self._multipliers)]
+
+    def _add(self, code: str, count: int, when: float) -> None:
+        cells = self._cells(code)
+        for window in self._all:
+            window.add(code, cells, count, when)
+
+    # counts clicks now (pending until the next fold), or at an explicit past time `when` (epoch seconds)
+    def record(self, code: str, count: int = 1, when: Optional[float] = None) -> None:
+        if not self._all:
+            return
+        if when is not None:
+            with self._fold_lock:
+                self._add(code, count, when)
+            return
+        with self._lock:
+            pending = self._pending
+            pending[code] = pending.get(code, 0) + count
+            full = len(pending) >= self.fold_max
+        if full:
+            self.fold()
+
+    # adds the pending clicks to every window at time `now`; returns the number of codes folded
+    def fold(self, now: Optional[float] = None) -> int:
+        with self._fold_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            now = time.time() if now is None else now
+            for code, count in batch.items():
+                self._add(code, count, now)
+            return len(batch)
+
+    # forgets a deleted link (its sketch counts age out with the window)
+    def discard(self, code: str) -> None:
+        with self._fold_lock:
+            with self._lock:
+                self._pending.pop(code, None)
+            for window in self._all:
+                window.discard(code)
+
+    # up to `limit` (code, estimated clicks) in the last `window`, most clicked first
+    def top(self, window: str, limit: int = TRENDING_TOP_K, now: Optional[float] = None) -> list[tuple[str, int]]:
+        tracker = self.windows[window]
+        now = time.time() if now is None else now
+        self.fold(now)
+        with self._fold_lock:
+            tracker.advance(now)
+            return tracker.top(limit)
+
+    # -------------------------------------------------
+    # Warm start
+    # -------------------------------------------------
+    # replays recent minute rollups (oldest first) so a restarted worker is not blind; returns rows read
+    def load_recent(self, engine, max_rows: int = TRENDING_WARM_ROWS) -> int:
+        if not self._all or max_rows <= 0:
+            return 0
+        since = datetime.utcnow() - timedelta(seconds=self._all[-1].seconds)
+        with Session(engine) as session:
+            rows = session.exec(recent_rollups_query(since, max_rows)).all()
+        for code, bucket_start, clicks in reversed(rows):
+            self.record(code, clicks, bucket_start.replace(tzinfo=timezone.utc).timestamp())
+        return len(rows)
+
+    # codes of the largest window's top `limit`
+    def hottest(self, limit: int = TRENDING_WARM_LINKS) -> list[str]:
+        if not self._all or limit <= 0:
+            return []
+        return [code for code, _ in self.top(next(reversed(self.windows)), limit)]
+
+
+# newest minute rollups first, newer than `since` (index ix_clickrollup_recent)
+def recent_rollups_query(since: datetime, limit: int):
+    return (
+        select(Link.short_code, ClickRollup.bucket_start, ClickRollup.clicks)
+        .join(Link, Link.id == ClickRollup.link_id)
+        .where(ClickRollup.granularity == "minute", ClickRollup.bucket_start >= since)
+        .order_by(ClickRollup.bucket_start.desc())
+        .limit(limit)
+    )
+
+
+trending = TrendingTracker()
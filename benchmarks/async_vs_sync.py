@@ -0,0 +1,121 @@
+# Compare requests/sec of the sync handlers against the ASYNC_DB=1 handlers.
+#
+# Starts a local uvicorn server once per mode, seeds a user and some links, then
+# drives redirect / create / list / stats with a fixed number of concurrent clients.
+# The redirect cache is disabled by default so the numbers reflect the DB path.
+#
+#   python benchmarks/async_vs_sync.py --concurrency 64 --duration 10
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# starts uvicorn in a subprocess and waits until /health answers
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, **env},
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return proc
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+# runs `concurrency` workers calling make_request for `duration` seconds; returns req/s
+async def drive(client: httpx.AsyncClient, make_request, concurrency: int, duration: float) -> float:
+    done = 0
+    stop = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal done
+        while time.perf_counter() < stop:
+            await make_request(client)
+            done += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return done / (time.perf_counter() - start)
+
+
+async def bench_mode(base_url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        creds = {"username": "bench", "password": "bench"}
+        await client.post("/signup", data=creds)
+        await client.post("/login", data=creds)
+        codes = []
+        for i in range(args.links):
+            r = await client.post("/api/links", json={"original_url": f"https://example.com/{i}"})
+            codes.append(r.json()["short_code"])
+
+        async def redirect(c):
+            await c.get(f"/r/{random.choice(codes)}")
+
+        created = []
+
+        async def create(c):
+            r = await c.post("/api/links", json={"original_url": "https://example.com/new"})
+            created.append(r.json()["short_code"])
+
+        async def list_links(c):
+            await c.get("/api/links")
+
+        async def stats(c):
+            await c.get(f"/api/links/{random.choice(codes)}/stats")
+
+        results = {}
+        for name, fn in [("redirect", redirect), ("stats", stats), ("list_links", list_links), ("create_link", create)]:
+            results[name] = await drive(client, fn, args.concurrency, args.duration)
+
+        # leave the DB as we found it so the next mode sees the same link count
+        for code in codes + created:
+            await client.delete(f"/api/links/{code}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--links", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache", action="store_true", help="keep the redirect cache enabled")
+    args = parser.parse_args()
+
+    table = {}
+    for mode, flag in [("sync", "0"), ("async", "1")]:
+        env = {"ASYNC_DB": flag}
+        if not args.cache:
+            env["REDIRECT_CACHE_SIZE"] = "0"
+        proc = start_server(args.port, env)
+        try:
+            table[mode] = asyncio.run(bench_mode(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"{'endpoint':<12} {'sync req/s':>12} {'async req/s':>12} {'change':>8}")
+    for name in table["sync"]:
+        before, after = table["sync"][name], table["async"][name]
+        print(f"{name:<12} {before:>12.1f} {after:>12.1f} {after / before - 1:>+8.0%}")
+
+
+if __name__ == "__main__":
+    main()
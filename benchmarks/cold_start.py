@@ -0,0 +1,77 @@
+# Cold start: time to import app.main and run its lifespan startup, in fresh processes.
+#
+# Each run starts a new interpreter on an empty temporary database with -X importtime, so the
+# numbers include everything a new container pays before /health can answer. Reports the median
+# import and lifespan time and the modules with the highest cumulative import time.
+#
+#   python benchmarks/cold_start.py --runs 5
+#   python benchmarks/cold_start.py --runs 5 --env SEED_DEMO_USER=1
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# prints "<import seconds> <lifespan startup seconds>"
+SCRIPT = """
+import asyncio, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def boot():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        print(imported - start, time.perf_counter() - imported)
+
+asyncio.run(boot())
+"""
+
+
+# runs SCRIPT once; returns (import s, lifespan s, {module: cumulative import us})
+def measure(env: dict) -> tuple[float, float, dict[str, int]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        run_env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'start.sqlite3')}", **env}
+        run_env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT],
+            cwd=ROOT, env=run_env, capture_output=True, text=True, check=True,
+        )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    import_s, lifespan_s = (float(value) for value in result.stdout.split())
+    return import_s, lifespan_s, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="minilink cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE")
+    args = parser.parse_args()
+    env = dict(pair.split("=", 1) for pair in args.env)
+
+    runs = [measure(env) for _ in range(args.runs)]
+    imports = [r[0] * 1000 for r in runs]
+    lifespans = [r[1] * 1000 for r in runs]
+    print(f"import   median {statistics.median(imports):8.1f} ms  (min {min(imports):.1f})")
+    print(f"lifespan median {statistics.median(lifespans):8.1f} ms  (min {min(lifespans):.1f})")
+
+    # top-level packages only, from the last run
+    modules = runs[-1][2]
+    top = sorted(((us, name) for name, us in modules.items() if "." not in name), reverse=True)
+    print("slowest imports (cumulative):")
+    for us, name in top[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
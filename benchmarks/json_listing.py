@@ -0,0 +1,84 @@
+# JSON serialization cost of large listings: default mode (Link objects -> LinkRead -> response_model
+# validation -> stdlib json) against FAST_JSON=1 (column rows -> dicts -> orjson).
+#
+# Seeds a temporary SQLite database with one user owning --links links, then, for each mode in a
+# fresh process, reads the whole listing through GET /api/links (pages of --page-size) --repeat
+# times in-process (TestClient, no sockets) and reports ms per full listing and per page.
+#
+#   python benchmarks/json_listing.py --links 10000 --repeat 5
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+# runs in the child process: one mode, prints the per-listing times in seconds
+def measure(args) -> None:
+    sys.path.insert(0, ROOT)
+    from fastapi.testclient import TestClient
+
+    from load_test import PASSWORD
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.post("/login", data={"username": "bench0", "password": PASSWORD})
+        times = []
+        for _ in range(args.repeat + 1):
+            start = time.perf_counter()
+            cursor, rows = None, 0
+            while True:
+                params = {"limit": args.page_size, **({"cursor": cursor} if cursor else {})}
+                r = client.get("/api/links", params=params)
+                r.raise_for_status()
+                rows += len(r.json())
+                cursor = r.headers.get("x-next-cursor")
+                if not cursor:
+                    break
+            times.append(time.perf_counter() - start)
+        assert rows == args.links, rows
+    # the first pass warms caches and the connection pool
+    print(" ".join(str(t) for t in times[1:]))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="minilink listing serialization benchmark")
+    parser.add_argument("--links", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args)
+        return 0
+
+    from load_test import seed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        seed(db_path, 1, args.links, args.seed)
+        results = {}
+        for name, fast in (("default", "0"), ("fast_json", "1")):
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "FAST_JSON": fast, "CLICK_EVENTS": "0"}
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--measure", "--links", str(args.links),
+                 "--page-size", str(args.page_size), "--repeat", str(args.repeat)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            results[name] = statistics.median(float(t) for t in out.split())
+            pages = -(-args.links // args.page_size)
+            print(f"{name:<10} {results[name] * 1000:9.1f} ms / {args.links} links  "
+                  f"({results[name] * 1000 / pages:.1f} ms per {args.page_size}-link page)")
+    print(f"speedup    {results['default'] / results['fast_json']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
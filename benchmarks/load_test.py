@@ -0,0 +1,315 @@
+# Reproducible load test for the hot paths: redirect, create_link, list_links and the /links page.
+#
+# Seeds a fresh SQLite database with --users users and --links links, starts a local uvicorn
+# server on it and drives each scenario for --duration seconds with --concurrency clients.
+# Redirect codes are drawn from a Zipf distribution (a few links get most of the traffic).
+# Results (req/s, p50/p95/p99 latency) are printed and written as JSON for later comparison:
+#
+#   python benchmarks/load_test.py run --links 100000 --concurrency 32 --output before.json
+#   ... change something ...
+#   python benchmarks/load_test.py run --links 100000 --concurrency 32 --output after.json
+#   python benchmarks/load_test.py compare before.json after.json --threshold 10
+#
+# compare exits with status 1 when a p99 latency or req/s regresses by more than --threshold percent.
+# Client and server share the machine, so compare runs made on the same host only.
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ("redirect", "create_link", "list_links", "links_page")
+
+PASSWORD = "bench"
+
+
+# -------------------------------
+# Seeding
+# -------------------------------
+# creates the schema and bulk-inserts users and links straight into a new database file
+def seed(db_path: str, users: int, links: int, seed_value: int) -> list[str]:
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import insert
+
+    from app.auth import hash_password
+    from app.db import engine, init_db
+    from app.models import Link, User
+
+    rng = random.Random(seed_value)
+    init_db()
+    password_hash = hash_password(PASSWORD)
+    now = datetime.utcnow()
+    codes = [f"bench{i}" for i in range(links)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"username": f"bench{i}", "password_hash": password_hash} for i in range(users)],
+        )
+        for start in range(0, links, 10000):
+            conn.execute(
+                insert(Link),
+                [
+                    {
+                        "short_code": codes[i],
+                        "original_url": f"https://example.com/{i}",
+                        "user_id": i % users + 1,
+                        "label": rng.choice(("news", "docs", "blog", None)),
+                        "created_at": now - timedelta(minutes=i),
+                        "click_count": rng.randint(0, 1000),
+                    }
+                    for i in range(start, min(start + 10000, links))
+                ],
+            )
+    engine.dispose()
+    return codes
+
+
+class Zipf:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s."""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = []
+        total = 0.0
+        for rank in range(1, n + 1):
+            total += 1.0 / rank ** s
+            self.cumulative.append(total)
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+
+# -------------------------------
+# Server
+# -------------------------------
+# starts uvicorn in a subprocess and waits until /health answers
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env={**os.environ, **env},
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return proc
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+# -------------------------------
+# Load generation
+# -------------------------------
+# nearest-rank percentile of an already sorted list
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 1),
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+# runs `concurrency` logged-in clients calling make_request for `duration` seconds
+async def drive(base_url: str, make_request, args, expected: set) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    stop = 0.0
+
+    async def worker(index: int):
+        nonlocal errors
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            r = await client.post("/login", data={"username": f"bench{index % args.users}", "password": PASSWORD})
+            if r.status_code not in (200, 303):
+                raise RuntimeError(f"login failed: {r.status_code}")
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                try:
+                    r = await make_request(client)
+                    ok = r.status_code in expected
+                except httpx.TransportError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+    stop = time.perf_counter() + args.warmup + args.duration
+    tasks = [asyncio.create_task(worker(i)) for i in range(args.concurrency)]
+    # discard whatever completed during the warm-up period
+    await asyncio.sleep(args.warmup)
+    latencies.clear()
+    errors = 0
+    measured_from = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return summarize(latencies, errors, time.perf_counter() - measured_from)
+
+
+async def run_scenarios(base_url: str, codes: list[str], args) -> dict:
+    zipf = Zipf(len(codes), args.zipf_s, random.Random(args.seed))
+    # shuffle so the hottest codes are not simply the newest links
+    hot = codes[:]
+    random.Random(args.seed).shuffle(hot)
+
+    async def redirect(client):
+        return await client.get(f"/r/{hot[zipf.sample()]}")
+
+    async def create_link(client):
+        return await client.post("/api/links", json={"original_url": "https://example.com/new"})
+
+    async def list_links(client):
+        return await client.get("/api/links", params={"limit": 100})
+
+    async def links_page(client):
+        return await client.get("/links")
+
+    calls = {
+        "redirect": (redirect, {307}),
+        "create_link": (create_link, {201}),
+        "list_links": (list_links, {200}),
+        "links_page": (links_page, {200}),
+    }
+    results = {}
+    for name in args.scenarios:
+        make_request, expected = calls[name]
+        results[name] = await drive(base_url, make_request, args, expected)
+        r = results[name]
+        print(
+            f"{name:<12} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+            f"p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}"
+        )
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def cmd_run(args) -> int:
+    env = dict(pair.split("=", 1) for pair in args.env)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        print(f"seeding {args.users} users / {args.links} links ...")
+        codes = seed(db_path, args.users, args.links, args.seed)
+        proc = start_server(args.port, {"DATABASE_URL": f"sqlite:///{db_path}", **env})
+        try:
+            results = asyncio.run(run_scenarios(f"http://127.0.0.1:{args.port}", codes, args))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "users": args.users,
+            "links": args.links,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "zipf_s": args.zipf_s,
+            "seed": args.seed,
+            "env": env,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+    return 0
+
+
+# -------------------------------
+# Comparison
+# -------------------------------
+def cmd_compare(args) -> int:
+    with open(args.baseline) as f:
+        before = json.load(f)["results"]
+    with open(args.current) as f:
+        after = json.load(f)["results"]
+
+    regressed = False
+    print(f"{'scenario':<12} {'req/s':>20} {'p50 ms':>20} {'p99 ms':>20}")
+    for name in before:
+        if name not in after:
+            continue
+        b, a = before[name], after[name]
+        cells = []
+        for key, higher_is_better in (("rps", True), ("p50_ms", False), ("p99_ms", False)):
+            change = (a[key] / b[key] - 1) * 100 if b[key] else 0.0
+            worse = -change if higher_is_better else change
+            if key != "p50_ms" and worse > args.threshold:
+                regressed = True
+            cells.append(f"{b[key]:>7.1f} -> {a[key]:>7.1f} {change:>+5.0f}%")
+        print(f"{name:<12} " + " ".join(f"{c:>20}" for c in cells))
+    if regressed:
+        print(f"regression beyond {args.threshold}% detected")
+    return 1 if regressed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="minilink load test")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="seed a database, start a server and measure it")
+    run.add_argument("--users", type=int, default=10)
+    run.add_argument("--links", type=int, default=10000)
+    run.add_argument("--concurrency", type=int, default=32)
+    run.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    run.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    run.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent of the redirect code popularity")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--port", type=int, default=8766)
+    run.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    run.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                     help="extra server environment, e.g. --env REDIRECT_CACHE_SIZE=0")
+    run.add_argument("--output", help="write the JSON report here")
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser("compare", help="compare two JSON reports")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Per-request cost of the HTTP metrics middleware.
+#
+# Calls the ASGI app in-process (no sockets) with a minimal app behind:
+#   - no middleware
+#   - the previous BaseHTTPMiddleware version (raw URL path labels)
+#   - MetricsMiddleware (pure ASGI, route-template labels)
+# and reports microseconds per request for a redirect-like route.
+#
+#   python benchmarks/metrics_overhead.py --requests 20000
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.metrics import MetricsMiddleware
+
+# separate registry so the legacy middleware does not collide with app.metrics
+_registry = CollectorRegistry()
+LEGACY_COUNT = Counter("legacy_requests_total", "", ["method", "path", "status"], registry=_registry)
+LEGACY_LATENCY = Histogram("legacy_request_latency_seconds", "", ["method", "path"], registry=_registry)
+
+
+async def legacy_metrics(request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    LEGACY_COUNT.labels(request.method, request.url.path, str(response.status_code)).inc()
+    LEGACY_LATENCY.labels(request.method, request.url.path).observe(time.perf_counter() - start)
+    return response
+
+
+async def redirect(request):
+    return Response(status_code=307, headers={"location": "https://example.com/"})
+
+
+def build(middleware):
+    return Starlette(routes=[Route("/r/{code}", redirect)], middleware=middleware)
+
+
+async def run(app, n: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Starlette builds its middleware stack lazily on the first call
+    start = None
+    for i in range(n + 1):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/r/code{i % 5000}", "raw_path": b"", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+            "app": app,
+        }
+        await app(scope, receive, send)
+        if start is None:
+            start = time.perf_counter()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    variants = {
+        "none": build([]),
+        "BaseHTTPMiddleware (raw path)": build([Middleware(BaseHTTPMiddleware, dispatch=legacy_metrics)]),
+        "MetricsMiddleware (route template)": build([Middleware(MetricsMiddleware)]),
+        "MetricsMiddleware, 10% redirect sampling": build([Middleware(MetricsMiddleware, sample_rate=0.1)]),
+    }
+    for name, app in variants.items():
+        print(f"{name:45s} {asyncio.run(run(app, args.requests)):8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Multi-worker deployment: gunicorn manages several uvicorn worker processes.
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# WEB_CONCURRENCY sets the number of workers (default: one per CPU). Prometheus metrics are
+# collected per process into PROMETHEUS_MULTIPROC_DIR and aggregated by /metrics; cache
+# invalidations are shared between workers through the database (app/cache_sync.py).
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:80")
+graceful_timeout = 30
+
+# the workers inherit this environment; it must be set before prometheus_client is imported there
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "minilink-prometheus"))
+
+
+def on_starting(server):
+    # start with an empty metrics directory so counters from a previous run are not summed in
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+    # create/migrate the schema once in the master, before any worker starts
+    from app.db import engine, init_db
+    init_db()
+    # workers must not inherit the master's pooled connections
+    engine.dispose()
+
+    # fill the template bytecode cache once; workers then load bytecode instead of compiling
+    from app.templating import precompile_templates
+    precompile_templates()
+
+    # write the first short-code snapshot, so every worker maps it instead of racing to build it
+    from app.snapshot import code_snapshot
+    code_snapshot.refresh(engine)
+    engine.dispose()
+
+
+def child_exit(server, worker):
+    # drop the live gauges of a dead worker from the aggregated /metrics output
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
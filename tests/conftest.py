@@ -0,0 +1,38 @@
+# -----------------------------------------------------
+# Shared fixtures: TestClients logged in as a test user
+# -----------------------------------------------------
+
+import uuid
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+# signs up (a no-op when the user exists) and logs in; returns the username
+def _log_in(client: TestClient, username: Optional[str] = None) -> str:
+    username = username or f"user-{uuid.uuid4().hex[:12]}"
+    creds = {"username": username, "password": username}
+    client.post("/signup", data=creds)
+    client.post("/login", data=creds)
+    return username
+
+
+@pytest.fixture
+def log_in():
+    """Logs a client of your own (e.g. around a wrapped app) in: log_in(client, username=None)."""
+    return _log_in
+
+
+@pytest.fixture
+def logged_in_client(request):
+    """TestClient(app) logged in as a brand-new user, so listings only contain the test's own links.
+
+    Pass a username with indirect parametrization to log in as a fixed user instead:
+    @pytest.mark.parametrize("logged_in_client", ["alice"], indirect=True)
+    """
+    with TestClient(app) as client:
+        _log_in(client, getattr(request, "param", None))
+        yield client
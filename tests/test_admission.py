@@ -0,0 +1,167 @@
+# -----------------------------------------------------
+# Admission control: per-class limits, redirect reserve, shedding and rate limiting
+# -----------------------------------------------------
+# A small app with endpoints that hold their slot until released, wrapped in AdmissionMiddleware
+# and driven concurrently through httpx's ASGI transport.
+
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.admission import AdmissionMiddleware, TokenBuckets, request_class
+from app.metrics import ADMISSION_SHED
+
+
+def _app(release: asyncio.Event) -> FastAPI:
+    test_app = FastAPI()
+
+    @test_app.get("/links")
+    async def heavy():
+        await release.wait()
+        return {}
+
+    @test_app.get("/r/{code}")
+    async def redirect(code: str):
+        return {"code": code}
+
+    @test_app.get("/health")
+    async def health():
+        return {}
+
+    return test_app
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _shed(cls: str, reason: str) -> float:
+    return ADMISSION_SHED.labels(cls, reason)._value.get()
+
+
+def test_request_class():
+    assert request_class("GET", "/r/abc") == "redirect"
+    assert request_class("GET", "/health") is None
+    assert request_class("GET", "/static/app.css") is None
+    assert request_class("POST", "/login") == "auth"
+    assert request_class("GET", "/login") == "default"
+    assert request_class("GET", "/api/links") == "heavy"
+    assert request_class("POST", "/api/links") == "default"
+    assert request_class("GET", "/api/links/export") == "heavy"
+    assert request_class("POST", "/api/links/bulk") == "heavy"
+
+
+# a saturated heavy class sheds with 503 + Retry-After while redirects keep their reserve
+def test_heavy_overload_sheds_and_redirects_still_served():
+    async def scenario():
+        release = asyncio.Event()
+        app = AdmissionMiddleware(
+            _app(release), max_concurrency=4, redirect_reserved=2, limits={"heavy": 2},
+            queue_max=1, queue_timeout=0.2,
+        )
+        full, timeout = _shed("heavy", "queue_full"), _shed("heavy", "timeout")
+        async with _client(app) as client:
+            # two run, one queues (then times out), the fourth finds the queue full
+            held = [asyncio.create_task(client.get("/links")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            rejected = await client.get("/links")
+            assert rejected.status_code == 503
+            assert rejected.headers["retry-after"] == "1"
+            assert _shed("heavy", "queue_full") == full + 1
+
+            redirect = await client.get("/r/abc")
+            assert redirect.status_code == 200
+            assert (await client.get("/health")).status_code == 200
+
+            queued = await held[2]
+            assert queued.status_code == 503
+            assert _shed("heavy", "timeout") == timeout + 1
+            release.set()
+            assert [r.status_code for r in await asyncio.gather(*held[:2])] == [200, 200]
+
+    asyncio.run(scenario())
+
+
+# non-redirect traffic can only use capacity minus the redirect reserve
+def test_redirect_reserve_is_kept_free():
+    async def scenario():
+        release = asyncio.Event()
+        app = AdmissionMiddleware(
+            _app(release), max_concurrency=3, redirect_reserved=1, limits={},
+            queue_max=0, queue_timeout=0.1,
+        )
+        async with _client(app) as client:
+            held = [asyncio.create_task(client.get("/links")) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            assert (await client.get("/links")).status_code == 503
+            assert (await client.get("/r/abc")).status_code == 200
+            release.set()
+            await asyncio.gather(*held)
+
+    asyncio.run(scenario())
+
+
+# redirects and other requests together never exceed max_concurrency
+def test_global_concurrency_bound():
+    async def scenario():
+        release = asyncio.Event()
+        in_flight = peak = 0
+        test_app = FastAPI()
+
+        async def hold():
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await release.wait()
+            in_flight -= 1
+            return {}
+
+        test_app.get("/links")(hold)
+        test_app.get("/r/{code}")(hold)
+        app = AdmissionMiddleware(
+            test_app, max_concurrency=4, redirect_reserved=1, limits={}, queue_max=16, queue_timeout=0.3,
+        )
+        async with _client(app) as client:
+            requests = [
+                asyncio.create_task(client.get(path))
+                for path in ["/links"] * 6 + ["/r/abc"] * 6
+            ]
+            await asyncio.sleep(0.1)
+            assert in_flight == 4
+            # the other eight wait in the queues until they time out
+            await asyncio.sleep(0.3)
+            release.set()
+            statuses = [r.status_code for r in await asyncio.gather(*requests)]
+        assert peak == 4
+        assert statuses.count(200) == 4 and statuses.count(503) == 8
+
+    asyncio.run(scenario())
+
+
+# each client gets its own bucket; an empty one answers 429 with the wait until the next token
+def test_rate_limit_per_client():
+    async def scenario():
+        app = AdmissionMiddleware(_app(asyncio.Event()), rate=0.5, burst=2, trust_proxy=True)
+        before = _shed("redirect", "rate_limited")
+        async with _client(app) as client:
+            alice = {"x-forwarded-for": "10.0.0.1"}
+            assert (await client.get("/r/a", headers=alice)).status_code == 200
+            assert (await client.get("/r/a", headers=alice)).status_code == 200
+            limited = await client.get("/r/a", headers=alice)
+            assert limited.status_code == 429
+            assert limited.headers["retry-after"] == "2"
+            assert (await client.get("/r/a", headers={"x-forwarded-for": "10.0.0.2"})).status_code == 200
+        assert _shed("redirect", "rate_limited") == before + 1
+
+    asyncio.run(scenario())
+
+
+def test_token_buckets_refill_and_bound_clients():
+    buckets = TokenBuckets(rate=10, burst=1, maxsize=2)
+    assert buckets.take("a", now=0) == 0
+    assert buckets.take("a", now=0) == 0.1
+    assert buckets.take("a", now=0.1) == 0
+    buckets.take("b", now=1)
+    buckets.take("c", now=1)
+    assert list(buckets._buckets) == ["b", "c"]
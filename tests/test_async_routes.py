@@ -0,0 +1,74 @@
+# -----------------------------------------------------
+# Tests for the async hot-path handlers (ASYNC_DB=1)
+# -----------------------------------------------------
+# The main app only mounts these routes when ASYNC_DB=1, so the tests build a
+# small app around the router to exercise them regardless of configuration.
+
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.async_routes import router
+from app.db import dispose_async_engine, engine, init_db
+from app.models import User
+
+
+@pytest.fixture
+def async_client():
+    init_db()
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == "asyncuser")).first()
+        if not user:
+            user = User(username="asyncuser", password_hash="!")
+            session.add(user)
+            session.commit()
+            session.refresh(user)
+        uid = user.id
+
+    @asynccontextmanager
+    async def lifespan(_app):
+        yield
+        await dispose_async_engine()
+
+    test_app = FastAPI(lifespan=lifespan)
+    test_app.include_router(router)
+    test_app.add_middleware(SessionMiddleware, secret_key="test")
+
+    @test_app.get("/_login")
+    def _login(request: Request):
+        request.session["user_id"] = uid
+        return {}
+
+    with TestClient(test_app) as c:
+        c.get("/_login")
+        yield c
+
+
+# create, list, redirect and stats all work through the async session
+def test_async_create_list_redirect_stats(async_client):
+    r = async_client.post("/api/links", json={"original_url": "https://async.example.com"})
+    assert r.status_code == 201
+    code = r.json()["short_code"]
+
+    r2 = async_client.get("/api/links")
+    assert r2.status_code == 200
+    assert code in [l["short_code"] for l in r2.json()]
+
+    r3 = async_client.get(f"/r/{code}", follow_redirects=False)
+    assert r3.status_code == 307
+    assert r3.headers["location"].rstrip("/") == "https://async.example.com"
+
+    r4 = async_client.get(f"/api/links/{code}/stats")
+    assert r4.json()["click_count"] >= 1
+
+
+# unknown codes and duplicate custom codes are rejected like the sync handlers
+def test_async_errors(async_client):
+    assert async_client.get("/r/__nope__", follow_redirects=False).status_code == 404
+    payload = {"original_url": "https://dup.example.com", "custom_code": "async-dup"}
+    async_client.post("/api/links", json=payload)
+    assert async_client.post("/api/links", json=payload).status_code == 409
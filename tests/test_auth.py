@@ -0,0 +1,50 @@
+# -----------------------------------------------------
+# Tests for password hashing: worker pool back-pressure and rehash-on-login
+# -----------------------------------------------------
+
+import uuid
+
+from fastapi.testclient import TestClient
+from passlib.hash import pbkdf2_sha256
+from sqlmodel import Session, select
+
+from app import auth
+from app.db import engine
+from app.main import app
+from app.models import User
+
+
+# a saturated hashing pool rejects new work with 429 + Retry-After instead of queueing it
+def test_signup_rejected_when_hash_pool_full(monkeypatch):
+    monkeypatch.setattr(auth, "HASH_QUEUE_MAX", 0)
+    with TestClient(app) as c:
+        r = c.post("/signup", data={"username": f"busy-{uuid.uuid4().hex[:8]}", "password": "pw"})
+    assert r.status_code == 429
+    assert r.headers["retry-after"] == "1"
+
+
+# logging in with a hash made with fewer rounds than configured stores an upgraded hash
+def test_login_rehashes_outdated_hash():
+    username = f"legacy-{uuid.uuid4().hex[:8]}"
+    with Session(engine) as session:
+        session.add(User(username=username, password_hash=pbkdf2_sha256.using(rounds=1000).hash("pw")))
+        session.commit()
+
+    with TestClient(app) as c:
+        r = c.post("/login", data={"username": username, "password": "pw"}, follow_redirects=False)
+    assert r.status_code == 303
+
+    with Session(engine) as session:
+        stored = session.exec(select(User).where(User.username == username)).one().password_hash
+    assert not auth.needs_rehash(stored)
+    assert auth.verify_password("pw", stored)
+
+
+# the lifespan shuts the hashing pool down and waits for its worker processes to exit
+def test_lifespan_stops_hash_workers():
+    with TestClient(app) as c:
+        c.post("/signup", data={"username": f"pool-{uuid.uuid4().hex[:8]}", "password": "pw"})
+        workers = list(auth._pool._processes.values())
+        assert workers
+    assert auth._pool is None
+    assert not any(worker.is_alive() for worker in workers)
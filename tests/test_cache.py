@@ -0,0 +1,58 @@
+# -----------------------------------------------------
+# Unit tests for the in-process LRU/TTL cache
+# -----------------------------------------------------
+
+from app.cache import LRUTTLCache
+
+
+# least recently used entry is evicted once the cache is full
+def test_lru_eviction_order():
+    cache = LRUTTLCache("test-lru", maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+# entries past their TTL are treated as misses
+def test_ttl_expiry():
+    cache = LRUTTLCache("test-ttl", maxsize=10, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+# maxsize=0 disables the cache entirely
+def test_disabled_cache_stores_nothing():
+    cache = LRUTTLCache("test-off", maxsize=0, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+# an invalidation published by one worker is replayed by another on its next poll
+def test_cache_sync_replays_invalidations_across_workers():
+    from app.cache_sync import CacheSync
+    from app.db import engine, init_db
+
+    init_db()
+    mine = LRUTTLCache("test-sync-a", maxsize=10, ttl=60)
+    theirs = LRUTTLCache("test-sync-b", maxsize=10, ttl=60)
+    worker_a = CacheSync({"redirect": (mine, str)}, enabled=True)
+    worker_b = CacheSync({"redirect": (theirs, str)}, enabled=True)
+    worker_a.start(engine)
+    worker_b.start(engine)
+
+    mine.set("abc", 1)
+    theirs.set("abc", 1)
+    theirs.set("other", 2)
+    worker_a.invalidate(engine, "redirect", "abc")
+    assert mine.get("abc") is None
+    assert theirs.get("abc") == 1  # not replayed yet
+
+    assert worker_b.poll(engine) == 1
+    assert theirs.get("abc") is None
+    assert theirs.get("other") == 2
+    assert worker_b.poll(engine) == 0
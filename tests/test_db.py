@@ -0,0 +1,35 @@
+# -----------------------------------------------------
+# Tests for the database engine setup (pragmas, read-only engine)
+# -----------------------------------------------------
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.db import engine, init_db, read_engine, reserve_id_block
+
+
+# writer connections run in WAL mode with the configured pragmas
+def test_sqlite_pragmas_applied():
+    init_db()
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+# the read engine refuses writes
+def test_read_engine_is_query_only():
+    init_db()
+    with read_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("UPDATE link SET click_count = click_count"))
+
+
+# consecutive reservations hand out adjacent, non-overlapping id blocks
+def test_reserve_id_block_is_monotonic():
+    init_db()
+    first = reserve_id_block("test_sequence", 100)
+    second = reserve_id_block("test_sequence", 100)
+    assert second == first + 100
@@ -0,0 +1,80 @@
+# -----------------------------------------------------
+# Tests for the expiry sweeper and the tombstone set
+# -----------------------------------------------------
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.expiry import Tombstones, sweep_expired, tombstones
+from app.models import Link, LinkTombstone
+
+
+def _expired_link(client, **extra) -> str:
+    past = (datetime.now(timezone.utc) - timedelta(minutes=5)).isoformat()
+    r = client.post("/api/links", json={"original_url": "https://gone.com", "expires_at": past, **extra})
+    return r.json()["short_code"]
+
+
+# swept links leave the table and the listing, and their code answers 410 from memory
+def test_sweep_deletes_expired_links_and_keeps_410(logged_in_client):
+    code = _expired_link(logged_in_client)
+    live = logged_in_client.post("/api/links", json={"original_url": "https://live.com"}).json()["short_code"]
+
+    assert sweep_expired(engine) >= 1
+    with Session(engine) as session:
+        assert session.exec(select(Link).where(Link.short_code == code)).first() is None
+        assert session.exec(select(Link).where(Link.short_code == live)).first() is not None
+        assert session.exec(select(LinkTombstone).where(LinkTombstone.short_code == code)).first()
+    assert code in tombstones
+
+    codes = [item["short_code"] for item in logged_in_client.get("/api/links", params={"limit": 1000}).json()]
+    assert code not in codes and live in codes
+
+    hits = REGISTRY.get_sample_value("minilink_tombstone_hits_total") or 0
+    r = logged_in_client.get(f"/r/{code}", allow_redirects=False)
+    assert r.status_code == 410
+    assert REGISTRY.get_sample_value("minilink_tombstone_hits_total") == hits + 1
+
+
+# a swept custom code that is taken again redirects normally
+def test_reused_custom_code_is_revived(logged_in_client):
+    code = _expired_link(logged_in_client, custom_code="sweep-reuse-" + datetime.utcnow().strftime("%H%M%S%f"))
+    sweep_expired(engine)
+    assert logged_in_client.get(f"/r/{code}", allow_redirects=False).status_code == 410
+
+    r = logged_in_client.post("/api/links", json={"original_url": "https://again.com", "custom_code": code})
+    assert r.status_code == 201
+    assert code not in tombstones
+    assert logged_in_client.get(f"/r/{code}", allow_redirects=False).status_code == 307
+
+
+# a generated code (CODE_ALLOCATOR=random) can land on a swept one; that link must not answer 410
+def test_generated_code_matching_tombstone_is_revived(logged_in_client, monkeypatch):
+    stamp = datetime.utcnow().strftime("%H%M%S%f")
+    swept = [_expired_link(logged_in_client, custom_code=f"sweep-gen-{i}-{stamp}") for i in range(2)]
+    sweep_expired(engine)
+    assert all(code in tombstones for code in swept)
+
+    monkeypatch.setattr("app.main.choose_code", lambda custom: custom or swept[0])
+    assert logged_in_client.post("/api/links", json={"original_url": "https://single.com"}).status_code == 201
+    monkeypatch.setattr("app.bulk.choose_code", lambda custom: custom or swept[1])
+    assert logged_in_client.post("/api/links/bulk", json=[{"original_url": "https://bulk.com"}]).json()["created"] == 1
+
+    for code in swept:
+        assert code not in tombstones
+        assert logged_in_client.get(f"/r/{code}", allow_redirects=False).status_code == 307
+
+
+# a second process picks up tombstones written by the first one
+def test_tombstones_load_incrementally(logged_in_client):
+    other = Tombstones()
+    other.load(engine)
+    code = _expired_link(logged_in_client)
+    sweep_expired(engine)
+    assert code not in other
+    assert other.load(engine) >= 1
+    assert code in other
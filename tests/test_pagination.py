@@ -0,0 +1,136 @@
+# -----------------------------------------------------
+# Tests for keyset pagination, filters and streamed export
+# -----------------------------------------------------
+
+import base64
+import csv
+import io
+import json
+import re
+
+import pytest
+
+
+@pytest.fixture
+def client(logged_in_client):
+    """The logged-in client (a brand-new user) with seven links, labelled even/odd."""
+    r = logged_in_client.post(
+        "/api/links/bulk",
+        json=[{"original_url": f"https://p{i}.com", "label": "even" if i % 2 == 0 else "odd"} for i in range(7)],
+    )
+    assert r.json()["created"] == 7
+    return logged_in_client
+
+
+# walking the cursor returns every link exactly once, in order
+def test_cursor_walks_all_links(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, "sort": "oldest"}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/api/links", params=params)
+        assert r.status_code == 200
+        seen += [link["short_code"] for link in r.json()]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert len(seen) == 7
+    assert len(set(seen)) == 7
+
+
+def test_label_filter_and_sort(client):
+    r = client.get("/api/links", params={"label": "even", "sort": "newest"})
+    assert [link["label"] for link in r.json()] == ["even"] * 4
+
+    # a cursor is only valid for the sort it was issued for
+    r2 = client.get("/api/links", params={"limit": 1, "sort": "clicks"})
+    cursor = r2.headers["x-next-cursor"]
+    assert client.get("/api/links", params={"cursor": cursor, "sort": "newest"}).status_code == 400
+    assert client.get("/api/links", params={"sort": "nope"}).status_code == 422
+
+
+# tampered but well-formed cursors are rejected with 400, never a 500
+def test_tampered_cursor_rejected(client):
+    for sort, payload in (
+        ("newest", ["newest", 5, 1]),
+        ("newest", ["newest", "garbage", 1]),
+        ("newest", ["newest", "2024-01-01T00:00:00", "1"]),
+        ("clicks", ["clicks", "3", 1]),
+        ("clicks", ["clicks", None, 1]),
+        ("newest", [["newest"], 1, 1]),
+    ):
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+        r = client.get("/api/links", params={"cursor": cursor, "sort": sort})
+        assert r.status_code == 400, payload
+        assert r.json()["detail"] == "Invalid cursor"
+
+
+def test_export_ndjson_and_csv(client):
+    r = client.get("/api/links/export")
+    assert r.status_code == 200
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert len(rows) == 7
+
+    r2 = client.get("/api/links/export", params={"format": "csv"})
+    assert r2.headers["content-type"].startswith("text/csv")
+    assert len(list(csv.DictReader(io.StringIO(r2.text)))) == 7
+
+
+# the analytics page renders one page at a time with a link to the next one
+def test_links_page_is_paginated(client):
+    r = client.get("/links", params={"limit": 5})
+    assert r.status_code == 200
+    assert len(re.findall(r'href="/r/\w+"', r.text)) == 5
+    assert "Next page" in r.text
+
+
+# ?all=1 streams every link on one page (rendered while the rows are read)
+def test_links_page_streams_all_links(client):
+    r = client.get("/links", params={"all": 1})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/html")
+    assert len(re.findall(r'href="/r/\w+"', r.text)) == 7
+    assert "Paged view" in r.text and "Show all" not in r.text
+
+
+# every template compiles, and sources are not re-checked per render by default
+def test_templates_precompile():
+    from app.templating import get_env, precompile_templates
+
+    assert "list.html" in precompile_templates()
+    assert get_env().auto_reload is False
+
+
+# export -> delete -> import restores the same codes (NDJSON and CSV), failures are reported per row
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_import_round_trip(client, fmt):
+    exported = client.get("/api/links/export", params={"format": fmt}).content
+    codes = sorted(item["short_code"] for item in client.get("/api/links", params={"limit": 100}).json())
+    for code in codes:
+        client.delete(f"/api/links/{code}")
+
+    if fmt == "ndjson":
+        body = exported + b'{"original_url": "ftp://nope"}\n' + b"not json\n"
+    else:
+        body = exported + b"extra1,ftp://nope,,,,0,,False,\n"
+    r = client.post("/api/links/import", params={"format": fmt}, content=body)
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[-1] == {"done": True, "processed": 7 + (2 if fmt == "ndjson" else 1), "created": 7, "failed": 2 if fmt == "ndjson" else 1}
+    assert {line["index"] for line in lines if "index" in line} == ({7, 8} if fmt == "ndjson" else {7})
+
+    restored = sorted(item["short_code"] for item in client.get("/api/links", params={"limit": 100}).json())
+    assert restored == codes
+
+
+# a line that is not valid UTF-8 fails on its own; the rows around it are still imported
+def test_import_invalid_utf8_line(client):
+    body = b'{"original_url": "https://u1.com"}\n\xff\xfe not utf-8\n{"original_url": "https://u2.com"}\n'
+    r = client.post("/api/links/import", content=body)
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[-1] == {"done": True, "processed": 3, "created": 2, "failed": 1}
+    failure = next(line for line in lines if "index" in line)
+    assert failure["index"] == 1 and failure["status"] == 422
+    assert failure["error"] == "Line is not valid UTF-8"
@@ -0,0 +1,99 @@
+# -----------------------------------------------------
+# Tests for request phase timing, SQL statement instrumentation and the sampling profiler
+# -----------------------------------------------------
+
+import logging
+import threading
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app.profiling import ProfilerBusy, SamplingProfiler, instrument_engine, statement_type
+
+
+def _server_timing(response) -> dict[str, float]:
+    entries = (entry.split(";dur=") for entry in response.headers["server-timing"].split(", "))
+    return {name: float(ms) for name, ms in entries}
+
+
+# JSON endpoints report db and serialize time, HTML pages their template render, all within the total
+def test_server_timing_phases(logged_in_client):
+    logged_in_client.post("/api/links", json={"original_url": "https://phases.com"})
+
+    api = _server_timing(logged_in_client.get("/api/links"))
+    assert {"db", "serialize", "app"} <= set(api)
+    assert api["db"] + api["serialize"] <= api["app"]
+
+    page = _server_timing(logged_in_client.get("/links"))
+    assert {"db", "template", "app"} <= set(page)
+
+    before = REGISTRY.get_sample_value(
+        "minilink_request_phase_seconds_count", {"path": "/api/links", "phase": "db"}
+    ) or 0
+    logged_in_client.get("/api/links")
+    assert REGISTRY.get_sample_value(
+        "minilink_request_phase_seconds_count", {"path": "/api/links", "phase": "db"}
+    ) == before + 1
+
+
+def test_statement_type():
+    assert statement_type("  select 1") == "SELECT"
+    assert statement_type("INSERT INTO link ...") == "INSERT"
+    assert statement_type("WITH x AS (SELECT 1) SELECT * FROM x") == "OTHER"
+    assert statement_type("") == "OTHER"
+
+
+# statements are counted by type, and the ones over the threshold are logged and counted as slow
+def test_statement_histogram_and_slow_query_log(caplog):
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, slow_query_ms=0)
+    labels = {"statement": "SELECT"}
+    count = REGISTRY.get_sample_value("minilink_db_query_seconds_count", labels) or 0
+    slow = REGISTRY.get_sample_value("minilink_db_slow_queries_total", labels) or 0
+
+    with caplog.at_level(logging.WARNING, logger="minilink.sql"), engine.connect() as conn:
+        conn.execute(text("SELECT 42"))
+
+    assert REGISTRY.get_sample_value("minilink_db_query_seconds_count", labels) == count + 1
+    assert REGISTRY.get_sample_value("minilink_db_slow_queries_total", labels) == slow + 1
+    assert any("slow SELECT" in record.message and "SELECT 42" in record.message for record in caplog.records)
+
+
+def test_profile_endpoint_disabled_by_default(logged_in_client):
+    assert logged_in_client.get("/debug/profile", params={"seconds": 0.1}).status_code == 404
+
+
+def _busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+# captures show the busy thread's stack root-first in collapsed format; one capture at a time
+def test_sampling_profiler_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy worker")
+    worker.start()
+    try:
+        output = SamplingProfiler().capture(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = output.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    busy = [line for line in lines if line.startswith("busy_worker;")]
+    assert busy and all(f"{__name__}:_busy_loop" in line for line in busy)
+
+
+def test_sampling_profiler_rejects_concurrent_captures():
+    profiler = SamplingProfiler()
+    thread = threading.Thread(target=profiler.capture, args=(0.3,))
+    thread.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(ProfilerBusy):
+            profiler.capture(0.1)
+    finally:
+        thread.join()
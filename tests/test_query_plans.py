@@ -0,0 +1,90 @@
+# -----------------------------------------------------
+# Query plan audit: hot queries must use indexes, not table scans
+# -----------------------------------------------------
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlmodel import select
+
+from app.db import engine, init_db
+from app.expiry import expired_links_query
+from app.migrations import MIGRATIONS, apply_migrations
+from app.models import ClickRollup, Link, User
+from app.pagination import encode_cursor, link_page_query
+from app.redirects import redirect_query
+from app.trending import recent_rollups_query
+
+NOW = datetime(2030, 1, 1)
+
+
+# returns the EXPLAIN QUERY PLAN detail lines for a SQLAlchemy statement
+def query_plan(stmt) -> list[str]:
+    compiled = stmt.compile(engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def _cursor(sort):
+    link = Link(id=10, short_code="x", original_url="https://x", created_at=NOW, click_count=3)
+    return encode_cursor(sort, link)
+
+
+HOT_QUERIES = {
+    # redirect / stats lookups
+    "redirect": redirect_query("abc"),
+    # read / update / delete (per-user)
+    "read_link": select(Link).where(Link.short_code == "abc", Link.user_id == 1),
+    # login / signup
+    "user_by_name": select(User).where(User.username == "admin"),
+    # listings: every sort, first page and resumed from a cursor
+    **{
+        f"list_{sort}{'_cursor' if cursor else ''}": link_page_query(1, sort, _cursor(sort) if cursor else None).limit(100)
+        for sort in ("newest", "oldest", "clicks")
+        for cursor in (False, True)
+    },
+    "list_label": link_page_query(1, "newest", label="promo").limit(100),
+    # timeseries reads only touch the rollup primary key
+    "timeseries": select(ClickRollup.bucket_start, ClickRollup.clicks).where(
+        ClickRollup.link_id == 1,
+        ClickRollup.granularity == "hour",
+        ClickRollup.bucket_start >= NOW,
+        ClickRollup.bucket_start <= NOW,
+    ),
+    # trending warm start: recent minute buckets across all links
+    "recent_rollups": recent_rollups_query(NOW, 1000),
+    # expiry sweeper batches
+    "expired": expired_links_query(NOW, 500),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(name):
+    init_db()
+    plan = query_plan(HOT_QUERIES[name])
+    assert any("USING" in step and "INDEX" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
+    # listings must be returned in index order, without sorting the user's whole link set
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+# a database created before the listing indexes existed gets them from the migrations
+def test_migrations_upgrade_old_database(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.sqlite3'}")
+    with old.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE link (id INTEGER PRIMARY KEY, short_code VARCHAR, original_url VARCHAR, "
+            "label VARCHAR, created_at DATETIME, expires_at DATETIME, click_count INTEGER, "
+            "last_accessed DATETIME, user_id INTEGER)"
+        ))
+
+    assert apply_migrations(old) == sorted(version for version, _, _ in MIGRATIONS)
+    with old.connect() as conn:
+        indexes = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {"ix_link_user_created", "ix_link_user_clicks", "ix_link_user_label", "ix_link_expires_at"} <= indexes
+
+    # running again is a no-op
+    assert apply_migrations(old) == []
@@ -0,0 +1,72 @@
+# -----------------------------------------------------
+# Tests for the redirect policy and the ASGI fast path for /r/{code}
+# -----------------------------------------------------
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.redirects import REDIRECT_PERMANENT_MAX_AGE, FastRedirectMiddleware, redirect_headers, resolve_link
+
+
+# 307 without caching by default, 301 + Cache-Control for permanent links
+def test_resolve_link_policy():
+    temporary = resolve_link("https://example.com/a b", None)
+    assert temporary.status_code == 307
+    assert dict(temporary.raw_headers) == {b"location": b"https://example.com/a%20b", b"content-length": b"0"}
+
+    permanent = resolve_link("https://example.com/", None, permanent=True)
+    assert permanent.status_code == 301
+    assert dict(permanent.raw_headers)[b"cache-control"] == f"public, max-age={REDIRECT_PERMANENT_MAX_AGE}".encode()
+
+    custom = resolve_link("https://example.com/", None, cache_max_age=60)
+    assert custom.status_code == 307
+    assert dict(custom.raw_headers)[b"cache-control"] == b"public, max-age=60"
+
+
+# max-age never outlives the link's expiry
+def test_cache_control_capped_at_expiry():
+    now = datetime.utcnow()
+    target = resolve_link("https://example.com/", now + timedelta(seconds=90), permanent=True)
+    assert dict(redirect_headers(target, now))[b"cache-control"] == b"public, max-age=90"
+
+
+@pytest.fixture
+def fast_client(log_in):
+    with TestClient(FastRedirectMiddleware(app)) as c:
+        log_in(c)
+        yield c
+
+
+# the fast path answers live links itself and leaves 404s to the app
+def test_fast_path_redirects_and_counts_clicks(fast_client):
+    r = fast_client.post("/api/links", json={"original_url": "https://fast.com", "permanent": True, "cache_max_age": 600})
+    assert r.status_code == 201
+    assert r.json()["permanent"] is True
+    code = r.json()["short_code"]
+
+    for _ in range(2):
+        r2 = fast_client.get(f"/r/{code}", allow_redirects=False)
+        assert r2.status_code == 301
+        assert r2.headers["location"].rstrip("/") == "https://fast.com"
+        assert r2.headers["cache-control"] == "public, max-age=600"
+
+    assert fast_client.get(f"/api/links/{code}/stats").json()["click_count"] == 2
+
+    missing = fast_client.get("/r/doesnotexist123", allow_redirects=False)
+    assert missing.status_code == 404
+    assert missing.json() == {"detail": "Not found"}
+
+
+# switching a link to temporary drops the cached 301
+def test_policy_update_invalidates_cached_redirect(fast_client):
+    r = fast_client.post("/api/links", json={"original_url": "https://policy.com", "permanent": True})
+    code = r.json()["short_code"]
+    assert fast_client.get(f"/r/{code}", allow_redirects=False).status_code == 301
+
+    fast_client.patch(f"/api/links/{code}", json={"permanent": False})
+    r2 = fast_client.get(f"/r/{code}", allow_redirects=False)
+    assert r2.status_code == 307
+    assert "cache-control" not in r2.headers
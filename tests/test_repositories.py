@@ -0,0 +1,147 @@
+# -----------------------------------------------------
+# Contract tests for the storage backends: every store must pass the same cases
+# -----------------------------------------------------
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import SQLModel
+
+from app.db import build_engine
+from app.models import Link, User
+from app.repositories import MemoryStore, SqlStore
+from app.schemas import LinkCreate
+
+
+@pytest.fixture(params=["sql", "memory"])
+def repos(request, tmp_path):
+    if request.param == "sql":
+        engine = build_engine(f"sqlite:///{tmp_path / 'store.sqlite3'}")
+        SQLModel.metadata.create_all(engine)
+        store = SqlStore(engine)
+    else:
+        engine = None
+        store = MemoryStore()
+    with store.open() as repositories:
+        yield repositories
+    if engine is not None:
+        engine.dispose()
+
+
+def _link(code: str, user_id: int = 1, **fields) -> Link:
+    return Link(short_code=code, original_url=f"https://example.com/{code}", user_id=user_id, **fields)
+
+
+# usernames are unique; users are found by id and name, and changes are kept
+def test_users(repos):
+    alice = User(username="alice", password_hash="h1")
+    assert repos.users.add(alice)
+    assert alice.id is not None
+    assert not repos.users.add(User(username="alice", password_hash="h2"))
+
+    assert repos.users.get(alice.id).username == "alice"
+    assert repos.users.get_by_username("alice").id == alice.id
+    assert repos.users.get_by_username("bob") is None
+
+    alice.password_hash = "h3"
+    repos.users.save(alice)
+    assert repos.users.get_by_username("alice").password_hash == "h3"
+
+
+# a taken short code is rejected; lookups respect ownership
+def test_add_get_and_ownership(repos):
+    link = _link("abc", permanent=True, cache_max_age=60)
+    assert repos.links.add(link)
+    assert link.id is not None
+    assert not repos.links.add(_link("abc", user_id=2))
+
+    assert repos.links.get("abc").original_url == "https://example.com/abc"
+    assert repos.links.get("abc", 1) is not None
+    assert repos.links.get("abc", 2) is None
+    assert repos.links.code_exists("abc") and not repos.links.code_exists("nope")
+    assert tuple(repos.links.redirect_row("abc")) == ("https://example.com/abc", None, True, 60)
+    assert repos.links.redirect_row("nope") is None
+
+
+# renames move the link to its new code; deletes remove it
+def test_save_rename_and_delete(repos):
+    link = _link("old")
+    repos.links.add(link)
+    link.short_code = "new"
+    link.label = "renamed"
+    repos.links.save(link)
+    assert repos.links.get("old") is None
+    assert repos.links.get("new").label == "renamed"
+
+    repos.links.delete(repos.links.get("new"))
+    assert not repos.links.code_exists("new")
+
+
+# pages follow the sort order (ties broken by id), filters apply, and cursors resume where they stopped
+@pytest.mark.parametrize("sort", ["newest", "oldest", "clicks"])
+def test_pages_match_a_full_sort(repos, sort):
+    base = datetime(2024, 1, 1)
+    for i in range(7):
+        repos.links.add(_link(f"c{i}", created_at=base + timedelta(minutes=i // 2), click_count=i % 3,
+                              label="even" if i % 2 == 0 else None))
+    repos.links.add(_link("other", user_id=2))
+
+    pages, cursor = [], None
+    while True:
+        links, cursor = repos.links.page(1, sort, 3, cursor)
+        pages.append([link.short_code for link in links])
+        if cursor is None:
+            break
+    codes = [code for page in pages for code in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert codes == [link.short_code for link in repos.links.iter_all(1, sort)]
+
+    key = {"newest": "created_at", "oldest": "created_at", "clicks": "click_count"}[sort]
+    expected = sorted(
+        (repos.links.get(code) for code in codes),
+        key=lambda link: (getattr(link, key), link.id),
+        reverse=sort != "oldest",
+    )
+    assert codes == [link.short_code for link in expected]
+
+    labelled, _ = repos.links.page(1, sort, 10, label="even")
+    assert {link.short_code for link in labelled} == {"c0", "c2", "c4", "c6"}
+    recent, _ = repos.links.page(1, sort, 10, created_after=base + timedelta(minutes=3))
+    assert {link.short_code for link in recent} == {"c6"}
+    # an offset-aware bound means the same instant in UTC (created_at is stored as naive UTC)
+    plus_two = timezone(timedelta(hours=2))
+    recent, _ = repos.links.page(1, sort, 10, created_after=(base + timedelta(hours=2, minutes=3)).replace(tzinfo=plus_two))
+    assert {link.short_code for link in recent} == {"c6"}
+    early, _ = repos.links.page(1, sort, 10, created_before=(base + timedelta(hours=2, minutes=1)).replace(tzinfo=plus_two))
+    assert {link.short_code for link in early} == {"c0", "c1"}
+    assert [row.short_code for row in repos.links.export_rows(1)] == [
+        link.short_code for link in repos.links.iter_all(1, "oldest")
+    ]
+
+    with pytest.raises(HTTPException):
+        repos.links.page(1, "bogus", 10)
+
+
+# bulk creation reports one result per item: 201, 409 for taken codes, 422 for bad URLs / parse errors
+def test_bulk_create(repos):
+    repos.links.add(_link("taken"))
+    payloads = [
+        LinkCreate(original_url="https://a.com", custom_code="fresh"),
+        LinkCreate(original_url="https://b.com", custom_code="taken"),
+        LinkCreate(original_url="ftp://c.com"),
+        None,
+        LinkCreate(original_url="https://d.com"),
+    ]
+    results = repos.links.bulk_create(1, payloads, {3: "bad line"})
+    assert [(r.index, r.status) for r in results] == [(0, 201), (1, 409), (2, 422), (3, 422), (4, 201)]
+    assert repos.links.get("fresh", 1) is not None
+    assert repos.links.get(results[4].short_code, 1).original_url == "https://d.com/"
+
+
+# links without clicks have no rollups
+def test_rollups_empty(repos):
+    link = _link("quiet")
+    repos.links.add(link)
+    now = datetime.utcnow()
+    assert repos.links.rollups(link.id, "hour", now - timedelta(days=1), now) == {}
@@ -0,0 +1,68 @@
+# -----------------------------------------------------
+# Fast JSON mode (FAST_JSON=1) must produce exactly the default LinkRead output
+# -----------------------------------------------------
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.main as main
+
+
+@pytest.fixture
+def links(logged_in_client):
+    soon = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    payloads = [
+        {"original_url": "https://example.com/plain"},
+        {"original_url": "https://example.com/ünï?q=1&r=€", "label": "näme \"quoted\""},
+        {"original_url": "https://example.com/policy", "permanent": True, "cache_max_age": 600, "expires_at": soon},
+    ]
+    codes = [logged_in_client.post("/api/links", json=p).json()["short_code"] for p in payloads]
+    # a buffered (not yet flushed) click must be merged the same way in both modes
+    logged_in_client.get(f"/r/{codes[0]}", allow_redirects=False)
+    return codes
+
+
+def _both(client, monkeypatch, method, url, **kwargs):
+    monkeypatch.setattr(main, "FAST_JSON", False)
+    default = client.request(method, url, **kwargs)
+    monkeypatch.setattr(main, "FAST_JSON", True)
+    fast = client.request(method, url, **kwargs)
+    return default, fast
+
+
+# listings: same bytes, same status and pagination headers, for every sort and page
+@pytest.mark.parametrize("sort", ["newest", "oldest", "clicks"])
+def test_list_links_matches_default(logged_in_client, monkeypatch, links, sort):
+    cursor = None
+    while True:
+        params = {"limit": 2, "sort": sort, **({"cursor": cursor} if cursor else {})}
+        default, fast = _both(logged_in_client, monkeypatch, "GET", "/api/links", params=params)
+        assert fast.status_code == default.status_code == 200
+        assert fast.content == default.content
+        assert fast.headers["content-type"] == default.headers["content-type"]
+        assert fast.headers.get("x-next-cursor") == default.headers.get("x-next-cursor")
+        assert fast.headers.get("link") == default.headers.get("link")
+        cursor = default.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+
+def test_read_link_matches_default(logged_in_client, monkeypatch, links):
+    for code in links:
+        default, fast = _both(logged_in_client, monkeypatch, "GET", f"/api/links/{code}")
+        assert fast.status_code == default.status_code == 200
+        assert fast.content == default.content
+
+    default, fast = _both(logged_in_client, monkeypatch, "GET", "/api/links/does-not-exist")
+    assert fast.status_code == default.status_code == 404
+
+
+# a fast create answers 201 with the same document the default mode reads back
+def test_create_link_matches_default(logged_in_client, monkeypatch):
+    monkeypatch.setattr(main, "FAST_JSON", True)
+    created = logged_in_client.post("/api/links", json={"original_url": "https://example.com/new", "label": "x"})
+    assert created.status_code == 201
+    monkeypatch.setattr(main, "FAST_JSON", False)
+    read = logged_in_client.get(f"/api/links/{created.json()['short_code']}")
+    assert created.content == read.content
@@ -0,0 +1,59 @@
+# -----------------------------------------------------
+# Unit tests for short code helpers and allocators
+# -----------------------------------------------------
+
+import pytest
+
+from app.services import (
+    SequenceCodeAllocator,
+    base62_encode,
+    feistel_permute,
+    make_allocator,
+    sanitize_scheme,
+    ua_family,
+)
+
+
+def test_sanitize_scheme():
+    assert sanitize_scheme("https://a.com")
+    assert not sanitize_scheme("javascript:alert(1)")
+
+
+def test_base62_encode_pads_to_width():
+    assert base62_encode(0) == "aaaaaaa"
+    assert base62_encode(61) == "aaaaaa9"
+    assert len(base62_encode(2**40 - 1)) == 7
+
+
+# the permutation is a bijection, so sequential ids can never produce the same code
+def test_feistel_permute_is_bijective():
+    key = b"test-key"
+    outputs = {feistel_permute(n, key, bits=12) for n in range(2**12)}
+    assert outputs == set(range(2**12))
+
+
+# codes stay unique across block boundaries and only reserve a block when one runs out
+def test_sequence_allocator_reserves_blocks():
+    reserved = []
+
+    def reserve(size):
+        reserved.append(size)
+        return (len(reserved) - 1) * size
+
+    allocator = SequenceCodeAllocator(reserve, block_size=10, key="k")
+    codes = [allocator.next_code() for _ in range(25)]
+    assert len(set(codes)) == 25
+    assert all(len(code) == 7 for code in codes)
+    assert reserved == [10, 10, 10]
+
+
+def test_make_allocator_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        make_allocator("nope")
+
+
+def test_ua_family():
+    assert ua_family("Mozilla/5.0 (X11) Gecko/20100101 Firefox/120.0") == "Firefox"
+    assert ua_family("Mozilla/5.0 AppleWebKit Chrome/120.0 Safari/537.36 Edg/120.0") == "Edge"
+    assert ua_family("Googlebot/2.1") == "Bot"
+    assert ua_family(None) == "Other"
@@ -8,6 +8,8 @@
 # - Stats endpoint
 # - Expiry handling
 
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -159,4 +161,192 @@ def test_redirect_expired_returns_410(client):
     code = r.json()["short_code"]
 
     r2 = client.get(f"/r/{code}", allow_redirects=False)
-    assert r2.status_code == 410
\ No newline at end of file
+    assert r2.status_code == 410
+
+
+# test redirect follows an updated URL (cached target is invalidated)
+def test_redirect_after_update_uses_new_url(client):
+    r = client.post("/api/links", json={"original_url": "https://before.com"})
+    code = r.json()["short_code"]
+
+    # warm the redirect cache
+    r2 = client.get(f"/r/{code}", allow_redirects=False)
+    assert r2.headers["location"].rstrip("/") == "https://before.com"
+
+    client.patch(f"/api/links/{code}", json={"original_url": "https://after.com"})
+    r3 = client.get(f"/r/{code}", allow_redirects=False)
+    assert r3.headers["location"].rstrip("/") == "https://after.com"
+
+    # deleting the link makes the redirect 404 again
+    client.delete(f"/api/links/{code}")
+    r4 = client.get(f"/r/{code}", allow_redirects=False)
+    assert r4.status_code == 404
+
+# test buffered clicks survive a short_code rename
+def test_clicks_follow_renamed_code(client):
+    r = client.post("/api/links", json={"original_url": "https://rename.com"})
+    code = r.json()["short_code"]
+    client.get(f"/r/{code}", allow_redirects=False)
+
+    new_code = code + "x"
+    r2 = client.patch(f"/api/links/{code}", json={"custom_code": new_code})
+    assert r2.status_code == 200
+    assert r2.json()["click_count"] == 1
+
+    r3 = client.get(f"/api/links/{new_code}/stats")
+    assert r3.json()["click_count"] == 1
+
+# test a flush writes buffered clicks to the Link row in one batch
+def test_click_buffer_flush_persists(client):
+    from sqlmodel import Session, select
+    from app.clicks import click_buffer
+    from app.db import engine
+    from app.models import Link
+
+    r = client.post("/api/links", json={"original_url": "https://flush.com"})
+    code = r.json()["short_code"]
+    client.get(f"/r/{code}", allow_redirects=False)
+    client.get(f"/r/{code}", allow_redirects=False)
+    assert click_buffer.pending(code)[0] == 2
+
+    click_buffer.flush(engine)
+    assert click_buffer.pending(code) == (0, None)
+    with Session(engine) as session:
+        link = session.exec(select(Link).where(Link.short_code == code)).one()
+        assert link.click_count == 2
+        assert link.last_accessed is not None
+
+# test the click event log keeps the newest CLICK_EVENTS_MAX events and counts the dropped ones
+def test_click_events_bounded(monkeypatch):
+    from prometheus_client import REGISTRY
+    from app import clicks
+
+    monkeypatch.setattr(clicks, "CLICK_EVENTS_MAX", 3)
+    buffer = clicks.ClickBuffer(threshold=100)
+    before = REGISTRY.get_sample_value("minilink_click_events_dropped_total")
+    for code in "abcde":
+        buffer.record(code)
+    assert [event[0] for event in buffer._events] == ["c", "d", "e"]
+    assert REGISTRY.get_sample_value("minilink_click_events_dropped_total") == before + 2
+
+# test a failing periodic flush is logged and counted, and the loop keeps running
+def test_flush_loop_survives_failures(monkeypatch, caplog):
+    import asyncio
+    from contextlib import suppress
+    from prometheus_client import REGISTRY
+    import app.main
+    from app.clicks import click_buffer
+
+    def failures():
+        return REGISTRY.get_sample_value("minilink_background_failures_total", {"task": "flush_clicks"}) or 0
+
+    def broken(engine):
+        raise RuntimeError("database is locked")
+
+    async def run_loop():
+        task = asyncio.create_task(app.main.flush_clicks_periodically())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    monkeypatch.setattr(app.main, "CLICK_FLUSH_INTERVAL", 0.01)
+    monkeypatch.setattr(click_buffer, "flush", broken)
+    before = failures()
+    asyncio.run(run_loop())
+    assert failures() >= before + 2
+    assert "click flush failed" in caplog.text
+
+# test bulk create: generated codes, custom codes, collisions and invalid schemes
+def test_bulk_create_links(client):
+    taken = client.post("/api/links", json={"original_url": "https://taken.com"}).json()["short_code"]
+    payload = [
+        {"original_url": "https://bulk-a.com"},
+        {"original_url": "https://bulk-b.com", "label": "b"},
+        {"original_url": "https://bulk-c.com", "custom_code": taken},
+        {"original_url": "ftp://bulk-d.com"},
+    ]
+    r = client.post("/api/links/bulk", json=payload)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["created"] == 2
+    assert body["failed"] == 2
+    statuses = [item["status"] for item in body["results"]]
+    assert statuses == [201, 201, 409, 422]
+
+    code = body["results"][1]["short_code"]
+    r2 = client.get(f"/api/links/{code}")
+    assert r2.json()["label"] == "b"
+
+# test NDJSON bulk variant reports per-line results, including unparsable lines
+def test_bulk_create_links_ndjson(client):
+    lines = b'{"original_url": "https://nd-a.com"}\n{"original_url": 5}\n\n{"original_url": "https://nd-b.com"}\n'
+    r = client.post(
+        "/api/links/bulk/ndjson",
+        content=lines,
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert r.status_code == 200
+    results = [json.loads(line) for line in r.text.splitlines()]
+    assert [item["status"] for item in results] == [201, 422, 201]
+
+# test clicks land in the rollups behind the timeseries endpoint
+def test_stats_timeseries(client):
+    from app.clicks import click_buffer
+    from app.db import engine
+
+    r = client.post("/api/links", json={"original_url": "https://series.com"})
+    code = r.json()["short_code"]
+    for _ in range(3):
+        client.get(f"/r/{code}", allow_redirects=False, headers={"user-agent": "Mozilla/5.0 Firefox/120.0"})
+    click_buffer.flush(engine)
+
+    for granularity in ("minute", "hour", "day"):
+        r2 = client.get(f"/api/links/{code}/stats/timeseries", params={"granularity": granularity})
+        assert r2.status_code == 200
+        points = r2.json()["points"]
+        assert sum(p["clicks"] for p in points) == 3
+
+    assert client.get("/api/links/__nope__/stats/timeseries").status_code == 404
+    r3 = client.get(f"/api/links/{code}/stats/timeseries", params={"granularity": "minute", "since": "2000-01-01T00:00:00Z"})
+    assert r3.status_code == 422
+
+# test the session user lookup is served from the user cache and dropped on logout
+def test_user_cache_hits_and_logout(client):
+    from prometheus_client import REGISTRY
+    from app.cache import user_cache
+
+    def hits():
+        return REGISTRY.get_sample_value("minilink_cache_hits_total", {"cache": "user"}) or 0
+
+    client.get("/api/links")
+    before = hits()
+    client.get("/api/links")
+    client.get("/api/links")
+    assert hits() == before + 2
+    assert len(user_cache) >= 1
+
+    client.post("/logout")
+    assert client.get("/api/links").status_code == 401
+
+# test request metrics are labelled by route template, not by concrete short code
+def test_request_metrics_use_route_template(client):
+    from prometheus_client import REGISTRY
+
+    def count(path, status):
+        return REGISTRY.get_sample_value(
+            "minilink_requests_total", {"method": "GET", "path": path, "status": status}
+        ) or 0
+
+    r = client.post("/api/links", json={"original_url": "https://metrics.com"})
+    code = r.json()["short_code"]
+
+    before = count("/r/{code}", "307")
+    client.get(f"/r/{code}", allow_redirects=False)
+    assert count("/r/{code}", "307") == before + 1
+    assert count(f"/r/{code}", "307") == 0
+
+    missing = count("<unmatched>", "404")
+    client.get("/no/such/page/12345")
+    assert count("<unmatched>", "404") == missing + 1
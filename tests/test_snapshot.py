@@ -0,0 +1,110 @@
+# -----------------------------------------------------
+# Short-code snapshot: build, mmap lookups, atomic swap, dirty codes, redirect fallback
+# -----------------------------------------------------
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.cache import redirect_cache
+from app.db import build_engine, engine, init_db
+from app.main import app
+from app.models import Link
+from app.snapshot import CodeSnapshot, SnapshotView, build_snapshot, code_snapshot
+
+EXPIRES = datetime(2031, 5, 6, 7, 8, 9, 123456)
+
+
+@pytest.fixture
+def links_engine(tmp_path, monkeypatch):
+    db = build_engine(f"sqlite:///{tmp_path / 'snap.sqlite3'}")
+    monkeypatch.setattr("app.db.engine", db)
+    init_db()
+    with Session(db) as session:
+        session.add_all([
+            Link(short_code="b", original_url="https://example.com/b"),
+            Link(short_code="a", original_url="https://example.com/ünï?q=€", expires_at=EXPIRES),
+            Link(short_code="c", original_url="https://example.com/c", permanent=True, cache_max_age=600),
+            Link(short_code="x" * 40, original_url="https://example.com/long"),
+        ])
+        session.commit()
+    yield db
+    db.dispose()
+
+
+# lookups return the same row as the database query, for every code in the snapshot
+def test_build_and_find(links_engine, tmp_path):
+    path = str(tmp_path / "codes.snapshot")
+    assert build_snapshot(links_engine, path) == 3
+
+    view = SnapshotView(path)
+    assert view.find("a") == ("https://example.com/ünï?q=€", EXPIRES, False, None)
+    assert view.find("b") == ("https://example.com/b", None, False, None)
+    assert view.find("c") == ("https://example.com/c", None, True, 600)
+    # unknown, empty and over-long codes are answered by the database
+    for code in ("0", "bb", "", "x" * 40):
+        assert view.find(code) is None
+
+
+# a rebuild replaces the file atomically; an old mapping keeps working until it is dropped
+def test_rebuild_swaps_snapshot(links_engine, tmp_path):
+    snapshot = CodeSnapshot(str(tmp_path / "codes.snapshot"), enabled=True, interval=3600)
+    assert snapshot.refresh(links_engine) is True
+    old = snapshot._view
+    # fresh enough: no rebuild, nothing new to map
+    assert snapshot.refresh(links_engine) is False
+
+    with Session(links_engine) as session:
+        session.add(Link(short_code="d", original_url="https://example.com/d"))
+        session.commit()
+    assert snapshot.lookup("d") is None
+    assert snapshot.refresh(links_engine, max_age=0) is True
+    assert snapshot.lookup("d") == ("https://example.com/d", None, False, None)
+    assert len(snapshot) == 4
+    assert old.find("b") == ("https://example.com/b", None, False, None)
+    assert list(tmp_path.glob(".snapshot-*")) == []
+
+
+# invalidated codes skip the snapshot until a build that started after the change is loaded
+def test_dirty_codes(links_engine, tmp_path):
+    snapshot = CodeSnapshot(str(tmp_path / "codes.snapshot"), enabled=True)
+    snapshot.refresh(links_engine)
+    snapshot.invalidate("b")
+    assert snapshot.lookup("b") is None
+    assert snapshot.lookup("c") is not None
+
+    snapshot.refresh(links_engine, max_age=0)
+    assert "b" not in snapshot._dirty
+    assert snapshot.lookup("b") == ("https://example.com/b", None, False, None)
+
+
+# redirects use the snapshot before the database, and an update is never served from a stale one
+def test_redirect_uses_snapshot(tmp_path, monkeypatch, log_in):
+    init_db()
+    monkeypatch.setattr(code_snapshot, "enabled", True)
+    monkeypatch.setattr(code_snapshot, "path", str(tmp_path / "codes.snapshot"))
+    monkeypatch.setattr(code_snapshot, "_view", None)
+    monkeypatch.setattr(code_snapshot, "_dirty", {})
+    with TestClient(app) as client:
+        log_in(client)
+        code = client.post("/api/links", json={"original_url": "https://example.com/v1"}).json()["short_code"]
+        # created after the startup build: resolved from the database
+        assert client.get(f"/r/{code}", allow_redirects=False).headers["location"] == "https://example.com/v1"
+
+        code_snapshot.refresh(engine, max_age=0)
+        assert code_snapshot.lookup(code) is not None
+        # a change behind the app's back is not seen: the snapshot answered, not the database
+        with Session(engine) as session:
+            session.exec(update(Link).where(Link.short_code == code).values(original_url="https://example.com/raw"))
+            session.commit()
+        redirect_cache.invalidate(code)
+        assert client.get(f"/r/{code}", allow_redirects=False).headers["location"] == "https://example.com/v1"
+
+        client.patch(f"/api/links/{code}", json={"original_url": "https://example.com/v2"})
+        assert client.get(f"/r/{code}", allow_redirects=False).headers["location"] == "https://example.com/v2"
+
+        client.delete(f"/api/links/{code}")
+        assert client.get(f"/r/{code}", allow_redirects=False).status_code == 404
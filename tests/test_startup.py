@@ -0,0 +1,65 @@
+# -----------------------------------------------------
+# Cold start budget: import + lifespan of a fresh process, and what it must not import
+# -----------------------------------------------------
+
+import os
+import subprocess
+import sys
+
+from sqlmodel import Session, select
+
+from app.db import build_engine, init_db
+from app.manage import DEMO_PASSWORD, DEMO_PASSWORD_HASH, seed_demo_user
+from app.models import User
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# generous default for shared CI machines; tighten locally with STARTUP_BUDGET_MS
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "4000"))
+
+SCRIPT = """
+import asyncio, time
+start = time.perf_counter()
+import app.main
+
+async def boot():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        print(time.perf_counter() - start)
+
+asyncio.run(boot())
+"""
+
+
+# passlib and Jinja load on first use; startup stays within the budget
+def test_cold_start_budget(tmp_path):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'start.sqlite3'}"}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    imported = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+    assert "app.main" in imported
+    assert not {"passlib", "jinja2", "app.auth"} & imported
+
+    elapsed_ms = float(result.stdout) * 1000
+    assert elapsed_ms < STARTUP_BUDGET_MS, f"import + lifespan took {elapsed_ms:.0f} ms"
+
+
+# seeding stores the precomputed hash (no PBKDF2 run) and is idempotent
+def test_seed_demo_user_uses_precomputed_hash(tmp_path, monkeypatch):
+    from app import repositories
+    from app.auth import verify_password
+
+    engine = build_engine(f"sqlite:///{tmp_path / 'seed.sqlite3'}")
+    monkeypatch.setattr("app.db.engine", engine)
+    monkeypatch.setattr(repositories, "store", repositories.SqlStore(engine))
+    init_db()
+
+    assert seed_demo_user() is True
+    assert seed_demo_user() is False
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == "admin")).one()
+    assert user.password_hash == DEMO_PASSWORD_HASH
+    assert verify_password(DEMO_PASSWORD, user.password_hash)
+    engine.dispose()
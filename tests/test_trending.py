@@ -0,0 +1,147 @@
+# -----------------------------------------------------
+# Trending links: sliding-window count-min sketch + top-K
+# -----------------------------------------------------
+
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.cache import redirect_cache
+from app.db import engine, init_db
+from app.main import app
+from app.models import ClickRollup, Link
+from app.redirects import warm_redirect_cache
+from app.trending import TrendingTracker, parse_window, trending
+
+T0 = 1_700_000_000.0
+
+
+def test_parse_window():
+    assert parse_window("30s") == 30
+    assert parse_window("5m") == 300
+    assert parse_window("1h") == 3600
+    for bad in ("", "5", "m", "0m", "5x", "-5m"):
+        with pytest.raises(ValueError):
+            parse_window(bad)
+
+
+# heavy hitters are found among a long tail of one-off codes, with bounded candidates
+def test_top_k_finds_heavy_hitters():
+    tracker = TrendingTracker("1m", width=512, depth=4, capacity=20)
+    rng = random.Random(7)
+    hot = {f"hot{i}": 200 - 20 * i for i in range(5)}
+    stream = [code for code, n in hot.items() for _ in range(n)] + [f"tail{i}" for i in range(5000)]
+    rng.shuffle(stream)
+    for i, code in enumerate(stream):
+        tracker.record(code, when=T0 + i * 0.001)
+
+    top = tracker.windows["1m"].top(5)
+    assert [code for code, _ in top] == list(hot)
+    # count-min never undercounts
+    assert all(clicks >= hot[code] for code, clicks in top)
+    assert len(tracker.windows["1m"]._candidates) <= 20
+
+
+# clicks leave a window once their slice slides out; larger windows still count them
+def test_windows_slide():
+    tracker = TrendingTracker("1m,5m", slices=6)
+    for _ in range(3):
+        tracker.record("old", when=T0)
+    tracker.record("new", when=T0 + 90)
+
+    assert tracker.windows["1m"].top(10) == [("new", 1)]
+    assert tracker.windows["5m"].top(10) == [("old", 3), ("new", 1)]
+
+    # far beyond every window: all counts are gone
+    tracker.windows["5m"].advance(T0 + 3600)
+    assert tracker.windows["5m"].top(10) == []
+
+
+# redirects only bump a pending counter; queries fold it into the sketches first
+def test_pending_clicks_fold_before_query():
+    tracker = TrendingTracker("1m", fold_max=3)
+    for code in ("a", "a", "b"):
+        tracker.record(code)
+    assert tracker.windows["1m"].top(10) == []
+    assert tracker.top("1m") == [("a", 2), ("b", 1)]
+
+    # fold_max distinct codes pending trigger an early fold
+    for code in ("c", "d", "e"):
+        tracker.record(code)
+    assert tracker._pending == {}
+
+
+def test_discard_and_disabled():
+    tracker = TrendingTracker("1m")
+    tracker.record("gone", when=T0)
+    tracker.discard("gone")
+    assert tracker.windows["1m"].top(10) == []
+
+    disabled = TrendingTracker(enabled=False)
+    disabled.record("x")
+    assert disabled.windows == {} and disabled.hottest() == []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # fresh windows on the shared tracker itself, so every module that imported it sees them
+    for name, value in vars(TrendingTracker("1m,5m")).items():
+        monkeypatch.setattr(trending, name, value)
+    # start empty, without the rollups other tests left in the shared database
+    monkeypatch.setattr(trending, "load_recent", lambda engine: 0)
+    with TestClient(app) as c:
+        yield c
+
+
+# redirects feed GET /api/trending; it needs a login and a configured window
+def test_trending_endpoint(client, log_in):
+    assert client.get("/api/trending").status_code == 401
+    log_in(client)
+    codes = [client.post("/api/links", json={"original_url": f"https://example.com/{i}"}).json()["short_code"] for i in range(3)]
+    for code, clicks in zip(codes, (1, 4, 2)):
+        for _ in range(clicks):
+            client.get(f"/r/{code}", allow_redirects=False)
+
+    r = client.get("/api/trending", params={"window": "5m", "limit": 2})
+    assert r.status_code == 200
+    assert r.json() == {
+        "window": "5m",
+        "scope": "worker",
+        "worker_pid": os.getpid(),
+        "links": [{"short_code": codes[1], "clicks": 4}, {"short_code": codes[2], "clicks": 2}],
+    }
+    assert client.get("/api/trending", params={"window": "2h"}).status_code == 422
+
+
+# a restarted worker rebuilds its windows from recent minute rollups and warms the redirect cache
+def test_warm_start_from_rollups():
+    init_db()
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    with Session(engine) as session:
+        links = [Link(short_code=f"warm{i}-{uuid.uuid4().hex[:8]}", original_url=f"https://warm.example.com/{i}") for i in range(2)]
+        session.add_all(links)
+        session.commit()
+        for link in links:
+            session.refresh(link)
+        session.add(ClickRollup(link_id=links[0].id, granularity="minute", bucket_start=now, clicks=7))
+        session.add(ClickRollup(link_id=links[1].id, granularity="minute", bucket_start=now - timedelta(minutes=3), clicks=9))
+        session.add(ClickRollup(link_id=links[1].id, granularity="minute", bucket_start=now - timedelta(hours=2), clicks=99))
+        session.commit()
+        codes = [link.short_code for link in links]
+
+    tracker = TrendingTracker("5m,1h")
+    assert tracker.load_recent(engine) >= 2
+    top = dict(tracker.windows["5m"].top(50))
+    assert top[codes[0]] == 7 and top[codes[1]] == 9
+
+    hottest = tracker.hottest()
+    assert codes[0] in hottest and codes[1] in hottest
+    for code in codes:
+        redirect_cache.invalidate(code)
+    assert warm_redirect_cache(codes) == 2
+    assert redirect_cache.get(codes[1]).original_url == "https://warm.example.com/1"